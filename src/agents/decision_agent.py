@@ -2,236 +2,652 @@ import json
 import threading
 import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from paho.mqtt.client import Client as MqttClient
-import os
 
-from ..common.mqtt_bus import make_client
-from ..common.config import FIELD_ID, AI_STRATEGY, N8N_WEBHOOK_URL
-from ..pipeline.handlers import CleaningHandler, FeatureEngineeringHandler, EstimationHandler
-from ..ai.strategies import make_strategy
+from ..common.mqtt_bus import arrival_ts, make_client
+from ..common.config import (
+    FIELD_ID, AI_STRATEGY, N8N_WEBHOOK_URL, FEATURE_WINDOWS_SECS, PIPELINE_MODE,
+    STALENESS_TTL_SECS, STALENESS_TTLS, INGEST_QUEUE_MAX, INGEST_INTERVAL_SECS, FORECAST_TTL_SECS,
+    SHADOW_STRATEGIES, ESTIMATION_BUDGET_MS, ANOMALY_DETECTION,
+    STATE_SNAPSHOT_PATH, STATE_SNAPSHOT_SECS, RETAIN_LAST_VALUES,
+)
+from ..pipeline.handlers import (
+    CleaningHandler, FeatureEngineeringHandler, AgronomicHandler, RollingStressHandler, EstimationHandler,
+)
+from ..pipeline.compiled import CompiledPipeline, FieldRecord, make_pipeline
+from ..pipeline.anomaly import AnomalyDetector
+from ..ai.strategies import BaseStrategy, make_strategy
+from ..ai.shadow import ShadowEvaluator
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..common.scenarios import Scenario, ScenarioCatalog, ScenarioPlayer
+from ..common.expiry import ExpiryHeap
+from ..common.publish_policy import DecisionPublisher
+from ..common.snapshot import IngestQueue, SnapshotHolder
+from ..common.state_store import StateSnapshotStore, pack_samples, unpack_samples
+
+
+INPUT_KEYS = ("temperature", "humidity", "light", "wind_kmh", "radiation", "vegetation_health")
+
+
+# ============================================================
+#  AgentState – snapshot immutabile dello stato del DecisionAgent
+# ============================================================
+
+class AgentState:
+    """
+    Stato condiviso tra ingestione MQTT e ciclo decisionale.
+    Non viene mai modificato: i writer ne pubblicano una copia con evolve().
+    `mode_epoch` cambia ad ogni passaggio LIVE ↔ DEMO.
+    `shadow` elenca le strategie candidate valutate in ombra.
+    """
+
+    __slots__ = ("cache", "last_update", "demo_mode", "demo_player",
+                 "strategy_name", "strategy", "mode_epoch", "forecast", "shadow")
+
+    def __init__(self, cache: Dict[str, Any], last_update: Dict[str, float],
+                 demo_mode: bool, demo_player: Optional[ScenarioPlayer],
+                 strategy_name: str, strategy: BaseStrategy, mode_epoch: int = 0,
+                 forecast: Optional[Dict[str, Any]] = None, shadow: Tuple[str, ...] = ()):
+        self.cache = cache
+        self.last_update = last_update
+        self.demo_mode = demo_mode
+        self.demo_player = demo_player
+        self.strategy_name = strategy_name
+        self.strategy = strategy
+        self.mode_epoch = mode_epoch
+        self.forecast = forecast or {}
+        self.shadow = tuple(shadow)
+
+    def evolve(self, **changes) -> "AgentState":
+        fields = {k: getattr(self, k) for k in self.__slots__}
+        fields.update(changes)
+        return AgentState(**fields)
 
 
 # ============================================================
 #  DecisionAgent – LIVE MODE + DEMO MODE con test cases
 # ============================================================
 
-class DecisionAgent(threading.Thread):
-    def __init__(self):
-        super().__init__(daemon=True)
+class DecisionAgent:
+    # Periodo del ciclo decisionale (secondi)
+    TICK_SECS = 1.0
+
+    def __init__(self, scheduler: Optional[Scheduler] = None):
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
 
         # MQTT client
         self.client: MqttClient = make_client("decision")
 
-        # Cache dei valori LIVE
-        self.cache: Dict[str, Any] = {
-            "temperature": None,
-            "humidity": None,
-            "light": None,
-            "wind_kmh": None,
-            "radiation": None,
-            "vegetation_health": None,
-        }
-
-        # Timestamp ultimo update
-        self.last_update: Dict[str, float] = {k: 0.0 for k in self.cache}
+        # Scadenze per grandezza (TTL configurabili) su min-heap di deadline.
+        # Usato solo dal writer dello stato, sotto il lock di SnapshotHolder.
+        self.expiry = ExpiryHeap(STALENESS_TTLS, default_ttl=STALENESS_TTL_SECS)
+        # Anomalie per sensore (picchi, sonde bloccate, deriva): anche questo solo dal writer
+        self.anomalies = AnomalyDetector() if ANOMALY_DETECTION else None
+        self.anomaly_topic = f"greenfield/{FIELD_ID}/anomalies"
 
-        # Demo mode
-        self.demo_mode = False
-        self.demo_case_data = None
+        # Demo mode: scenari precaricati e indicizzati per nome
+        self.scenarios = ScenarioCatalog()
+        print(f"[DecisionAgent] Scenari demo disponibili: {self.scenarios.preload()}")
 
-        self._running = True
+        # Strategy iniziale
+        strategy_name = (AI_STRATEGY or "simple_rules").lower().strip()
+
+        # Stato condiviso: snapshot versionati (letture senza lock) + coda di ingestione
+        self.state: SnapshotHolder[AgentState] = SnapshotHolder(AgentState(
+            cache={k: None for k in INPUT_KEYS},
+            last_update={k: 0.0 for k in INPUT_KEYS},
+            demo_mode=False,
+            demo_player=None,
+            strategy_name=strategy_name,
+            strategy=make_strategy(strategy_name),
+            shadow=tuple(SHADOW_STRATEGIES),
+        ))
+        self.ingest_queue = IngestQueue(INGEST_QUEUE_MAX)
+        self._ingest_task: Optional[ScheduledTask] = None
+        self._reported_drops = 0
+        self._seen_epoch = 0
 
         # Topic di sottoscrizione
         sensors_topic = f"greenfield/{FIELD_ID}/sensors/+/+"
         weather_topic = f"greenfield/{FIELD_ID}/weather/current"
+        forecast_topic = f"greenfield/{FIELD_ID}/weather/forecast"
         image_topic = f"greenfield/{FIELD_ID}/images/health"
         control_strategy_topic = f"greenfield/{FIELD_ID}/control/strategy"
         control_test_case_topic = f"greenfield/{FIELD_ID}/control/test_case"
+        control_shadow_topic = f"greenfield/{FIELD_ID}/control/shadow"
 
         self.client.on_message = self._on_message
 
         self.client.subscribe(sensors_topic, qos=0)
         self.client.subscribe(weather_topic, qos=0)
+        self.client.subscribe(forecast_topic, qos=0)
         self.client.subscribe(image_topic, qos=0)
         self.client.subscribe(control_strategy_topic, qos=0)
         self.client.subscribe(control_test_case_topic, qos=0)
+        self.client.subscribe(control_shadow_topic, qos=0)
 
-        # Strategy iniziale
-        self.current_strategy_name = (AI_STRATEGY or "simple_rules").lower().strip()
-        self.strategy = make_strategy(self.current_strategy_name)
-
-        # Pipeline AI (Cleaning → FeatureEngineering → Estimation)
+        # Pipeline AI (Cleaning → FeatureEngineering → Agronomic → RollingStress → Estimation)
         self.cleaning = CleaningHandler()
         self.feature_engineering = FeatureEngineeringHandler()
-        self.estimation = EstimationHandler(self.strategy)
-        self.cleaning.set_next(self.feature_engineering).set_next(self.estimation)
-        self.pipeline = self.cleaning
+        self.agronomic = AgronomicHandler()
+        self.rolling_stress = RollingStressHandler(FEATURE_WINDOWS_SECS)
+        # Strategie non a regole con budget di latenza; oltre il budget decide SimpleRuleStrategy
+        self.estimation = EstimationHandler(self.state.read().strategy,
+                                            fallback=make_strategy("simple_rules"),
+                                            budget_ms=ESTIMATION_BUDGET_MS)
+        self._in_fallback = False
+        (self.cleaning
+            .set_next(self.feature_engineering)
+            .set_next(self.agronomic)
+            .set_next(self.rolling_stress)
+            .set_next(self.estimation))
+        # Catena fusa in un'unica funzione (PIPELINE_MODE=chain per la catena classica)
+        self.pipeline = make_pipeline(self.cleaning, PIPELINE_MODE)
+        # Con la pipeline compilata un solo FieldRecord, riempito in place ad ogni tick
+        self._record = FieldRecord() if isinstance(self.pipeline, CompiledPipeline) else None
+
+        # Solo cambiamenti / delta sul topic decisions, con heartbeat completo
+        self.publisher = DecisionPublisher()
+
+        # Strategie candidate in ombra: pool dedicato, risultati su un topic separato
+        shadow_topic = f"greenfield/{FIELD_ID}/decisions/shadow"
+        self.shadow = ShadowEvaluator(
+            self.state.read().shadow,
+            publish=lambda p: self.client.publish(shadow_topic, json.dumps(p), qos=0),
+            publish_stats=lambda p: self.client.publish(f"{shadow_topic}/stats", json.dumps(p),
+                                                        qos=0, retain=True),
+        )
+
+        # Riavvio a caldo: snapshot periodico dello stato su disco, ripristinato qui.
+        # Le finestre mobili sono copiate da tick() (unico thread che le modifica)
+        # e scritte dal task di snapshot.
+        self.snapshots = StateSnapshotStore(STATE_SNAPSHOT_PATH) if STATE_SNAPSHOT_PATH else None
+        self._snapshot_task: Optional[ScheduledTask] = None
+        # Task periodico e stop() scrivono lo stesso file temporaneo: uno alla volta
+        self._snapshot_lock = threading.Lock()
+        self._captured: Optional[Dict[str, Any]] = None
+        self._next_capture = 0.0
+        self._restore()
 
         print(f"[DecisionAgent] Strategia iniziale: {self.current_strategy_name}")
 
     # ============================================================
-    #  Carica test case JSON
+    #  Viste di sola lettura sullo snapshot corrente
     # ============================================================
-    def load_test_case(self, case_name: str) -> Dict[str, Any]:
+    @property
+    def cache(self) -> Dict[str, Any]:
+        return self.state.read().cache
+
+    @property
+    def last_update(self) -> Dict[str, float]:
+        return self.state.read().last_update
+
+    @property
+    def demo_mode(self) -> bool:
+        return self.state.read().demo_mode
+
+    @property
+    def current_strategy_name(self) -> str:
+        return self.state.read().strategy_name
+
+    # ============================================================
+    #  Carica test case dal catalogo (riletto solo se il file cambia)
+    # ============================================================
+    def load_test_case(self, case_name: str) -> Optional[Scenario]:
         try:
-            path = os.path.join("test_cases", f"{case_name}.json")
-            with open(path, "r") as f:
-                data = json.load(f)
-            print(f"[DecisionAgent] Test case caricato: {case_name}")
-            return data
+            scenario = self.scenarios.get(case_name)
+            if scenario is None:
+                print(f"[DecisionAgent] Test case '{case_name}' non trovato")
+            return scenario
         except Exception as e:
             print(f"[DecisionAgent] Errore caricando test case '{case_name}': {e}")
             return None
 
     # ============================================================
-    #  MESSAGE HANDLER
+    #  MESSAGE HANDLER (thread di rete paho: solo accodamento)
     # ============================================================
     def _on_message(self, client, userdata, msg):
         try:
             payload = json.loads(msg.payload.decode("utf-8"))
-            topic = msg.topic
-            now = time.time()
+        except Exception as e:
+            print("[DecisionAgent] Errore parsing MQTT:", e)
+            return
+        self.ingest_queue.put((msg.topic, payload, arrival_ts(msg, payload)))
 
-            # ------------------------------------------------------
-            # CAMBIO STRATEGIA
-            # ------------------------------------------------------
-            if topic.endswith("/control/strategy"):
-                new_name = payload.get("strategy", "").lower().strip()
-                if new_name:
-                    print(f"[DecisionAgent] Cambio strategia → {new_name}")
-                    self.current_strategy_name = new_name
-                    self.strategy = make_strategy(new_name)
-                    self.estimation.estimator = self.strategy
+    # ============================================================
+    #  INGESTIONE: applica i messaggi accodati e pubblica uno snapshot
+    # ============================================================
+    def ingest(self):
+        batch = self.ingest_queue.drain()
+        now = time.time()
+        self.state.update(lambda s: self._apply(s, batch, now))
+
+        if self.anomalies is not None:
+            events = self.anomalies.pop_events()
+            if events:
+                for e in events[:10]:
+                    print(f"[DecisionAgent] Sensore {e['sensor']}: {e['previous']} → {e['anomaly']}")
+                if len(events) > 10:
+                    print(f"[DecisionAgent] ... altri {len(events) - 10} cambi di stato anomalie")
+                self.client.publish(self.anomaly_topic, json.dumps({"ts": now, "events": events}), qos=0)
+
+        dropped = self.ingest_queue.dropped
+        if dropped != self._reported_drops:
+            print(f"[DecisionAgent] Coda di ingestione piena: {dropped - self._reported_drops} "
+                  f"messaggi scartati (totale {dropped})")
+            self._reported_drops = dropped
+
+    @staticmethod
+    def _expand_backfill(batch: List[Tuple[str, Dict[str, Any], float]]):
+        """
+        Espande i messaggi {"batch": [...]} dei publisher con spool: ogni
+        lettura arretrata vale all'istante in cui è stata misurata (mai oltre
+        l'arrivo), così scade subito se è più vecchia del proprio TTL.
+        """
+        for topic, payload, ts in batch:
+            items = payload.get("batch") if isinstance(payload, dict) else None
+            if not isinstance(items, list):
+                yield topic, payload, ts
+                continue
+            for item in items:
+                if isinstance(item, dict):
+                    yield topic, item, min(float(item.get("ts") or ts), ts)
+
+    def _screen(self, items: List[Tuple[str, Dict[str, Any], float]]) -> set:
+        """
+        Passa tutte le letture del blocco al rilevatore di anomalie in una
+        sola chiamata; restituisce le coppie (indice messaggio, grandezza) da scartare.
+        """
+        if self.anomalies is None:
+            return set()
+        refs, keys, kinds, values, stamps = [], [], [], [], []
+
+        def add(i: int, kind: str, sensor: str, value: Any, ts: float):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
                 return
+            refs.append((i, kind))
+            keys.append(sensor)
+            kinds.append(kind)
+            values.append(value)
+            stamps.append(ts)
+
+        for i, (topic, payload, ts) in enumerate(items):
+            if not isinstance(payload, dict):
+                continue
+            if "/sensors/" in topic and "type" in payload and "value" in payload:
+                sensor = payload.get("sensor") or topic.rsplit("/", 1)[-1]
+                add(i, payload["type"], f"{payload['type']}/{sensor}", payload["value"], ts)
+            elif topic.endswith("/weather/current"):
+                for k in INPUT_KEYS:
+                    if payload.get(k) is not None:
+                        add(i, k, f"weather/{k}", payload[k], ts)
+
+        codes = self.anomalies.observe(keys, kinds, values, stamps)
+        return {refs[j] for j in codes.nonzero()[0]}
+
+    def _apply(self, state: AgentState, batch: List[Tuple[str, Dict[str, Any], float]],
+               now: float) -> AgentState:
+        cache = dict(state.cache)
+        last_update = dict(state.last_update)
+        changes: Dict[str, Any] = {}
+        dirty = False
+
+        def set_value(key: str, value: Any, ts: float):
+            # Letture recuperate dallo spool arrivano fuori ordine: vince la più recente
+            if ts < last_update.get(key, 0.0):
+                return
+            cache[key] = value
+            last_update[key] = ts
+            self.expiry.touch(key, ts)
 
-            # ------------------------------------------------------
-            # DEMO MODE: attiva/disattiva
-            # ------------------------------------------------------
-            if topic.endswith("/control/test_case"):
-                mode = payload.get("mode", "live")
+        items = list(self._expand_backfill(batch))
+        flagged = self._screen(items)
 
-                if mode == "live":
-                    self.demo_mode = False
-                    self.demo_case_data = None
-                    print("[DecisionAgent] DEMO disattivata → modalità LIVE")
-                    return
+        for i, (topic, payload, ts) in enumerate(items):
+            try:
+                # ------------------------------------------------------
+                # CAMBIO STRATEGIA
+                # ------------------------------------------------------
+                if topic.endswith("/control/strategy"):
+                    new_name = payload.get("strategy", "").lower().strip()
+                    if new_name:
+                        print(f"[DecisionAgent] Cambio strategia → {new_name}")
+                        changes["strategy_name"] = new_name
+                        changes["strategy"] = make_strategy(new_name)
+                    continue
+
+                # ------------------------------------------------------
+                # STRATEGIE CANDIDATE IN OMBRA
+                # ------------------------------------------------------
+                if topic.endswith("/control/shadow"):
+                    names = payload.get("strategies", [])
+                    if isinstance(names, str):
+                        names = names.split(",")
+                    changes["shadow"] = tuple(n.lower().strip() for n in names if n.strip())
+                    continue
+
+                # ------------------------------------------------------
+                # DEMO MODE: attiva/disattiva
+                # ------------------------------------------------------
+                if topic.endswith("/control/test_case"):
+                    mode = payload.get("mode", "live")
+
+                    if mode == "live":
+                        changes["demo_mode"] = False
+                        changes["demo_player"] = None
+                        changes["mode_epoch"] = changes.get("mode_epoch", state.mode_epoch) + 1
+                        print("[DecisionAgent] DEMO disattivata → modalità LIVE")
+                        continue
 
-                if mode == "demo":
-                    case_name = payload.get("case")
-                    case_data = self.load_test_case(case_name)
-                    if case_data:
-                        self.demo_mode = True
-                        self.demo_case_data = case_data
-                        print(f"[DecisionAgent] DEMO ATTIVA → caso '{case_name}'")
-                    return
+                    if mode == "demo":
+                        case_name = payload.get("case")
+                        scenario = self.load_test_case(case_name)
+                        if scenario:
+                            player = scenario.player(ts, payload.get("speedup"))
+                            changes["demo_mode"] = True
+                            changes["demo_player"] = player
+                            changes["mode_epoch"] = changes.get("mode_epoch", state.mode_epoch) + 1
+                            kind = f"serie x{player.speedup:g}" if scenario.is_series else "statico"
+                            print(f"[DecisionAgent] DEMO ATTIVA → caso '{case_name}' ({kind})")
+                        continue
 
-            # Se siamo in DEMO: ignora TUTTI i sensori reali
-            if self.demo_mode:
-                return
+                # Se siamo in DEMO: ignora TUTTI i sensori reali
+                if changes.get("demo_mode", state.demo_mode):
+                    continue
+
+                # ------------------------------------------------------
+                # PREVISIONI METEO (orizzonti pioggia / temperatura)
+                # ------------------------------------------------------
+                if topic.endswith("/weather/forecast"):
+                    forecast = {k: v for k, v in payload.items() if k.startswith("forecast_")}
+                    forecast["forecast_ts"] = payload.get("ts", ts)
+                    changes["forecast"] = forecast
+                    continue
+
+                # ------------------------------------------------------
+                # FEATURE DA IMMAGINI
+                # ------------------------------------------------------
+                if topic.endswith("/images/health"):
+                    vh = payload.get("vegetation_health")
+                    if vh is not None:
+                        set_value("vegetation_health", float(vh), ts)
+                        dirty = True
+                    continue
+
+                # ------------------------------------------------------
+                # SENSORI (temperature / humidity / light)
+                # ------------------------------------------------------
+                if "type" in payload and "value" in payload:
+                    kind = payload["type"]
+                    if kind in cache and (i, kind) not in flagged:
+                        set_value(kind, float(payload["value"]), ts)
+                        dirty = True
+                    continue
+
+                # ------------------------------------------------------
+                # METEO
+                # ------------------------------------------------------
+                if "temperature" in payload and "humidity" in payload:
+                    for k in INPUT_KEYS:
+                        if k in payload and (i, k) not in flagged:
+                            set_value(k, payload[k], ts)
+                    dirty = True
+                    continue
 
-            # ------------------------------------------------------
-            # FEATURE DA IMMAGINI
-            # ------------------------------------------------------
-            if topic.endswith("/images/health"):
-                vh = payload.get("vegetation_health")
-                if vh is not None:
-                    self.cache["vegetation_health"] = float(vh)
-                    self.last_update["vegetation_health"] = now
-                return
+            except Exception as e:
+                print("[DecisionAgent] Errore messaggio MQTT:", e)
 
-            # ------------------------------------------------------
-            # SENSORI (temperature / humidity / light)
-            # ------------------------------------------------------
-            if "type" in payload and "value" in payload:
-                kind = payload["type"]
-                if kind in self.cache:
-                    self.cache[kind] = float(payload["value"])
-                    self.last_update[kind] = now
-                return
+        # Invalida i dati oltre il proprio TTL
+        for k in self.expiry.expire(now):
+            cache[k] = None
+            dirty = True
 
-            # ------------------------------------------------------
-            # METEO
-            # ------------------------------------------------------
-            if "temperature" in payload and "humidity" in payload:
-                for k in self.cache:
-                    if k in payload:
-                        self.cache[k] = payload[k]
-                        self.last_update[k] = now
-                return
+        if not dirty and not changes:
+            return state
+        return state.evolve(cache=cache, last_update=last_update, **changes)
 
+    # ============================================================
+    #  SNAPSHOT SU DISCO / RIAVVIO A CALDO
+    # ============================================================
+    def _capture(self, now: float):
+        """Copia delle finestre mobili per il prossimo snapshot (dal thread di tick)."""
+        self._captured = {
+            "epoch": self._seen_epoch,
+            "rolling": self.rolling_stress.state(),
+        }
+        self._next_capture = now + STATE_SNAPSHOT_SECS
+
+    def save_snapshot(self):
+        with self._snapshot_lock:
+            self._save_snapshot()
+
+    def _save_snapshot(self):
+        snap = self.state.read()
+        player = snap.demo_player
+        state: Dict[str, Any] = {
+            "ts": time.time(),
+            "cache": snap.cache,
+            "last_update": snap.last_update,
+            "strategy_name": snap.strategy_name,
+            "shadow": list(snap.shadow),
+            "forecast": snap.forecast,
+            "demo": None,
+            "seq": self.publisher.seq,
+        }
+        if snap.demo_mode and player is not None:
+            state["demo"] = {"case": player.scenario.name, "start": player.start, "speedup": player.speedup}
+
+        # Finestre solo se copiate nella stessa modalità (LIVE / DEMO) dello stato
+        captured = self._captured
+        if captured is not None and captured["epoch"] == snap.mode_epoch:
+            rolling = captured["rolling"]
+            state["rolling"] = {
+                "last_ts": rolling["last_ts"],
+                "wsi": pack_samples(rolling["wsi"]),
+                "et0": pack_samples(rolling["et0"]),
+            }
+        self.snapshots.save(state)
+
+    def _restore(self):
+        """
+        Stato dall'ultimo snapshot: strategia, candidate in ombra, demo,
+        previsioni, finestre mobili e ultimi valori ancora entro il proprio
+        TTL, così il primo tick può già decidere.
+        """
+        saved = self.snapshots.load() if self.snapshots is not None else None
+        if saved is None:
+            return
+        try:
+            now = time.time()
+            cache = {k: None for k in INPUT_KEYS}
+            last_update = {k: 0.0 for k in INPUT_KEYS}
+            for k in INPUT_KEYS:
+                ts = float((saved.get("last_update") or {}).get(k) or 0.0)
+                value = (saved.get("cache") or {}).get(k)
+                last_update[k] = ts
+                if value is not None:
+                    cache[k] = value
+                    self.expiry.touch(k, ts)
+            expired = self.expiry.expire(now)
+            for k in expired:
+                cache[k] = None
+
+            strategy_name = (saved.get("strategy_name") or self.state.read().strategy_name).lower().strip()
+            player = None
+            demo = saved.get("demo")
+            if demo:
+                scenario = self.load_test_case(demo.get("case"))
+                if scenario is not None:
+                    player = scenario.player(float(demo["start"]), demo.get("speedup"))
+
+            self.state.update(lambda s: s.evolve(
+                cache=cache,
+                last_update=last_update,
+                demo_mode=player is not None,
+                demo_player=player,
+                strategy_name=strategy_name,
+                strategy=make_strategy(strategy_name),
+                forecast=saved.get("forecast") or {},
+                shadow=tuple(saved.get("shadow") or ()),
+            ))
+
+            # Finestre di una demo non più disponibile: meglio ripartire vuote
+            rolling = saved.get("rolling")
+            if rolling and (player is not None) == bool(demo):
+                self.rolling_stress.restore({
+                    "last_ts": rolling.get("last_ts"),
+                    "wsi": unpack_samples(rolling.get("wsi")),
+                    "et0": unpack_samples(rolling.get("et0")),
+                })
+            self.publisher.resume(saved.get("seq") or 0)
+
+            fresh = [k for k in INPUT_KEYS if cache[k] is not None]
+            mode = f"DEMO '{demo['case']}'" if player is not None else "LIVE"
+            print(f"[DecisionAgent] Stato ripristinato da '{self.snapshots.path}' "
+                  f"({now - float(saved.get('ts') or now):.0f}s fa, {mode}, valori validi: {fresh or 'nessuno'})")
         except Exception as e:
-            print("[DecisionAgent] Errore parsing MQTT:", e)
+            print(f"[DecisionAgent] Errore ripristinando lo snapshot: {e}")
 
     # ============================================================
-    #  MAIN LOOP
+    #  CICLO DECISIONALE (eseguito dallo scheduler ogni TICK_SECS)
     # ============================================================
-    def run(self):
-        self.client.loop_start()
-        print("[DecisionAgent] Agente decisionale avviato...")
-
-        while self._running:
-            try:
-                time.sleep(1.0)
-                now = time.time()
-
+    def tick(self):
+        try:
+            now = time.time()
+            # Vista coerente dello stato: un solo riferimento, nessun lock
+            snap = self.state.read()
+
+            if snap.mode_epoch != self._seen_epoch:
+                # Cambio LIVE ↔ DEMO: finestre mobili azzerate, snapshot completo
+                self.rolling_stress.reset()
+                self.publisher.reset()
+                self._seen_epoch = snap.mode_epoch
+            self.estimation.estimator = snap.strategy
+            self.shadow.set_candidates(snap.shadow)
+            if self.snapshots is not None and now >= self._next_capture:
+                self._capture(now)
+
+            # ====================================================
+            # DEMO MODE
+            # ====================================================
+            player = snap.demo_player
+            if snap.demo_mode and player:
+                record = player.sample(now)
+                record["ts"] = now
+
+            else:
                 # ====================================================
-                # DEMO MODE
+                # LIVE MODE
                 # ====================================================
-                if self.demo_mode and self.demo_case_data:
-                    record = self.demo_case_data.copy()
-                    record["ts"] = now
-
-                else:
-                    # ====================================================
-                    # LIVE MODE
-                    # ====================================================
-                    if not all(self.cache[k] is not None for k in ["temperature", "humidity"]):
-                        continue
-
-                    # Invalida dati vecchi (>15 sec)
-                    for k in ["temperature", "humidity"]:
-                        if self.last_update[k] and (now - self.last_update[k] > 15):
-                            self.cache[k] = None
-
-                    if not all(self.cache[k] is not None for k in ["temperature", "humidity"]):
-                        continue
-
-                    record = {
-                        "temperature": self.cache["temperature"],
-                        "humidity": self.cache["humidity"],
-                        "light": self.cache["light"],
-                        "wind_kmh": self.cache["wind_kmh"],
-                        "radiation": self.cache["radiation"],
-                        "vegetation_health": self.cache["vegetation_health"],
-                        "ts": now,
-                    }
+                cache = snap.cache
+                if not all(cache[k] is not None for k in ["temperature", "humidity"]):
+                    return
 
-                # ====================================================
-                # Pipeline AI
-                # ====================================================
+                record = {
+                    "temperature": cache["temperature"],
+                    "humidity": cache["humidity"],
+                    "light": cache["light"],
+                    "wind_kmh": cache["wind_kmh"],
+                    "radiation": cache["radiation"],
+                    "vegetation_health": cache["vegetation_health"],
+                    "ts": now,
+                }
+
+                # Previsioni ancora valide (entro due TTL del provider)
+                forecast = snap.forecast
+                if forecast and now - forecast.get("forecast_ts", 0.0) < 2 * FORECAST_TTL_SECS:
+                    record.update(forecast)
+
+            # ====================================================
+            # Pipeline AI
+            # ====================================================
+            t0 = time.perf_counter()
+            if self._record is not None:
+                self._record.update_from(record)
+                processed = self.pipeline.run(self._record).to_dict()
+            else:
                 processed = self.pipeline.handle(record)
+            pipeline_ms = (time.perf_counter() - t0) * 1000.0
+
+            # Candidate in ombra sullo stesso record: non bloccante per la primaria
+            if self.shadow.active:
+                self.shadow.evaluate(processed, pipeline_ms, now)
+
+            fallback = bool((processed.get("suggestion") or {}).get("fallback"))
+            if fallback != self._in_fallback:
+                self._in_fallback = fallback
+                if fallback:
+                    cause = processed["suggestion"].get("fallback_cause")
+                    print(f"[DecisionAgent] Strategia '{snap.strategy_name}' oltre il budget ({cause}): "
+                          f"decisioni da simple_rules")
+                else:
+                    print(f"[DecisionAgent] Strategia '{snap.strategy_name}' di nuovo entro il budget")
 
-                # ====================================================
-                # Pubblica decisione
-                # ====================================================
-                out_topic = f"greenfield/{FIELD_ID}/decisions"
-                self.client.publish(out_topic, json.dumps(processed), qos=0)
-
-                # Webhook n8n
-                if N8N_WEBHOOK_URL:
-                    try:
-                        requests.post(N8N_WEBHOOK_URL, json=processed, timeout=2)
-                    except Exception:
-                        pass
+            # ====================================================
+            # Pubblica decisione (soppressa se nulla è cambiato)
+            # ====================================================
+            msg = self.publisher.next_message(processed, now)
+            if msg is None:
+                return
 
-            except Exception as e:
-                print("[DecisionAgent] Errore loop:", e)
+            out_topic = f"greenfield/{FIELD_ID}/decisions"
+            # Retained solo gli snapshot completi: chi si collega parte da uno stato intero,
+            # ma vecchio fino a DECISION_HEARTBEAT_SECS; i delta successivi non coprono
+            # le modifiche intermedie, che tornano allineate al prossimo heartbeat
+            self.client.publish(out_topic, json.dumps(msg), qos=0,
+                                retain=RETAIN_LAST_VALUES and msg["kind"] == "full")
+
+            # Tasso di deadline mancate, aggiornato ad ogni snapshot completo
+            if msg["kind"] == "full":
+                self.client.publish(f"{out_topic}/estimation", json.dumps(self.estimation.deadline_stats()),
+                                    qos=0, retain=True)
+
+            # Webhook n8n: solo nuovi suggerimenti e heartbeat
+            if N8N_WEBHOOK_URL and self.publisher.suggestion_changed(msg):
+                try:
+                    requests.post(N8N_WEBHOOK_URL, json=processed, timeout=2)
+                except Exception:
+                    pass
 
-        self.client.loop_stop()
+        except Exception as e:
+            print("[DecisionAgent] Errore loop:", e)
 
     # ============================================================
-    #  Arresto sicuro
+    #  Avvio / arresto
     # ============================================================
+    def start(self):
+        if self._task is not None:
+            return
+        self.client.loop_start()
+        print("[DecisionAgent] Agente decisionale avviato...")
+        self._ingest_task = self.scheduler.schedule_periodic(
+            self.ingest, INGEST_INTERVAL_SECS, name="decision-ingest")
+        # Primo tick appena ingeriti i valori retained: con lo stato ripristinato
+        # la prima decisione arriva in frazioni di secondo
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, self.TICK_SECS, first_delay=min(self.TICK_SECS, 2 * INGEST_INTERVAL_SECS),
+            name="decision")
+        if self.snapshots is not None and STATE_SNAPSHOT_SECS > 0:
+            self._snapshot_task = self.scheduler.schedule_periodic(
+                self.save_snapshot, STATE_SNAPSHOT_SECS, first_delay=STATE_SNAPSHOT_SECS,
+                name="decision-snapshot")
+
     def stop(self):
-        self._running = False
+        for task in (self._task, self._ingest_task, self._snapshot_task):
+            if task is not None:
+                self.scheduler.cancel(task)
+        self._task = self._ingest_task = self._snapshot_task = None
+        if self.snapshots is not None:
+            # Snapshot finale: il riavvio riparte dallo stato più recente
+            try:
+                self._capture(time.time())
+                self.save_snapshot()
+            except Exception as e:
+                print(f"[DecisionAgent] Errore salvando lo snapshot: {e}")
+        self.shadow.shutdown()
+        self.estimation.shutdown()
+        self.client.loop_stop()
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..ai.strategies import make_strategy
+from ..common.mqtt_bus import arrival_ts, make_client
+from ..common.config import (
+    AI_STRATEGY, ANOMALY_DETECTION, DECISION_HEARTBEAT_SECS, FLEET_CAPACITY, FLEET_TICK_SECS,
+    INGEST_INTERVAL_SECS, INGEST_QUEUE_MAX, RETAIN_LAST_VALUES, STALENESS_TTL_SECS, STALENESS_TTLS,
+)
+from ..common.field_store import INPUT_KEYS, FieldStore
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..common.snapshot import IngestQueue
+from ..pipeline.anomaly import AnomalyDetector
+from ..pipeline.vectorized import BATCH_FEATURES
+
+
+# ============================================================
+#  FleetDecisionAgent – decisioni di tutti i campi in un processo
+# ============================================================
+
+class FleetDecisionAgent:
+    """
+    Variante multi-campo del DecisionAgent (FLEET_MODE=true): un solo
+    processo segue i sensori di tutti i campi e tiene lo stato in un
+    FieldStore a colonne.
+
+    - _on_message accoda soltanto (thread di rete)
+    - ingest() raggruppa le letture per grandezza e le scrive nello store
+      con una chiamata vettoriale per grandezza
+    - tick() fa scadere i valori oltre il TTL, valuta in un'unica passata
+      tutti i campi sporchi e pubblica uno snapshot completo su
+      greenfield/<campo>/decisions solo se la decisione cambia o è dovuto
+      l'heartbeat (stesso formato letto da DecisionStateDecoder)
+
+    La catena completa (finestre mobili, previsioni, budget di latenza,
+    modalità demo) resta nel DecisionAgent per campo: qui decide
+    estimate_batch della strategia sulle feature di features_batch.
+    """
+
+    def __init__(self, scheduler: Optional[Scheduler] = None, store: Optional[FieldStore] = None):
+        self.scheduler = scheduler or get_scheduler()
+        self.store = store or FieldStore(FLEET_CAPACITY)
+        self.strategy = self._batch_strategy((AI_STRATEGY or "simple_rules").lower().strip())
+        self.anomalies = AnomalyDetector() if ANOMALY_DETECTION else None
+        self.ingest_queue = IngestQueue(INGEST_QUEUE_MAX)
+        # ingest() e tick() girano su worker diversi dello scheduler
+        self._lock = threading.Lock()
+        self._task: Optional[ScheduledTask] = None
+        self._ingest_task: Optional[ScheduledTask] = None
+        self._reported_drops = 0
+
+        self.client = make_client("fleet")
+        self.client.on_message = self._on_message
+        self.client.subscribe("greenfield/+/sensors/+/+", qos=0)
+        self.client.subscribe("greenfield/+/weather/current", qos=0)
+        self.client.subscribe("greenfield/+/images/health", qos=0)
+
+    @staticmethod
+    def _batch_strategy(name: str):
+        """
+        Strategia valutabile su features_batch: se ne usa altre (VPD, ET0
+        cumulata, previsioni) decide simple_rules, con un avviso, invece di
+        regole degradate in silenzio.
+        """
+        strategy = make_strategy(name)
+        missing = [k for k in strategy.extra_features if k not in BATCH_FEATURES]
+        if missing:
+            print(f"[FleetAgent] Strategia '{strategy.name}' non supportata in modalità multi-campo "
+                  f"(feature non calcolate: {', '.join(missing)}): uso simple_rules")
+            strategy = make_strategy("simple_rules")
+        return strategy
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload.decode("utf-8"))
+        except Exception as e:
+            print("[FleetAgent] Errore parsing MQTT:", e)
+            return
+        self.ingest_queue.put((msg.topic, payload, arrival_ts(msg, payload)))
+
+    # ============================================================
+    #  INGESTIONE
+    # ============================================================
+    def ingest(self):
+        batch = self.ingest_queue.drain()
+        if batch:
+            with self._lock:
+                self._apply(batch)
+
+        dropped = self.ingest_queue.dropped
+        if dropped != self._reported_drops:
+            print(f"[FleetAgent] Coda di ingestione piena: {dropped - self._reported_drops} "
+                  f"messaggi scartati (totale {dropped})")
+            self._reported_drops = dropped
+
+    def _apply(self, batch: List[Tuple[str, Any, float]]):
+        # Colonne per grandezza: campo, sensore, valore, ts
+        cols: Dict[str, Tuple[list, list, list, list]] = defaultdict(lambda: ([], [], [], []))
+
+        def add(field_id: str, key: str, sensor: str, value: Any, ts: float):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return
+            c = cols[key]
+            c[0].append(field_id)
+            c[1].append(sensor)
+            c[2].append(value)
+            c[3].append(ts)
+
+        for topic, payload, ts in batch:
+            if not isinstance(payload, dict):
+                continue
+            parts = topic.split("/")
+            field_id = parts[1]
+            # Backfill dallo spool dei publisher: una lettura per elemento
+            items = payload.get("batch")
+            readings = [(p, min(float(p.get("ts") or ts), ts)) for p in items if isinstance(p, dict)] \
+                if isinstance(items, list) else [(payload, ts)]
+
+            for p, rts in readings:
+                if parts[2] == "sensors":
+                    kind = p.get("type")
+                    if kind in INPUT_KEYS and "value" in p:
+                        add(field_id, kind, f"{field_id}/{kind}/{p.get('sensor') or parts[-1]}", p["value"], rts)
+                elif parts[2] == "weather":
+                    for k in INPUT_KEYS:
+                        if p.get(k) is not None:
+                            add(field_id, k, f"{field_id}/weather/{k}", p[k], rts)
+                elif parts[2] == "images" and p.get("vegetation_health") is not None:
+                    add(field_id, "vegetation_health", f"{field_id}/images", p["vegetation_health"], rts)
+
+        for key, (fields, sensors, values, stamps) in cols.items():
+            if self.anomalies is not None and key != "vegetation_health":
+                codes = self.anomalies.observe(sensors, [key] * len(sensors), values, stamps)
+                keep = [j for j in range(len(fields)) if not codes[j]]
+                if len(keep) < len(fields):
+                    fields = [fields[j] for j in keep]
+                    values = [values[j] for j in keep]
+                    stamps = [stamps[j] for j in keep]
+            self.store.set_many(self.store.rows(fields), key, values, stamps)
+
+        if self.anomalies is not None:
+            by_field: Dict[str, list] = defaultdict(list)
+            for e in self.anomalies.pop_events():
+                by_field[e["sensor"].split("/", 1)[0]].append(e)
+            now = time.time()
+            for field_id, events in by_field.items():
+                self.client.publish(f"greenfield/{field_id}/anomalies",
+                                    json.dumps({"ts": now, "events": events}), qos=0)
+
+    # ============================================================
+    #  CICLO DECISIONALE
+    # ============================================================
+    def tick(self):
+        try:
+            now = time.time()
+            store = self.store
+            with self._lock:
+                store.expire(now, STALENESS_TTLS, STALENESS_TTL_SECS)
+                result = store.evaluate(self.strategy, now)
+
+                # Snapshot completi: decisione cambiata oppure heartbeat dovuto
+                due = set(result["changed"].tolist())
+                due.update(store.heartbeat_due(now, DECISION_HEARTBEAT_SECS).tolist())
+                now_rel = now - store.epoch
+                messages = []
+                for i in sorted(due):
+                    store.seq[i] += 1
+                    store.full_ts[i] = now_rel
+                    msg = store.record(i)
+                    msg["kind"] = "full"
+                    msg["seq"] = int(store.seq[i])
+                    messages.append((f"greenfield/{store.ids[i]}/decisions", json.dumps(msg)))
+
+            for topic, body in messages:
+                self.client.publish(topic, body, qos=0, retain=RETAIN_LAST_VALUES)
+        except Exception as e:
+            print("[FleetAgent] Errore loop:", e)
+
+    # ============================================================
+    #  Avvio / arresto
+    # ============================================================
+    def start(self):
+        if self._task is not None:
+            return
+        self.client.loop_start()
+        print(f"[FleetAgent] Decisioni multi-campo avviate (strategia {self.strategy.name})...")
+        self._ingest_task = self.scheduler.schedule_periodic(
+            self.ingest, INGEST_INTERVAL_SECS, name="fleet-ingest")
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, FLEET_TICK_SECS, first_delay=FLEET_TICK_SECS, name="fleet")
+
+    def stop(self):
+        for task in (self._task, self._ingest_task):
+            if task is not None:
+                self.scheduler.cancel(task)
+        self._task = self._ingest_task = None
+        self.client.loop_stop()
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from ..common.mqtt_bus import make_client
+from ..common.history import HistorySink
+from ..common.publish_policy import DecisionStateDecoder
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+
+
+# ============================================================
+#  HistoryAgent – archivio Parquet delle decisioni di tutti i campi
+# ============================================================
+
+class HistoryAgent:
+    """
+    Sottoscrive greenfield/+/decisions, ricostruisce lo stato completo di
+    ogni campo da snapshot e delta e lo accoda in un HistorySink.
+    Un task periodico scrive i buffer pronti e, al cambio di giorno UTC,
+    compatta le partizioni dei giorni chiusi.
+    """
+
+    # Periodo di controllo dei buffer (secondi)
+    FLUSH_CHECK_SECS = 5.0
+
+    def __init__(self, sink: Optional[HistorySink] = None, scheduler: Optional[Scheduler] = None):
+        self.sink = sink or HistorySink()
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
+        self._decoders: Dict[str, DecisionStateDecoder] = {}
+        self._compacted_day: Optional[str] = None
+
+        self.client = make_client("history")
+        self.client.on_message = self._on_message
+        self.client.subscribe("greenfield/+/decisions", qos=0)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload.decode("utf-8"))
+        except Exception as e:
+            print("[HistoryAgent] Errore parsing MQTT:", e)
+            return
+
+        field_id = msg.topic.split("/")[1]
+        decoder = self._decoders.get(field_id)
+        if decoder is None:
+            decoder = self._decoders[field_id] = DecisionStateDecoder()
+        state = decoder.apply(payload)
+        if state is not None:
+            self.sink.append(field_id, state)
+
+    def tick(self):
+        try:
+            self.sink.flush_due()
+            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            if today != self._compacted_day:
+                n = self.sink.compact(before=today)
+                if n:
+                    print(f"[HistoryAgent] Compattate {n} partizioni")
+                self._compacted_day = today
+        except Exception as e:
+            print("[HistoryAgent] Errore loop:", e)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.client.loop_start()
+        print(f"[HistoryAgent] Storico decisioni in '{self.sink.root}'")
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, self.FLUSH_CHECK_SECS, first_delay=self.FLUSH_CHECK_SECS, name="history")
+
+    def stop(self):
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+        self.client.loop_stop()
+        written = self.sink.flush()
+        if written:
+            print(f"[HistoryAgent] Scritte {written} decisioni in chiusura")
@@ -1,52 +1,157 @@
 # src/agents/image_agent.py
 
+import os
 import time
 import json
 import random
-import threading
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
 
 from ..common.mqtt_bus import make_client
-from ..common.config import FIELD_ID, SENSOR_PUBLISH_INTERVAL_SECS
+from ..common.config import (
+    FIELD_ID, SENSOR_PUBLISH_INTERVAL_SECS, SCHEDULER_JITTER_SECS,
+    IMAGE_INPUT_DIR, IMAGE_BANDS, IMAGE_ZONES, IMAGE_TILE_PX, IMAGE_WORKERS, RETAIN_LAST_VALUES,
+)
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..common.synthetic import get_live_synthetic
+from ..ai.vegetation import analyze_raster, open_raster, raw_meta
+from ..ai.image_pool import ImageAnalysisPool
+
+# Estensioni raster riconosciute nella cartella di input
+IMAGE_EXTENSIONS = (".npy", ".raw", ".bin", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
 
 
-class ImageAgent(threading.Thread):
+class ImageAgent:
     """
     Simula un analizzatore di immagini del campo.
     In un sistema reale, questo agente riceverebbe immagini (es. da drone o camera fissa),
     le processerebbe con un modello di Computer Vision e pubblicherebbe feature aggregate
     come un indice di salute della vegetazione.
 
-    Qui simuliamo un valore vegetation_health ∈ [0, 1].
+    Se IMAGE_INPUT_DIR è configurata, ogni nuovo raster (RGB o multispettrale)
+    depositato nella cartella viene analizzato con indici ExG / NDVI
+    vettorizzati (src/ai/vegetation.py), a blocchi tramite memmap.
+    Altrimenti simuliamo un valore vegetation_health ∈ [0, 1].
+
+    Per i file .raw/.bin serve un file gemello <nome>.json con
+    {"shape": [H, W, C], "dtype": "uint8"}.
+
+    Con IMAGE_WORKERS > 0 i nuovi frame di ogni tick formano un batch
+    analizzato in parallelo da ImageAnalysisPool (processi, cache per hash
+    di contenuto) e il risultato aggregato viene pubblicato in ordine.
     """
 
-    def __init__(self):
-        super().__init__(daemon=True)
+    def __init__(self, scheduler: Optional[Scheduler] = None):
         self.client = make_client("image")
         # Topic dedicato alle feature estratte dalle immagini
         self.topic = f"greenfield/{FIELD_ID}/images/health"
-        self._running = True
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
+        self.input_dir = IMAGE_INPUT_DIR
+        # File già analizzati: path → mtime
+        self._seen: Dict[str, float] = {}
+        self.pool: Optional[ImageAnalysisPool] = (
+            ImageAnalysisPool(workers=IMAGE_WORKERS) if self.input_dir and IMAGE_WORKERS > 0 else None
+        )
+        self.synthetic = get_live_synthetic()
 
     def generate_features(self) -> Dict[str, Any]:
         """
-        Genera un valore fittizio di salute vegetazione.
-        Possiamo simulare una leggera variabilità nel tempo.
+        Genera un valore fittizio di salute vegetazione: dalla serie simulata
+        del campo (cala con lo stress idrico dei giorni precedenti) oppure uniforme.
         """
-        vegetation_health = random.uniform(0.4, 0.95)  # 0 = pessima, 1 = ottima salute
+        now = time.time()
+        if self.synthetic is not None:
+            vegetation_health = min(1.0, max(0.0, self.synthetic.reading("vegetation_health", FIELD_ID, now)))
+        else:
+            vegetation_health = random.uniform(0.4, 0.95)  # 0 = pessima, 1 = ottima salute
         return {
-            "image_id": f"img-{int(time.time())}",
+            "image_id": f"img-{int(now)}",
             "vegetation_health": round(vegetation_health, 3),
-            "ts": time.time(),
+            "ts": now,
         }
 
-    def run(self):
-        print("[ImageAgent] Avviato. Pubblico feature immagini simulate...")
-        while self._running:
+    # ---------------------------------------------------------
+    # Analisi di immagini reali
+    # ---------------------------------------------------------
+    def analyze_image(self, source: Union[str, np.ndarray], image_id: Optional[str] = None) -> Dict[str, Any]:
+        """Analizza un raster (array NumPy o path su disco) e restituisce le feature."""
+        if isinstance(source, str):
+            raster = open_raster(source, **raw_meta(source))
+            image_id = image_id or os.path.basename(source)
+        else:
+            raster = source
+        features = analyze_raster(raster, bands=IMAGE_BANDS, zones=IMAGE_ZONES, tile=IMAGE_TILE_PX)
+        features["image_id"] = image_id or f"img-{int(time.time())}"
+        features["ts"] = time.time()
+        return features
+
+    def _pending_files(self) -> List[str]:
+        """Raster nuovi o modificati nella cartella di input, dal più vecchio."""
+        try:
+            entries = [e for e in os.scandir(self.input_dir)
+                       if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS)]
+        except OSError:
+            return []
+        pending = [e for e in entries if self._seen.get(e.path) != e.stat().st_mtime]
+        pending.sort(key=lambda e: e.stat().st_mtime)
+        return [e.path for e in pending]
+
+    def tick(self):
+        if not self.input_dir:
             data = self.generate_features()
-            self.client.publish(self.topic, json.dumps(data), qos=0, retain=False)
-            # Frequenza più lenta rispetto ai sensori classici
-            time.sleep(SENSOR_PUBLISH_INTERVAL_SECS * 3)
+            self.client.publish(self.topic, json.dumps(data), qos=0, retain=RETAIN_LAST_VALUES)
+            return
+
+        pending = self._pending_files()
+        if self.pool is not None:
+            batch = []
+            for path in pending:
+                try:
+                    self._seen[path] = os.stat(path).st_mtime
+                except OSError as e:
+                    # File rimosso tra la scansione e l'invio
+                    print(f"[ImageAgent] Errore analizzando '{path}': {e}")
+                    continue
+                batch.append(path)
+            if batch:
+                self.pool.submit_batch(FIELD_ID, batch, self._publish_batch)
+            return
+
+        for path in pending:
+            try:
+                self._seen[path] = os.stat(path).st_mtime
+                data = self.analyze_image(path)
+            except Exception as e:
+                print(f"[ImageAgent] Errore analizzando '{path}': {e}")
+                continue
+            self.client.publish(self.topic, json.dumps(data), qos=0, retain=RETAIN_LAST_VALUES)
+
+    def _publish_batch(self, field_id: str, aggregate: Dict[str, Any]):
+        if aggregate.get("vegetation_health") is None:
+            return
+        aggregate["image_id"] = f"batch-{int(time.time())}"
+        aggregate["ts"] = time.time()
+        topic = f"greenfield/{field_id}/images/health"
+        self.client.publish(topic, json.dumps(aggregate), qos=0, retain=RETAIN_LAST_VALUES)
+
+    def start(self):
+        if self._task is not None:
+            return
+        if self.input_dir:
+            print(f"[ImageAgent] Avviato. Analizzo le immagini in '{self.input_dir}'...")
+        else:
+            print("[ImageAgent] Avviato. Pubblico feature immagini simulate...")
+        # Frequenza più lenta rispetto ai sensori classici
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, SENSOR_PUBLISH_INTERVAL_SECS * 3,
+            jitter=SCHEDULER_JITTER_SECS, name="image")
 
     def stop(self):
-        self._running = False
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
         print("[ImageAgent] Arresto richiesto.")
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..ai.irrigation import IrrigationPlanner
+from ..common.mqtt_bus import make_client
+from ..common.config import IRRIGATION_MAX_AGE_SECS, IRRIGATION_PLAN_SECS
+from ..common.publish_policy import DecisionStateDecoder
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+
+
+PLAN_TOPIC = "greenfield/irrigation/plan"
+
+
+# ============================================================
+#  IrrigationAgent – piano condiviso tra le zone
+# ============================================================
+
+class IrrigationAgent:
+    """
+    Sottoscrive greenfield/+/decisions e tiene l'ultimo suggerimento di ogni
+    zona; ogni IRRIGATION_PLAN_SECS ricalcola il piano di tutte le zone con
+    budget idrico e pompa condivisi (IrrigationPlanner).
+
+    Pubblica messaggi retained:
+    - greenfield/irrigation/plan          : riepilogo del ciclo di pianificazione
+    - greenfield/<campo>/irrigation/plan  : piano della zona, solo se cambiato;
+      payload vuoto quando la zona esce dal piano
+    """
+
+    def __init__(self, planner: Optional[IrrigationPlanner] = None,
+                 scheduler: Optional[Scheduler] = None):
+        self.planner = planner or IrrigationPlanner()
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
+        self._decoders: Dict[str, DecisionStateDecoder] = {}
+        self._zones: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._published: Dict[str, str] = {}
+
+        self.client = make_client("irrigation")
+        self.client.on_message = self._on_message
+        self.client.subscribe("greenfield/+/decisions", qos=0)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload.decode("utf-8"))
+        except Exception as e:
+            print("[IrrigationAgent] Errore parsing MQTT:", e)
+            return
+
+        field_id = msg.topic.split("/")[1]
+        decoder = self._decoders.get(field_id)
+        if decoder is None:
+            decoder = self._decoders[field_id] = DecisionStateDecoder()
+        state = decoder.apply(payload)
+        if state is None:
+            return
+        suggestion = state.get("suggestion") or {}
+        with self._lock:
+            self._zones[field_id] = {
+                "field_id": field_id,
+                "ts": float(state.get("ts") or time.time()),
+                "action": suggestion.get("action"),
+                "volume_l_m2": suggestion.get("volume_l_m2"),
+                "water_stress_index": state.get("water_stress_index"),
+                "vegetation_health": state.get("vegetation_health"),
+            }
+
+    def tick(self):
+        try:
+            now = time.time()
+            with self._lock:
+                zones = [z for z in self._zones.values() if now - z["ts"] <= IRRIGATION_MAX_AGE_SECS]
+            if not zones and not self._published:
+                return
+
+            plan = self.planner.plan(zones, now)
+            self.client.publish(PLAN_TOPIC, json.dumps(plan["summary"]), qos=0, retain=True)
+
+            # Zone uscite dal piano (decisioni troppo vecchie): payload vuoto
+            # retained = cancellazione del piano rimasto sul broker
+            for field_id in [f for f in self._published if f not in plan["zones"]]:
+                self.client.publish(f"greenfield/{field_id}/irrigation/plan", b"", qos=0, retain=True)
+                del self._published[field_id]
+
+            for field_id, zone_plan in plan["zones"].items():
+                body = json.dumps(zone_plan)
+                if self._published.get(field_id) == body:
+                    continue
+                self.client.publish(f"greenfield/{field_id}/irrigation/plan", body, qos=0, retain=True)
+                self._published[field_id] = body
+        except Exception as e:
+            print("[IrrigationAgent] Errore loop:", e)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.client.loop_start()
+        print("[IrrigationAgent] Pianificazione irrigazione avviata...")
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, IRRIGATION_PLAN_SECS, first_delay=IRRIGATION_PLAN_SECS, name="irrigation")
+
+    def stop(self):
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+        self.client.loop_stop()
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..common.mqtt_bus import make_client
+from ..common.config import DECISION_HEARTBEAT_SECS, ROLLUP_PUBLISH_SECS
+from ..common.publish_policy import DecisionStateDecoder
+from ..common.rollups import RollupStore
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..pipeline.features import window_label
+
+
+OVERVIEW_TOPIC = "greenfield/overview"
+
+
+# ============================================================
+#  RollupAgent – aggregati server-side per la panoramica campi
+# ============================================================
+
+class RollupAgent:
+    """
+    Sottoscrive greenfield/+/decisions e tiene l'ultimo stato decodificato
+    di ogni campo; a ogni tick (ROLLUP_PUBLISH_SECS) lo campiona nei rollup
+    (1 minuto, 1 ora). Il campionamento a cadenza fissa pesa ogni stato per
+    la sua durata: in modalità delta i messaggi arrivano solo ai cambi e
+    contarli uno per uno sovrappeserebbe i periodi più variabili. Un campo
+    senza messaggi da due heartbeat non viene più campionato.
+
+    Pubblica messaggi retained, così la dashboard li riceve appena si collega:
+    - greenfield/overview                : una riga pronta per campo, ogni ROLLUP_PUBLISH_SECS
+    - greenfield/<campo>/rollups/<res>   : serie del campo, solo quando si chiude un bucket
+    """
+
+    def __init__(self, store: Optional[RollupStore] = None, scheduler: Optional[Scheduler] = None):
+        self.store = store or RollupStore()
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
+        self._decoders: Dict[str, DecisionStateDecoder] = {}
+        self._published: Dict[Tuple[str, int], float] = {}
+        # Ultimo stato per campo e istante di arrivo (thread MQTT → tick)
+        self._latest: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+        self.client = make_client("rollup")
+        self.client.on_message = self._on_message
+        self.client.subscribe("greenfield/+/decisions", qos=0)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload.decode("utf-8"))
+        except Exception as e:
+            print("[RollupAgent] Errore parsing MQTT:", e)
+            return
+
+        field_id = msg.topic.split("/")[1]
+        decoder = self._decoders.get(field_id)
+        if decoder is None:
+            decoder = self._decoders[field_id] = DecisionStateDecoder()
+        state = decoder.apply(payload)
+        if state is not None:
+            with self._lock:
+                self._latest[field_id] = (state, time.time())
+
+    def sample(self, now: float):
+        """Un campione per campo con stato recente, all'istante `now`."""
+        max_age = 2 * DECISION_HEARTBEAT_SECS
+        with self._lock:
+            for field_id in [f for f, (_, seen) in self._latest.items() if now - seen > max_age]:
+                del self._latest[field_id]
+            fresh = list(self._latest.items())
+        for field_id, (state, _) in fresh:
+            self.store.add(field_id, state, now)
+
+    def tick(self):
+        try:
+            now = time.time()
+            self.sample(now)
+            overview = {"ts": now, "fields": self.store.overview(now)}
+            self.client.publish(OVERVIEW_TOPIC, json.dumps(overview), qos=0, retain=True)
+
+            # Serie di drill-down: ripubblicate solo alla chiusura di un bucket
+            for (field_id, res), start in self.store.closed(now).items():
+                if self._published.get((field_id, res)) == start:
+                    continue
+                series = self.store.series(field_id, res)
+                topic = f"greenfield/{field_id}/rollups/{window_label(res)}"
+                self.client.publish(topic, json.dumps(series), qos=0, retain=True)
+                self._published[(field_id, res)] = start
+        except Exception as e:
+            print("[RollupAgent] Errore loop:", e)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.client.loop_start()
+        print("[RollupAgent] Rollup decisioni avviati...")
+        self._task = self.scheduler.schedule_periodic(
+            self.tick, ROLLUP_PUBLISH_SECS, first_delay=ROLLUP_PUBLISH_SECS, name="rollup")
+
+    def stop(self):
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+        self.client.loop_stop()
@@ -1,18 +1,34 @@
-import time, json, random, threading
-from typing import Dict
+import time, json, random
+from typing import Dict, Optional
 from ..common.mqtt_bus import make_client
-from ..common.config import SENSOR_PUBLISH_INTERVAL_SECS, FIELD_ID
+from ..common.config import SENSOR_PUBLISH_INTERVAL_SECS, SCHEDULER_JITTER_SECS, FIELD_ID, RETAIN_LAST_VALUES
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..common.spool import make_spooled_publisher
+from ..common.synthetic import get_live_synthetic
 
-class SensorAgent(threading.Thread):
-    def __init__(self, name: str, kind: str):
-        super().__init__(daemon=True)
+# Intervallo di recupero del backlog su disco (solo con SPOOL_DIR)
+SPOOL_DRAIN_SECS = 1.0
+
+class SensorAgent:
+    def __init__(self, name: str, kind: str, scheduler: Optional[Scheduler] = None):
         self.name = name
         self.kind = kind  # temperature | humidity | light
-        self.client = make_client(f"sensor-{name}")
+        self.client = make_client(f"sensor-{name}", lazy=True)
+        # Store-and-forward su disco durante le disconnessioni (None se disattivato)
+        self.spool = make_spooled_publisher(self.client, f"sensor-{name}")
         self.topic = f"greenfield/{FIELD_ID}/sensors/{self.kind}/{self.name}"
-        self._running = True
+        self.scheduler = scheduler or get_scheduler()
+        self._task: Optional[ScheduledTask] = None
+        self._drain_task: Optional[ScheduledTask] = None
+        # Serie simulate correlate e con ciclo diurno (None = valori uniformi)
+        self.synthetic = get_live_synthetic()
 
     def generate_reading(self) -> Dict:
+        now = time.time()
+        if self.synthetic is not None:
+            value = self.synthetic.reading(self.kind, FIELD_ID, now)
+            return {"sensor": self.name, "type": self.kind, "value": round(value, 2), "ts": now}
+
         if self.kind == "temperature":
             value = random.uniform(12.0, 35.0)
         elif self.kind == "humidity":
@@ -21,13 +37,30 @@ class SensorAgent(threading.Thread):
             value = random.uniform(100.0, 1800.0)
         else:
             value = random.uniform(0.0, 1.0)
-        return {"sensor": self.name, "type": self.kind, "value": round(value, 2), "ts": time.time()}
+        return {"sensor": self.name, "type": self.kind, "value": round(value, 2), "ts": now}
+
+    def tick(self):
+        reading = self.generate_reading()
+        if self.spool is not None:
+            self.spool.publish(self.topic, reading, retain=RETAIN_LAST_VALUES)
+        else:
+            self.client.publish(self.topic, json.dumps(reading), qos=0, retain=RETAIN_LAST_VALUES)
 
-    def run(self):
-        while self._running:
-            reading = self.generate_reading()
-            self.client.publish(self.topic, json.dumps(reading), qos=0, retain=False)
-            time.sleep(SENSOR_PUBLISH_INTERVAL_SECS)
+    def start(self):
+        if self._task is None:
+            self.client.loop_start()
+            self._task = self.scheduler.schedule_periodic(
+                self.tick, SENSOR_PUBLISH_INTERVAL_SECS,
+                jitter=SCHEDULER_JITTER_SECS, name=f"sensor-{self.name}")
+        if self.spool is not None and self._drain_task is None:
+            self._drain_task = self.scheduler.schedule_periodic(
+                self.spool.drain, SPOOL_DRAIN_SECS, name=f"sensor-{self.name}-spool")
 
     def stop(self):
-        self._running = False
+        for task in (self._task, self._drain_task):
+            if task is not None:
+                self.scheduler.cancel(task)
+        self._task = self._drain_task = None
+        self.client.loop_stop()
+        if self.spool is not None:
+            self.spool.close()
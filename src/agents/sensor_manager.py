@@ -1,18 +1,18 @@
 # src/agents/sensor_manager.py
 
-import threading
 import json
 import time
-from typing import Dict
+from typing import Dict, Optional
 
 from paho.mqtt.client import Client as MqttClient
 
 from ..common.mqtt_bus import make_client
 from ..common.config import FIELD_ID
+from ..common.scheduler import Scheduler, get_scheduler
 from .sensor_agent import SensorAgent
 
 
-class SensorManager(threading.Thread):
+class SensorManager:
     """
     Responsabile di:
     - creare / gestire i sensori dinamici (add/remove)
@@ -20,11 +20,13 @@ class SensorManager(threading.Thread):
     Topic di controllo:
       - IN  : greenfield/{FIELD_ID}/control/sensors
       - OUT : greenfield/{FIELD_ID}/control/sensors/active
+
+    I comandi arrivano via callback MQTT e i sensori girano sullo scheduler
+    condiviso: il manager non ha un proprio thread di polling.
     """
 
-    def __init__(self):
-        super().__init__(daemon=True)
-        self._running = True
+    def __init__(self, scheduler: Optional[Scheduler] = None):
+        self.scheduler = scheduler or get_scheduler()
 
         # Mappa: id_sensore -> SensorAgent
         self.sensors: Dict[str, SensorAgent] = {}
@@ -81,7 +83,7 @@ class SensorManager(threading.Thread):
             print(f"[SensorManager] Sensore {sensor_id} già esistente.")
             return
 
-        sensor = SensorAgent(sensor_id, sensor_type)
+        sensor = SensorAgent(sensor_id, sensor_type, scheduler=self.scheduler)
         sensor.start()
         self.sensors[sensor_id] = sensor
 
@@ -103,9 +105,9 @@ class SensorManager(threading.Thread):
         self._publish_active_sensors()
 
     # ---------------------------------------------------------
-    # Thread lifecycle
+    # Ciclo di vita
     # ---------------------------------------------------------
-    def run(self):
+    def start(self):
         # Sottoscrivo ai comandi
         self.client.subscribe(self.control_topic, qos=0)
 
@@ -124,15 +126,9 @@ class SensorManager(threading.Thread):
         self.client.loop_start()
         print("[SensorManager] Avviato. In ascolto dei comandi sensori...")
 
-        try:
-            while self._running:
-                time.sleep(1.0)
-        finally:
-            self.client.loop_stop()
-            # Stoppa tutti i sensori attivi
-            for s in self.sensors.values():
-                s.stop()
-            print("[SensorManager] Arrestato.")
-
     def stop(self):
-        self._running = False
+        self.client.loop_stop()
+        # Stoppa tutti i sensori attivi
+        for s in list(self.sensors.values()):
+            s.stop()
+        print("[SensorManager] Arrestato.")
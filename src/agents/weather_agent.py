@@ -1,25 +1,82 @@
-import time, json, random, threading
+import time, json, random
+from typing import Optional
 from ..common.mqtt_bus import make_client
-from ..common.config import FIELD_ID, SENSOR_PUBLISH_INTERVAL_SECS
+from ..common.config import (
+    FIELD_ID, FIELD_LAT, FIELD_LON, SENSOR_PUBLISH_INTERVAL_SECS, SCHEDULER_JITTER_SECS,
+    FORECAST_PUBLISH_SECS, RETAIN_LAST_VALUES,
+)
+from ..common.scheduler import Scheduler, ScheduledTask, get_scheduler
+from ..common.forecast import ForecastProvider, get_forecast_provider
+from ..common.spool import make_spooled_publisher
+from ..common.synthetic import get_live_synthetic
+from .sensor_agent import SPOOL_DRAIN_SECS
 
-class WeatherAgent(threading.Thread):
-    def __init__(self):
-        super().__init__(daemon=True)
-        self.client = make_client("weather")
+class WeatherAgent:
+    def __init__(self, scheduler: Optional[Scheduler] = None,
+                 forecast: Optional[ForecastProvider] = None):
+        self.client = make_client("weather", lazy=True)
+        # Solo le letture correnti passano dallo spool: una previsione
+        # arretrata non serve più a nessuno
+        self.spool = make_spooled_publisher(self.client, "weather")
         self.topic = f"greenfield/{FIELD_ID}/weather/current"
-        self._running = True
+        self.forecast_topic = f"greenfield/{FIELD_ID}/weather/forecast"
+        self.scheduler = scheduler or get_scheduler()
+        # Provider condiviso: i campi nella stessa cella di griglia riusano un solo fetch
+        self.forecast = forecast or get_forecast_provider()
+        self._task: Optional[ScheduledTask] = None
+        self._forecast_task: Optional[ScheduledTask] = None
+        self._drain_task: Optional[ScheduledTask] = None
+        self.synthetic = get_live_synthetic()
 
-    def run(self):
-        while self._running:
+    def tick(self):
+        now = time.time()
+        if self.synthetic is not None:
+            data = {
+                "temperature": round(self.synthetic.reading("temperature", FIELD_ID, now), 2),
+                "humidity": round(self.synthetic.reading("humidity", FIELD_ID, now), 2),
+                "wind_kmh": round(max(0.0, self.synthetic.reading("wind_kmh", FIELD_ID, now)), 1),
+                "radiation": round(max(0.0, self.synthetic.reading("radiation", FIELD_ID, now)), 1),
+                "ts": now,
+            }
+        else:
             data = {
                 "temperature": round(random.uniform(10.0, 35.0), 2),
                 "humidity": round(random.uniform(30.0, 80.0), 2),
                 "wind_kmh": round(random.uniform(0.0, 25.0), 1),
                 "radiation": round(random.uniform(100.0, 900.0), 1),
-                "ts": time.time()
+                "ts": now
             }
-            self.client.publish(self.topic, json.dumps(data), qos=0, retain=False)
-            time.sleep(SENSOR_PUBLISH_INTERVAL_SECS * 2)
+        if self.spool is not None:
+            self.spool.publish(self.topic, data, retain=RETAIN_LAST_VALUES)
+        else:
+            self.client.publish(self.topic, json.dumps(data), qos=0, retain=RETAIN_LAST_VALUES)
+
+    def forecast_tick(self):
+        horizons = self.forecast.get(FIELD_LAT, FIELD_LON)
+        if not horizons:
+            return
+        data = dict(horizons, provider=self.forecast.name, ts=time.time())
+        self.client.publish(self.forecast_topic, json.dumps(data), qos=0, retain=RETAIN_LAST_VALUES)
+
+    def start(self):
+        if self._task is None:
+            self.client.loop_start()
+            self._task = self.scheduler.schedule_periodic(
+                self.tick, SENSOR_PUBLISH_INTERVAL_SECS * 2,
+                jitter=SCHEDULER_JITTER_SECS, name="weather")
+        if self.forecast is not None and self._forecast_task is None:
+            self._forecast_task = self.scheduler.schedule_periodic(
+                self.forecast_tick, FORECAST_PUBLISH_SECS,
+                jitter=SCHEDULER_JITTER_SECS, name="weather-forecast")
+        if self.spool is not None and self._drain_task is None:
+            self._drain_task = self.scheduler.schedule_periodic(
+                self.spool.drain, SPOOL_DRAIN_SECS, name="weather-spool")
 
     def stop(self):
-        self._running = False
+        for task in (self._task, self._forecast_task, self._drain_task):
+            if task is not None:
+                self.scheduler.cancel(task)
+        self._task = self._forecast_task = self._drain_task = None
+        self.client.loop_stop()
+        if self.spool is not None:
+            self.spool.close()
@@ -0,0 +1,262 @@
+# src/ai/image_pool.py
+
+import hashlib
+import itertools
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .vegetation import aggregate_results, analyze_raster, open_raster, raw_meta
+from ..common.config import (
+    IMAGE_BANDS, IMAGE_CACHE_SIZE, IMAGE_QUEUE_MAX, IMAGE_TILE_PX, IMAGE_WORKERS, IMAGE_ZONES,
+)
+
+Source = Union[str, np.ndarray]
+
+
+# ============================================================
+#  Hash di contenuto e job dei worker
+# ============================================================
+
+def content_hash(source: Source, params: Tuple = ()) -> str:
+    """
+    Hash BLAKE2b del contenuto (byte del file o dell'array) e dei parametri
+    di analisi: lo stesso frame ricaricato con un altro nome ha lo stesso hash.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(params).encode("utf-8"))
+    if isinstance(source, np.ndarray):
+        h.update(f"{source.shape}{source.dtype}".encode("utf-8"))
+        h.update(np.ascontiguousarray(source).data)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        h.update(repr(raw_meta(source)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def analyze_source(source: Source, bands: str, zones: Tuple[int, int], tile: int) -> Dict[str, Any]:
+    """Job eseguito nei processi worker (funzione di modulo: serializzabile)."""
+    raster = source if isinstance(source, np.ndarray) else open_raster(source, **raw_meta(source))
+    return analyze_raster(raster, bands=bands, zones=zones, tile=tile)
+
+
+# ============================================================
+#  ResultCache – LRU per hash di contenuto
+# ============================================================
+
+class ResultCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ============================================================
+#  ImageAnalysisPool – pool di processi con ordinamento per campo
+# ============================================================
+
+class _Batch:
+    __slots__ = ("field_id", "seq", "results", "remaining", "on_done")
+
+    def __init__(self, field_id: str, seq: int, size: int, on_done):
+        self.field_id = field_id
+        self.seq = seq
+        self.results: List[Optional[Dict[str, Any]]] = [None] * size
+        self.remaining = size
+        self.on_done = on_done
+
+
+class ImageAnalysisPool:
+    """
+    Analisi parallela dei frame su un ProcessPoolExecutor.
+
+    - coda limitata: submit_batch() si blocca quando ci sono già
+      `max_pending` frame in lavorazione (backpressure verso il chiamante)
+    - cache LRU per hash di contenuto: frame duplicati o ricaricati non
+      vengono mai ricalcolati; frame identici già in lavorazione
+      condividono lo stesso job
+    - pubblicazione ordinata: per ogni campo i batch vengono consegnati a
+      `on_done` nell'ordine di invio, anche se terminano in ordine diverso
+    - worker avviati con forkserver (spawn dove non disponibile): un fork
+      del processo degli agenti copierebbe lock presi da altri thread
+      (client MQTT, scheduler) e potrebbe bloccarsi
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS, max_pending: int = IMAGE_QUEUE_MAX,
+                 cache_size: int = IMAGE_CACHE_SIZE, bands: str = IMAGE_BANDS,
+                 zones: Tuple[int, int] = IMAGE_ZONES, tile: int = IMAGE_TILE_PX):
+        self.params = (bands, tuple(zones), tile)
+        self.cache = ResultCache(cache_size)
+        self._workers = workers or None
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, Future] = {}
+        self._next_seq: Dict[str, itertools.count] = {}
+        self._expected: Dict[str, int] = {}
+        self._ready: Dict[str, Dict[int, _Batch]] = {}
+        self.hits = 0
+        self.computed = 0
+        self.errors = 0
+
+    # ---------------------------------------------------------
+    # Invio
+    # ---------------------------------------------------------
+    def submit_batch(self, field_id: str, sources: List[Source],
+                     on_done: Callable[[str, Dict[str, Any]], None]) -> int:
+        """
+        Accoda un batch di frame di un campo. `on_done(field_id, aggregato)`
+        viene chiamato quando tutti i frame sono analizzati, in ordine di batch.
+        """
+        with self._lock:
+            counter = self._next_seq.setdefault(field_id, itertools.count())
+            seq = next(counter)
+            self._expected.setdefault(field_id, 0)
+        batch = _Batch(field_id, seq, len(sources), on_done)
+
+        if not sources:
+            self._finish(batch)
+            return seq
+
+        for i, source in enumerate(sources):
+            try:
+                key = content_hash(source, self.params)
+            except OSError as e:
+                print(f"[ImagePool] Frame non leggibile: {e}")
+                self.errors += 1
+                self._frame_done(batch, i, None)
+                continue
+
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._frame_done(batch, i, cached)
+                continue
+
+            # Controllo e registrazione in un'unica sezione critica: lo stesso
+            # hash non parte mai due volte. Il Future segnaposto riceve poi
+            # l'esito del job vero e proprio.
+            with self._lock:
+                fut = self._inflight.get(key)
+                owner = fut is None
+                if owner:
+                    fut = self._inflight[key] = Future()
+            if owner:
+                fut.add_done_callback(lambda f, k=key: self._job_done(k, f))
+                self._run(source, fut)
+            else:
+                self.hits += 1
+            fut.add_done_callback(lambda f, b=batch, i=i: self._frame_done(b, i, self._result(f)))
+        return seq
+
+    def _run(self, source: Source, fut: Future):
+        """Avvia il job di `fut`; se l'invio fallisce il frame si chiude con errore."""
+        # Attende uno slot libero: la coda di lavoro resta limitata
+        self._slots.acquire()
+        try:
+            job = self._submit(source)
+        except Exception as e:
+            self._slots.release()
+            fut.set_exception(e)
+            return
+        job.add_done_callback(lambda j: self._transfer(j, fut))
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context(method))
+
+    def _submit(self, source: Source) -> Future:
+        executor = self._executor
+        try:
+            return executor.submit(analyze_source, source, *self.params)
+        except BrokenProcessPool:
+            # Un worker è morto: il pool non accetta più job, se ne crea uno nuovo
+            with self._lock:
+                if self._executor is executor:
+                    print("[ImagePool] Pool di processi interrotto, ricreato")
+                    self._executor = self._new_executor()
+                    executor.shutdown(wait=False)
+                executor = self._executor
+            return executor.submit(analyze_source, source, *self.params)
+
+    def _transfer(self, job: Future, fut: Future):
+        self._slots.release()
+        if job.cancelled():
+            fut.set_exception(CancelledError())
+        elif job.exception() is not None:
+            fut.set_exception(job.exception())
+        else:
+            fut.set_result(job.result())
+
+    # ---------------------------------------------------------
+    # Completamento
+    # ---------------------------------------------------------
+    @staticmethod
+    def _result(fut: Future) -> Optional[Dict[str, Any]]:
+        try:
+            return fut.result()
+        except Exception:
+            return None
+
+    def _job_done(self, key: str, fut: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        result = self._result(fut)
+        if result is None:
+            self.errors += 1
+            print(f"[ImagePool] Errore di analisi: {fut.exception()}")
+            return
+        self.computed += 1
+        self.cache.put(key, result)
+
+    def _frame_done(self, batch: _Batch, index: int, result: Optional[Dict[str, Any]]):
+        with self._lock:
+            batch.results[index] = result
+            batch.remaining -= 1
+            done = batch.remaining == 0
+        if done:
+            self._finish(batch)
+
+    def _finish(self, batch: _Batch):
+        """Consegna i batch completati rispettando l'ordine per campo."""
+        field = batch.field_id
+        with self._lock:
+            self._ready.setdefault(field, {})[batch.seq] = batch
+            deliver = []
+            ready = self._ready[field]
+            while self._expected[field] in ready:
+                deliver.append(ready.pop(self._expected[field]))
+                self._expected[field] += 1
+            # Consegna sotto lock: l'ordine resta garantito anche tra thread diversi
+            for b in deliver:
+                try:
+                    b.on_done(field, aggregate_results(b.results))
+                except Exception as e:
+                    print(f"[ImagePool] Errore nella pubblicazione del campo {field}: {e}")
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
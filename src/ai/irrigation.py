@@ -0,0 +1,202 @@
+# src/ai/irrigation.py
+
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..common.config import (
+    IRRIGATION_DEFAULT_AREA_M2, IRRIGATION_HORIZON_SLOTS, IRRIGATION_PUMP_LPM,
+    IRRIGATION_SLOT_MIN, IRRIGATION_WATER_BUDGET_L, IRRIGATION_ZONE_AREAS, IRRIGATION_ZONE_LPM,
+)
+
+
+# Urgenza dell'azione suggerita (le altre azioni non chiedono acqua)
+ACTION_URGENCY = {"irrigate_light": 0.4, "irrigate": 0.7, "irrigate_heavy": 1.0}
+
+# Pesi della priorità: urgenza dell'azione, stress idrico, salute della vegetazione
+PRIORITY_WEIGHTS = (0.5, 0.3, 0.2)
+WSI_SCALE = 1.5
+
+# Motivo per cui una zona non riceve tutta l'acqua richiesta
+LIMITS = ("none", "zone-flow", "budget", "pump")
+
+
+# ============================================================
+#  Solver vettorizzato (greedy per priorità)
+# ============================================================
+
+def zone_priority(action: np.ndarray, wsi: np.ndarray, vh: np.ndarray) -> np.ndarray:
+    """
+    Priorità in [0, 1] per zona. `action` è un array di stringhe;
+    WSI / vegetation_health mancanti (NaN) valgono 0.5 (neutri).
+    """
+    urgency = np.zeros(len(action), dtype=np.float64)
+    for name, u in ACTION_URGENCY.items():
+        urgency[action == name] = u
+    wsi_n = np.clip(np.nan_to_num(wsi, nan=0.5 * WSI_SCALE) / WSI_SCALE, 0.0, 1.0)
+    stress_vh = 1.0 - np.clip(np.nan_to_num(vh, nan=0.5), 0.0, 1.0)
+    a, b, c = PRIORITY_WEIGHTS
+    return a * urgency + b * wsi_n + c * stress_vh
+
+
+def solve_schedule(demand_l: np.ndarray, priority: np.ndarray, zone_slot_l: np.ndarray,
+                   pump_slot_l: float, budget_l: float, n_slots: int) -> Dict[str, np.ndarray]:
+    """
+    Allocazione e calendario a slot di tutte le zone in un colpo solo.
+
+    1. tetto per zona: portata massima della zona su tutto l'orizzonte
+    2. budget idrico condiviso: riempimento greedy per priorità decrescente
+       (soluzione ottima del rilassamento LP con valore = priorità × litri)
+    3. slot: a ogni slot le zone, in ordine di priorità, prendono fino alla
+       propria portata per slot finché la pompa ha capacità; il resto
+       passa allo slot successivo, e oltre l'orizzonte resta rinviato
+
+    Ogni passo è un cumsum sulle zone ordinate: O(slot × zone) in NumPy.
+    """
+    n = len(demand_l)
+    order = np.argsort(-priority, kind="stable")
+    d = np.maximum(np.asarray(demand_l, dtype=np.float64)[order], 0.0)
+    cap = np.asarray(zone_slot_l, dtype=np.float64)[order]
+
+    # 1. portata della zona sull'orizzonte
+    want = np.minimum(d, cap * n_slots)
+
+    # 2. budget idrico: chi viene prima prende tutto, l'ultima zona servita il resto
+    before = np.cumsum(want) - want
+    alloc = np.clip(budget_l - before, 0.0, want) if budget_l > 0 else want
+
+    # 3. calendario: matrice zone × slot
+    schedule = np.zeros((n, n_slots), dtype=np.float32)
+    remaining = alloc.copy()
+    for k in range(n_slots):
+        q = np.minimum(remaining, cap)
+        if not q.any():
+            break
+        before = np.cumsum(q) - q
+        give = np.clip(pump_slot_l - before, 0.0, q)
+        schedule[:, k] = give
+        remaining -= give
+    planned = alloc - remaining
+
+    limited = np.zeros(n, dtype=np.int8)
+    eps = 1e-6
+    limited[want < d - eps] = LIMITS.index("zone-flow")
+    limited[alloc < want - eps] = LIMITS.index("budget")
+    limited[planned < alloc - eps] = LIMITS.index("pump")
+
+    # Ritorno nell'ordine originale delle zone
+    inv = np.empty(n, dtype=np.int64)
+    inv[order] = np.arange(n)
+    return {
+        "rank": inv + 1,
+        "planned_l": planned[inv],
+        "deferred_l": (d - planned)[inv],
+        "limited_by": limited[inv],
+        "schedule": schedule[inv],
+    }
+
+
+# ============================================================
+#  IrrigationPlanner – dalle decisioni per zona al piano
+# ============================================================
+
+class IrrigationPlanner:
+    """
+    Trasforma l'ultimo suggerimento di ogni zona (campo) in un piano di
+    irrigazione che rispetta budget idrico e capacità della pompa condivisi.
+
+    plan() restituisce il riepilogo e un piano per zona con le finestre di
+    irrigazione ("runs": slot consecutivi fusi) a partire dal prossimo slot.
+    """
+
+    def __init__(self, areas: Optional[Dict[str, float]] = None,
+                 default_area_m2: float = IRRIGATION_DEFAULT_AREA_M2,
+                 budget_l: float = IRRIGATION_WATER_BUDGET_L, pump_lpm: float = IRRIGATION_PUMP_LPM,
+                 zone_lpm: float = IRRIGATION_ZONE_LPM, slot_min: float = IRRIGATION_SLOT_MIN,
+                 n_slots: int = IRRIGATION_HORIZON_SLOTS):
+        self.areas = dict(IRRIGATION_ZONE_AREAS if areas is None else areas)
+        self.default_area_m2 = default_area_m2
+        self.budget_l = budget_l
+        self.slot_secs = slot_min * 60.0
+        self.pump_slot_l = pump_lpm * slot_min
+        self.zone_slot_l = zone_lpm * slot_min
+        self.n_slots = max(1, int(n_slots))
+
+    def plan(self, zones: Iterable[Dict[str, Any]], now: Optional[float] = None) -> Dict[str, Any]:
+        """`zones`: righe con field_id, action, volume_l_m2, water_stress_index, vegetation_health."""
+        now = time.time() if now is None else now
+        t_start = time.perf_counter()
+        rows = list(zones)
+        n = len(rows)
+
+        ids = [r["field_id"] for r in rows]
+        action = np.array([r.get("action") or "hold" for r in rows], dtype=object)
+        volume = np.array([r.get("volume_l_m2") or 0.0 for r in rows], dtype=np.float64)
+        wsi = np.array([_num(r.get("water_stress_index")) for r in rows], dtype=np.float64)
+        vh = np.array([_num(r.get("vegetation_health")) for r in rows], dtype=np.float64)
+        area = np.array([self.areas.get(f, self.default_area_m2) for f in ids], dtype=np.float64)
+
+        priority = zone_priority(action, wsi, vh)
+        demand = volume * area
+        sol = solve_schedule(demand, priority, np.full(n, self.zone_slot_l), self.pump_slot_l,
+                             self.budget_l, self.n_slots)
+
+        # Primo slot: il prossimo confine di slot
+        t0 = math.ceil(now / self.slot_secs) * self.slot_secs
+        solve_ms = (time.perf_counter() - t_start) * 1000.0
+
+        plans: Dict[str, Dict[str, Any]] = {}
+        schedule = sol["schedule"]
+        active = schedule > 0
+        for i, field_id in enumerate(ids):
+            plans[field_id] = {
+                "plan_start": t0,
+                "rank": int(sol["rank"][i]),
+                "priority": round(float(priority[i]), 4),
+                "area_m2": float(area[i]),
+                "demand_l": round(float(demand[i]), 1),
+                "planned_l": round(float(sol["planned_l"][i]), 1),
+                "planned_l_m2": round(float(sol["planned_l"][i] / area[i]), 3) if area[i] else 0.0,
+                "deferred_l": round(float(sol["deferred_l"][i]), 1),
+                "limited_by": LIMITS[sol["limited_by"][i]],
+                "runs": _runs(schedule[i], active[i], t0, self.slot_secs) if sol["planned_l"][i] > 0 else [],
+            }
+
+        summary = {
+            "ts": now,
+            "plan_start": t0,
+            "slot_secs": self.slot_secs,
+            "n_slots": self.n_slots,
+            "zones": n,
+            "zones_irrigated": int((sol["planned_l"] > 0).sum()),
+            "demand_l": round(float(demand.sum()), 1),
+            "planned_l": round(float(sol["planned_l"].sum()), 1),
+            "deferred_l": round(float(sol["deferred_l"].sum()), 1),
+            "budget_l": self.budget_l,
+            "pump_utilization": round(float(schedule.sum()) / (self.pump_slot_l * self.n_slots), 4)
+            if self.pump_slot_l > 0 else None,
+            "solve_ms": round(solve_ms, 2),
+        }
+        return {"summary": summary, "zones": plans}
+
+
+def _num(v: Any) -> float:
+    return float(v) if v is not None else np.nan
+
+
+def _runs(litres: np.ndarray, active: np.ndarray, t0: float, slot_secs: float) -> List[Dict[str, Any]]:
+    """Fonde gli slot consecutivi di una zona in finestre [start, end) con i litri totali."""
+    idx = np.flatnonzero(active)
+    if not len(idx):
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > 1) + 1
+    runs = []
+    for seg in np.split(idx, breaks):
+        runs.append({
+            "start": float(t0 + seg[0] * slot_secs),
+            "end": float(t0 + (seg[-1] + 1) * slot_secs),
+            "litres": round(float(litres[seg].sum()), 1),
+        })
+    return runs
@@ -0,0 +1,253 @@
+# src/ai/shadow.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .strategies import BaseStrategy, make_strategy
+from ..common.config import SHADOW_BUDGET_MS, SHADOW_STATS_SECS, SHADOW_WORKERS
+
+
+def _timed_estimate(strategy: BaseStrategy, features: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """Job del pool: suggerimento della candidata e latenza in ms."""
+    t0 = time.perf_counter()
+    out = strategy.estimate(features)
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+# ============================================================
+#  ShadowStats – accordo e latenza di una candidata
+# ============================================================
+
+class ShadowStats:
+    # Latenze conservate per i percentili
+    WINDOW = 1000
+
+    def __init__(self):
+        self.rounds = 0
+        self.compared = 0
+        self.agree = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.errors = 0
+        self.volume_abs_err = 0.0
+        self.latencies: Deque[float] = deque(maxlen=self.WINDOW)
+        self.confusion: Dict[str, int] = {}
+
+    def record(self, primary: Dict[str, Any], result: Dict[str, Any]):
+        self.rounds += 1
+        status = result["status"]
+        if "latency_ms" in result:
+            self.latencies.append(result["latency_ms"])
+        if status == "timeout":
+            self.timeouts += 1
+        elif status == "skipped":
+            self.skipped += 1
+        elif status == "error":
+            self.errors += 1
+        if status != "ok":
+            return
+
+        self.compared += 1
+        self.agree += result["agree"]
+        self.volume_abs_err += abs(float(result["volume_l_m2"]) - float(primary.get("volume_l_m2") or 0.0))
+        key = f"{primary.get('action')}→{result['action']}"
+        self.confusion[key] = self.confusion.get(key, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        lat = np.array(self.latencies) if self.latencies else None
+        return {
+            "rounds": self.rounds,
+            "compared": self.compared,
+            "agreement": round(self.agree / self.compared, 4) if self.compared else None,
+            "volume_mae": round(self.volume_abs_err / self.compared, 4) if self.compared else None,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3) if lat is not None else None,
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 3) if lat is not None else None,
+            "latency_ms_max": round(float(lat.max()), 3) if lat is not None else None,
+            "confusion": dict(self.confusion),
+        }
+
+
+# ============================================================
+#  ShadowEvaluator – candidate in parallelo con budget per tick
+# ============================================================
+
+class _Round:
+    __slots__ = ("ts", "primary", "pipeline_ms", "deadline", "results", "pending", "closed")
+
+    def __init__(self, ts: float, primary: Dict[str, Any], pipeline_ms: float, deadline: float):
+        self.ts = ts
+        self.primary = primary
+        self.pipeline_ms = pipeline_ms
+        self.deadline = deadline
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.pending: set = set()
+        self.closed = False
+
+
+class ShadowEvaluator:
+    """
+    Esegue le strategie candidate sullo stesso record della primaria.
+
+    - la primaria decide e pubblica senza attendere: evaluate() accoda i job
+      su un pool di thread dedicato e ritorna subito
+    - ogni candidata ha `budget_ms` per rispondere; oltre il budget il
+      risultato vale "timeout" anche se arriva dopo
+    - una candidata ancora occupata dal tick precedente viene saltata
+      ("skipped"): un modello lento non accumula lavoro arretrato
+    - ogni round completo va a `publish(payload)`, le statistiche aggregate
+      a `publish_stats(summary)` ogni `stats_secs`
+    """
+
+    def __init__(self, candidates: Iterable[str] = (), budget_ms: float = SHADOW_BUDGET_MS,
+                 workers: int = SHADOW_WORKERS, stats_secs: float = SHADOW_STATS_SECS,
+                 publish: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 publish_stats: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.budget = budget_ms / 1000.0
+        self.stats_secs = stats_secs
+        self.publish = publish
+        self.publish_stats = publish_stats
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._candidates: Dict[str, BaseStrategy] = {}
+        self._busy: Dict[str, Future] = {}
+        self._open: List[_Round] = []
+        self.stats: Dict[str, ShadowStats] = {}
+        self._last_stats = time.time()
+        self.set_candidates(candidates)
+
+    @property
+    def active(self) -> bool:
+        return bool(self._candidates)
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._candidates)
+
+    def set_candidates(self, names: Iterable[str]):
+        names = tuple(n.lower().strip() for n in names if n and n.strip())
+        if names == self.names():
+            return
+        with self._lock:
+            self._candidates = {n: make_strategy(n) for n in names}
+            for n in names:
+                self.stats.setdefault(n, ShadowStats())
+        print(f"[Shadow] Strategie candidate: {list(names) or 'nessuna'}")
+
+    # ---------------------------------------------------------
+    # Round
+    # ---------------------------------------------------------
+    def evaluate(self, processed: Dict[str, Any], pipeline_ms: float, now: Optional[float] = None):
+        """Avvia un round sul record già elaborato dalla pipeline (non bloccante)."""
+        now = time.time() if now is None else now
+        self._expire()
+
+        features = {k: v for k, v in processed.items() if k != "suggestion"}
+        primary = dict(processed.get("suggestion") or {})
+        rnd = _Round(processed.get("ts", now), primary, pipeline_ms, time.monotonic() + self.budget)
+
+        # Controllo "occupata" e registrazione del nuovo job nella stessa sezione
+        # critica; i callback si agganciano fuori dal lock (_done lo riprende)
+        started = []
+        with self._lock:
+            for name, strategy in self._candidates.items():
+                busy = self._busy.get(name)
+                if busy is not None and not busy.done():
+                    rnd.results[name] = {"status": "skipped"}
+                    continue
+                rnd.pending.add(name)
+                fut = self._busy[name] = self._executor.submit(_timed_estimate, strategy, features)
+                started.append((name, fut))
+            self._open.append(rnd)
+
+        for name, fut in started:
+            fut.add_done_callback(lambda f, r=rnd, n=name: self._done(r, n, f))
+
+        with self._lock:
+            # Nessuna candidata avviata (tutte occupate)
+            if not rnd.pending and not rnd.closed:
+                self._close(rnd)
+
+        if self.publish_stats and now - self._last_stats >= self.stats_secs:
+            self._last_stats = now
+            # Percentili calcolati nel pool, fuori dal tick della primaria
+            self._executor.submit(self._publish_summary)
+
+    def _done(self, rnd: _Round, name: str, fut: Future):
+        late = time.monotonic() > rnd.deadline
+        try:
+            out, latency = fut.result()
+            if late:
+                result = {"status": "timeout", "latency_ms": round(latency, 3)}
+            else:
+                result = {
+                    "status": "ok",
+                    "action": out.get("action"),
+                    "reason": out.get("reason"),
+                    "volume_l_m2": out.get("volume_l_m2", 0.0),
+                    "latency_ms": round(latency, 3),
+                    "agree": out.get("action") == rnd.primary.get("action"),
+                }
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+
+        with self._lock:
+            if rnd.closed:
+                # Round già chiuso per budget scaduto: conta solo la latenza
+                if "latency_ms" in result:
+                    self.stats[name].latencies.append(result["latency_ms"])
+                return
+            rnd.results[name] = result
+            rnd.pending.discard(name)
+            if not rnd.pending:
+                self._close(rnd)
+
+    def _expire(self):
+        """Chiude i round il cui budget è scaduto con candidate ancora in corso."""
+        now = time.monotonic()
+        with self._lock:
+            for rnd in [r for r in self._open if r.deadline < now]:
+                for name in rnd.pending:
+                    rnd.results[name] = {"status": "timeout"}
+                rnd.pending.clear()
+                self._close(rnd)
+
+    def _close(self, rnd: _Round):
+        # Chiamato con self._lock acquisito
+        rnd.closed = True
+        if rnd in self._open:
+            self._open.remove(rnd)
+        for name, result in rnd.results.items():
+            self.stats.setdefault(name, ShadowStats()).record(rnd.primary, result)
+        if self.publish:
+            try:
+                self.publish({
+                    "ts": rnd.ts,
+                    "primary": dict(rnd.primary, pipeline_ms=round(rnd.pipeline_ms, 3)),
+                    "candidates": rnd.results,
+                })
+            except Exception as e:
+                print(f"[Shadow] Errore pubblicazione round: {e}")
+
+    # ---------------------------------------------------------
+    # Statistiche / arresto
+    # ---------------------------------------------------------
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ts": time.time(), "candidates": {n: s.summary() for n, s in self.stats.items()}}
+
+    def _publish_summary(self):
+        try:
+            self.publish_stats(self.summary())
+        except Exception as e:
+            print(f"[Shadow] Errore pubblicazione statistiche: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._expire()
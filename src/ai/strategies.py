@@ -1,30 +1,83 @@
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import random
 
+import numpy as np
+
+from ..common.config import FEATURE_WINDOWS_SECS, FORECAST_HORIZONS_H
+from ..pipeline.features import window_label
+
+
+# Codifica compatta di azioni e motivazioni per la valutazione vettorizzata
+ACTIONS = ("hold", "irrigate_light", "irrigate", "irrigate_heavy", "alert")
+REASONS = (
+    "conditions-normal", "moderate-water-stress", "high-water-stress", "very-high-water-stress",
+    "low-humidity", "humidity-too-high", "too-cold-to-irrigate", "vegetation-health-critical",
+    "extreme-conditions", "high-vapor-pressure-deficit", "rain-expected", "simulated-ml-result",
+)
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+REASON_CODES = {r: i for i, r in enumerate(REASONS)}
+
+
+def _value(f: Dict[str, Any], key: str, default: float) -> float:
+    """
+    Feature numerica con default. None (sensore che non ha ancora riferito)
+    vale come assente, come in FieldRecord.get() e nei NaN di estimate_batch.
+    """
+    v = f.get(key)
+    return default if v is None else float(v)
+
 
 # ============================================================
 # Base Strategy
 # ============================================================
 class BaseStrategy:
     name = "base"
+    # True per le strategie a regole, abbastanza veloci da girare nel tick
+    # senza budget di latenza (vedi EstimationHandler)
+    inline = False
+    # Feature usate oltre agli ingressi dei sensori e al WSI (pipeline completa)
+    extra_features: Tuple[str, ...] = ()
 
     def estimate(self, features: Dict[str, Any]) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def estimate_batch(self, cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Valuta molti record in colonne NumPy (NaN = valore mancante).
+        Restituisce codici azione / motivo (indici in ACTIONS / REASONS) e volumi.
+
+        Implementazione generica riga per riga: le strategie che lo
+        consentono la sovrascrivono con una versione vettorizzata.
+        """
+        keys = list(cols)
+        n = len(cols[keys[0]]) if keys else 0
+        action = np.empty(n, dtype=np.int8)
+        reason = np.empty(n, dtype=np.int8)
+        volume = np.empty(n, dtype=np.float32)
+        columns = [np.asarray(cols[k]) for k in keys]
+        for i in range(n):
+            row = {k: float(c[i]) for k, c in zip(keys, columns) if not np.isnan(c[i])}
+            out = self.estimate(row)
+            action[i] = ACTION_CODES.get(out["action"], ACTION_CODES["hold"])
+            reason[i] = REASON_CODES.get(out["reason"], REASON_CODES["conditions-normal"])
+            volume[i] = out["volume_l_m2"]
+        return {"action": action, "reason": reason, "volume_l_m2": volume}
+
 
 # ============================================================
 # STRATEGIA REALISTICA BASATA SUI RANGE USATI NELLE CARD
 # ============================================================
 class SimpleRuleStrategy(BaseStrategy):
     name = "simple_rules"
+    inline = True
 
     def estimate(self, f: Dict[str, Any]) -> Dict[str, Any]:
 
-        temp = float(f.get("temperature", 25.0))
-        hum = float(f.get("humidity", 50.0))
-        light = float(f.get("light", 500.0))
-        vh = float(f.get("vegetation_health", 0.7))
-        wsi = float(f.get("water_stress_index", 0.25))
+        temp = _value(f, "temperature", 25.0)
+        hum = _value(f, "humidity", 50.0)
+        light = _value(f, "light", 500.0)
+        vh = _value(f, "vegetation_health", 0.7)
+        wsi = _value(f, "water_stress_index", 0.25)
 
         # ---------------------------------------------------------
         # 1) CONDIZIONI DAVVERO ESTREME → ALERT
@@ -105,6 +158,145 @@ class SimpleRuleStrategy(BaseStrategy):
         }
 
 
+    def estimate_batch(self, cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Stesse regole di estimate(), valutate con np.select nello stesso ordine di priorità."""
+        n = len(next(iter(cols.values())))
+
+        def col(key, default):
+            c = np.asarray(cols[key], dtype=np.float64) if key in cols else np.full(n, np.nan)
+            return np.where(np.isnan(c), default, c)
+
+        temp = col("temperature", 25.0)
+        hum = col("humidity", 50.0)
+        light = col("light", 500.0)
+        vh = col("vegetation_health", 0.7)
+        wsi = col("water_stress_index", 0.25)
+
+        A, R = ACTION_CODES, REASON_CODES
+        extreme = (temp > 40) | (hum < 20) | (light < 80) | (vh < 0.2) | (wsi > 1.2)
+        too_cold = temp < 5
+        veg_critical = vh < 0.3
+        low_hum = hum < 30
+        high_hum = hum > 85
+
+        # Base da WSI
+        base_a = np.select([wsi < 0.4, wsi < 0.7, wsi < 1.0],
+                           [A["hold"], A["irrigate_light"], A["irrigate"]], A["irrigate_heavy"])
+        base_r = np.select([wsi < 0.4, wsi < 0.7, wsi < 1.0],
+                           [R["conditions-normal"], R["moderate-water-stress"], R["high-water-stress"]],
+                           R["very-high-water-stress"])
+        base_v = np.select([wsi < 0.4, wsi < 0.7, wsi < 1.0], [0.0, 2.0, 4.0], 6.0)
+
+        # Priorità: estremi → freddo → vegetazione critica → umidità → WSI
+        conds = [extreme, too_cold, veg_critical, low_hum, high_hum]
+        action = np.select(conds, [A["alert"], A["hold"], A["alert"], A["irrigate_heavy"], A["hold"]], base_a)
+        reason = np.select(conds, [R["extreme-conditions"], R["too-cold-to-irrigate"],
+                                   R["vegetation-health-critical"], R["low-humidity"],
+                                   R["humidity-too-high"]], base_r)
+        volume = np.select(conds, [0.0, 0.0, 0.0, np.maximum(base_v, 5.0), 0.0], base_v)
+
+        return {
+            "action": action.astype(np.int8),
+            "reason": reason.astype(np.int8),
+            "volume_l_m2": volume.astype(np.float32),
+        }
+
+
+# ============================================================
+# STRATEGIA AGRONOMICA — regole + VPD / ET0 cumulata
+# ============================================================
+class AgronomicStrategy(SimpleRuleStrategy):
+    """
+    Parte dalle regole di SimpleRuleStrategy e usa le feature della pipeline
+    (AgronomicHandler, RollingStressHandler):
+    - VPD molto alto anticipa un'irrigazione lieve anche con WSI basso
+    - il volume reintegra l'ET0 cumulata sulla finestra mobile più lunga
+      configurata (FEATURE_WINDOWS_SECS, 24 ore di default)
+    - se la pioggia prevista sull'orizzonte più vicino alle 24 ore
+      (FORECAST_HORIZONS_H) copre il volume, l'irrigazione viene rimandata
+    """
+    name = "agronomic"
+    # Feature dell'ET0 cumulata: chiave della finestra più lunga (es. et0_mm_1d)
+    ET0_KEY = f"et0_mm_{window_label(max(FEATURE_WINDOWS_SECS))}" if FEATURE_WINDOWS_SECS else None
+    # Pioggia prevista: orizzonte configurato più vicino a un giorno (es. forecast_rain_mm_24h)
+    RAIN_KEY = (f"forecast_rain_mm_{min(FORECAST_HORIZONS_H, key=lambda h: abs(h - 24))}h"
+                if FORECAST_HORIZONS_H else None)
+    extra_features = ("vpd_kpa",) + tuple(k for k in (ET0_KEY, RAIN_KEY) if k)
+
+    VPD_HIGH_KPA = 2.5
+    MAX_VOLUME_L_M2 = 8.0
+
+    def estimate(self, f: Dict[str, Any]) -> Dict[str, Any]:
+        base = super().estimate(f)
+        action = base["action"]
+
+        if action == "alert" or base["reason"] in ("humidity-too-high", "too-cold-to-irrigate"):
+            return base
+
+        vpd = f.get("vpd_kpa")
+        if action == "hold" and vpd is not None and vpd > self.VPD_HIGH_KPA:
+            return {
+                "action": "irrigate_light",
+                "reason": "high-vapor-pressure-deficit",
+                "volume_l_m2": 2.0
+            }
+
+        et0_day = f.get(self.ET0_KEY) if self.ET0_KEY else None
+        if action != "hold" and et0_day:
+            # 1 mm di ET0 = 1 L/m² da reintegrare
+            base["volume_l_m2"] = round(max(base["volume_l_m2"], min(et0_day, self.MAX_VOLUME_L_M2)), 1)
+
+        rain = f.get(self.RAIN_KEY) if self.RAIN_KEY else None
+        if action != "hold" and base["reason"] != "low-humidity" and rain is not None \
+                and rain >= base["volume_l_m2"]:
+            # 1 mm di pioggia = 1 L/m²
+            return {
+                "action": "hold",
+                "reason": "rain-expected",
+                "volume_l_m2": 0.0
+            }
+
+        return base
+
+    def estimate_batch(self, cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Regole di estimate() su colonne: base vettorizzata + VPD / ET0 / pioggia."""
+        out = super().estimate_batch(cols)
+        n = len(out["action"])
+
+        def col(key):
+            return np.asarray(cols[key], dtype=np.float64) if key in cols else np.full(n, np.nan)
+
+        A, R = ACTION_CODES, REASON_CODES
+        action = out["action"].copy()
+        reason = out["reason"].copy()
+        volume = out["volume_l_m2"].astype(np.float64)
+
+        # Alert, umidità eccessiva e freddo restano come nelle regole base
+        open_ = (action != A["alert"]) & (reason != R["humidity-too-high"]) \
+            & (reason != R["too-cold-to-irrigate"])
+        holding = open_ & (action == A["hold"])
+        irrigating = open_ & (action != A["hold"])
+
+        # NaN nei confronti dà False: VPD / ET0 / pioggia mancanti non contano
+        vpd_high = holding & (col("vpd_kpa") > self.VPD_HIGH_KPA)
+
+        et0_day = col(self.ET0_KEY)
+        refill = irrigating & ~np.isnan(et0_day) & (et0_day != 0)
+        volume = np.where(refill, np.round(np.maximum(volume, np.minimum(et0_day, self.MAX_VOLUME_L_M2)), 1),
+                          volume)
+
+        rain_hold = irrigating & (reason != R["low-humidity"]) & (col(self.RAIN_KEY) >= volume)
+
+        action[vpd_high] = A["irrigate_light"]
+        reason[vpd_high] = R["high-vapor-pressure-deficit"]
+        volume[vpd_high] = 2.0
+        action[rain_hold] = A["hold"]
+        reason[rain_hold] = R["rain-expected"]
+        volume[rain_hold] = 0.0
+
+        return {"action": action, "reason": reason, "volume_l_m2": volume.astype(np.float32)}
+
+
 # ============================================================
 # AI PLACEHOLDER — Comportamento probabilistico
 # ============================================================
@@ -131,4 +323,7 @@ def make_strategy(name: str) -> BaseStrategy:
     if name == "ml_placeholder":
         return MLPlaceholderStrategy()
 
+    if name == "agronomic":
+        return AgronomicStrategy()
+
     return SimpleRuleStrategy()
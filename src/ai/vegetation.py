@@ -0,0 +1,204 @@
+# src/ai/vegetation.py
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+# ============================================================
+#  INDICI DI VEGETAZIONE (vettorizzati)
+# ============================================================
+
+_EPS = 1e-6
+
+# Intervalli dell'indice mappati linearmente su vegetation_health ∈ [0, 1]
+NDVI_RANGE = (0.1, 0.8)
+EXG_RANGE = (0.0, 0.5)
+
+# Soglia di health oltre la quale il pixel è considerato vegetazione
+COVER_THRESHOLD = 0.3
+
+
+def excess_green(rgb: np.ndarray) -> np.ndarray:
+    """ExG = 2g - r - b sulle coordinate cromatiche normalizzate."""
+    rgb = rgb.astype(np.float32, copy=False)
+    total = rgb.sum(axis=-1) + _EPS
+    r = rgb[..., 0] / total
+    g = rgb[..., 1] / total
+    b = rgb[..., 2] / total
+    return 2.0 * g - r - b
+
+
+def ndvi(nir: np.ndarray, red: np.ndarray) -> np.ndarray:
+    """NDVI = (NIR - Red) / (NIR + Red)."""
+    nir = nir.astype(np.float32, copy=False)
+    red = red.astype(np.float32, copy=False)
+    return (nir - red) / (nir + red + _EPS)
+
+
+def health_map(tile: np.ndarray, bands: str) -> Tuple[np.ndarray, str]:
+    """
+    Salute per pixel ∈ [0, 1] di un tile (H, W, C).
+    bands: "rgb" → ExG, "rgbn" (R, G, B, NIR) → NDVI.
+    """
+    if bands == "rgbn" and tile.shape[-1] >= 4:
+        lo, hi = NDVI_RANGE
+        index = ndvi(tile[..., 3], tile[..., 0])
+        name = "ndvi"
+    else:
+        lo, hi = EXG_RANGE
+        index = excess_green(tile[..., :3])
+        name = "exg"
+    return np.clip((index - lo) / (hi - lo), 0.0, 1.0), name
+
+
+# ============================================================
+#  SORGENTI RASTER
+# ============================================================
+
+def open_raster(path: str, shape: Optional[Tuple[int, int, int]] = None,
+                dtype: Union[str, np.dtype] = "uint8") -> np.ndarray:
+    """
+    Apre un raster (H, W, C) senza caricarlo in memoria quando possibile:
+    - .npy          → np.load(mmap_mode="r")
+    - .raw / .bin   → np.memmap con `shape` e `dtype` espliciti
+    - altri formati → Pillow (opzionale), caricamento completo
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return np.load(path, mmap_mode="r")
+    if ext in (".raw", ".bin"):
+        if shape is None:
+            raise ValueError("shape obbligatoria per raster raw")
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError(f"Formato '{ext}' non supportato senza Pillow (pip install pillow)")
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def raw_meta(path: str) -> Dict[str, Any]:
+    """Forma e dtype dei raster .raw/.bin dal file gemello <nome>.json."""
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if not path.lower().endswith((".raw", ".bin")) or not os.path.exists(sidecar):
+        return {}
+    with open(sidecar, "r") as f:
+        meta = json.load(f)
+    return {"shape": tuple(meta["shape"]), "dtype": meta.get("dtype", "uint8")}
+
+
+# ============================================================
+#  ANALISI A TILE CON STATISTICHE PER ZONA
+# ============================================================
+
+def analyze_raster(raster: np.ndarray, bands: str = "rgb", zones: Tuple[int, int] = (3, 3),
+                   tile: int = 1024) -> Dict[str, Any]:
+    """
+    Calcola vegetation_health e statistiche per zona di un raster (H, W, C).
+
+    Il raster viene letto a blocchi di `tile` × `tile` pixel: con un np.memmap
+    la memoria usata dipende solo dalla dimensione del blocco, non da quella
+    dell'ortomosaico. Le statistiche di zona (media, deviazione standard,
+    copertura vegetale) sono accumulate con np.bincount, senza cicli Python
+    sui pixel.
+    """
+    if raster.ndim != 3 or raster.shape[-1] < 3:
+        raise ValueError("raster atteso con forma (H, W, C) e almeno 3 bande")
+
+    h, w = raster.shape[:2]
+    zr, zc = zones
+    n_zones = zr * zc
+
+    # Zona di colonna per ogni pixel di una riga (uguale per tutti i blocchi)
+    col_zone = (np.arange(w) * zc // w).astype(np.int64)
+
+    sums = np.zeros(n_zones, dtype=np.float64)
+    sumsq = np.zeros(n_zones, dtype=np.float64)
+    cover = np.zeros(n_zones, dtype=np.float64)
+    counts = np.zeros(n_zones, dtype=np.float64)
+    index_name = "exg"
+
+    for r0 in range(0, h, tile):
+        r1 = min(h, r0 + tile)
+        row_zone = (np.arange(r0, r1) * zr // h).astype(np.int64)
+
+        for c0 in range(0, w, tile):
+            c1 = min(w, c0 + tile)
+            block = np.asarray(raster[r0:r1, c0:c1])
+            health, index_name = health_map(block, bands)
+
+            zone_ids = (row_zone[:, None] * zc + col_zone[None, c0:c1]).ravel()
+            values = health.ravel().astype(np.float64)
+
+            sums += np.bincount(zone_ids, weights=values, minlength=n_zones)
+            sumsq += np.bincount(zone_ids, weights=values * values, minlength=n_zones)
+            cover += np.bincount(zone_ids, weights=(values >= COVER_THRESHOLD), minlength=n_zones)
+            counts += np.bincount(zone_ids, minlength=n_zones)
+
+    safe = np.maximum(counts, 1.0)
+    means = sums / safe
+    stds = np.sqrt(np.maximum(sumsq / safe - means * means, 0.0))
+    covers = cover / safe
+    total = counts.sum()
+
+    zones_out = [
+        {
+            "zone": f"r{i // zc}c{i % zc}",
+            "mean": round(float(means[i]), 3),
+            "std": round(float(stds[i]), 3),
+            "cover": round(float(covers[i]), 3),
+        }
+        for i in range(n_zones)
+    ]
+
+    return {
+        "vegetation_health": round(float(sums.sum() / max(total, 1.0)), 3),
+        "vegetation_cover": round(float(cover.sum() / max(total, 1.0)), 3),
+        "index": index_name,
+        "pixels": int(total),
+        "zones": zones_out,
+    }
+
+
+def aggregate_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggrega le analisi di più frame dello stesso campo, pesando ogni frame
+    per il numero di pixel: health, copertura e statistiche per zona.
+    """
+    results = [r for r in results if r and r.get("pixels")]
+    if not results:
+        return {"vegetation_health": None, "vegetation_cover": None, "frames": 0, "pixels": 0, "zones": []}
+
+    weights = np.array([r["pixels"] for r in results], dtype=np.float64)
+    total = weights.sum()
+    health = np.array([r["vegetation_health"] for r in results]) @ weights / total
+    cover = np.array([r["vegetation_cover"] for r in results]) @ weights / total
+
+    zones: Dict[str, List[Tuple[float, float, float]]] = {}
+    for r, wgt in zip(results, weights):
+        for z in r.get("zones", []):
+            zones.setdefault(z["zone"], []).append((wgt, z["mean"], z["cover"]))
+
+    zones_out = []
+    for name, vals in zones.items():
+        arr = np.array(vals, dtype=np.float64)
+        wsum = arr[:, 0].sum()
+        zones_out.append({
+            "zone": name,
+            "mean": round(float(arr[:, 0] @ arr[:, 1] / wsum), 3),
+            "cover": round(float(arr[:, 0] @ arr[:, 2] / wsum), 3),
+        })
+
+    return {
+        "vegetation_health": round(float(health), 3),
+        "vegetation_cover": round(float(cover), 3),
+        "index": results[-1].get("index"),
+        "frames": len(results),
+        "pixels": int(total),
+        "zones": zones_out,
+    }
@@ -10,6 +10,12 @@ from ..agents.sensor_manager import SensorManager
 from ..agents.weather_agent import WeatherAgent
 from ..agents.decision_agent import DecisionAgent
 from ..agents.image_agent import ImageAgent  # supporto immagini
+from ..agents.history_agent import HistoryAgent
+from ..agents.rollup_agent import RollupAgent
+from ..agents.irrigation_agent import IrrigationAgent
+from ..agents.fleet_agent import FleetDecisionAgent
+from ..common.config import FLEET_MODE, HISTORY_DIR, IRRIGATION_PLAN_SECS
+from ..common.scheduler import shutdown_scheduler
 
 
 def main():
@@ -18,8 +24,22 @@ def main():
     # Modalità DEMO controllata dalla dashboard
     demo_mode = os.getenv("GF_DEMO_MODE", "false").lower() == "true"
 
-    # Decision Agent sempre attivo
-    decision = DecisionAgent()
+    # Decision Agent sempre attivo: per campo, oppure multi-campo su FieldStore
+    decision = FleetDecisionAgent() if FLEET_MODE else DecisionAgent()
+
+    # Storico Parquet delle decisioni (HISTORY_DIR vuoto = disattivato)
+    history = HistoryAgent() if HISTORY_DIR else None
+    if history:
+        history.start()
+
+    # Rollup per la panoramica multi-campo della dashboard
+    rollup = RollupAgent()
+    rollup.start()
+
+    # Piano di irrigazione con budget idrico e pompa condivisi tra le zone
+    irrigation = IrrigationAgent() if IRRIGATION_PLAN_SECS > 0 else None
+    if irrigation:
+        irrigation.start()
 
     if demo_mode:
         print("[SYSTEM] Modalità DEMO attiva: avvio solo DecisionAgent.")
@@ -52,7 +72,14 @@ def main():
             weather.stop()
             image_agent.stop()
 
-        time.sleep(1.0)
+        rollup.stop()
+        if irrigation:
+            irrigation.stop()
+        if history:
+            history.stop()
+
+        # Annulla i task periodici senza attendere sleep pendenti
+        shutdown_scheduler()
         print("[SYSTEM] Shutdown completo.")
 
 
@@ -7,6 +7,171 @@ MQTT_CLIENT_PREFIX = os.getenv("MQTT_CLIENT_PREFIX", "greenfield")
 SENSOR_PUBLISH_INTERVAL_SECS = int(os.getenv("SENSOR_PUBLISH_INTERVAL_SECS", "5"))
 FIELD_ID = os.getenv("FIELD_ID", "field-01")
 
-AI_STRATEGY = os.getenv("AI_STRATEGY", "simple_rules")  # simple_rules | ml_placeholder
+AI_STRATEGY = os.getenv("AI_STRATEGY", "simple_rules")  # simple_rules | agronomic | ml_placeholder
 
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "")
+
+# Scheduler condiviso degli agenti periodici
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+SCHEDULER_JITTER_SECS = float(os.getenv("SCHEDULER_JITTER_SECS", "0.2"))
+
+# Catalogo scenari demo (test_cases) e velocità di riproduzione delle serie
+SCENARIOS_DIR = os.getenv("SCENARIOS_DIR", "test_cases")
+SCENARIO_SPEEDUP = float(os.getenv("SCENARIO_SPEEDUP", "60"))
+
+# Finestre (secondi) delle feature agronomiche mobili: WSI medio, stress cumulato, ET0
+FEATURE_WINDOWS_SECS = [
+    float(x) for x in os.getenv("FEATURE_WINDOWS_SECS", "900,3600,86400").split(",") if x.strip()
+]
+
+# Esecuzione della pipeline: compiled (catena fusa su record a slot) | chain
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "compiled")
+
+# Scadenza (TTL, secondi) dei valori in cache del DecisionAgent.
+# STALENESS_TTL_SECS vale per tutte le grandezze, STALENESS_TTLS la sovrascrive per chiave.
+STALENESS_TTL_SECS = float(os.getenv("STALENESS_TTL_SECS", "15"))
+STALENESS_TTLS = {
+    k.strip(): float(v)
+    for k, v in (
+        p.split("=", 1)
+        for p in os.getenv("STALENESS_TTLS", "wind_kmh=30,radiation=30,vegetation_health=45").split(",")
+        if "=" in p
+    )
+}
+
+# Pubblicazione decisioni: always | changes | delta (+ snapshot completo ogni heartbeat)
+DECISION_PUBLISH_MODE = os.getenv("DECISION_PUBLISH_MODE", "delta")
+DECISION_HEARTBEAT_SECS = float(os.getenv("DECISION_HEARTBEAT_SECS", "30"))
+DECISION_DEADBANDS = {
+    k.strip(): float(v)
+    for k, v in (
+        p.split("=", 1)
+        for p in os.getenv(
+            "DECISION_DEADBANDS",
+            "temperature=0.5,humidity=2,light=50,wind_kmh=2,radiation=25,"
+            "vegetation_health=0.02,water_stress_index=0.05",
+        ).split(",")
+        if "=" in p
+    )
+}
+
+# Ingestione MQTT del DecisionAgent: coda limitata e periodo di applicazione allo stato
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "10000"))
+INGEST_INTERVAL_SECS = float(os.getenv("INGEST_INTERVAL_SECS", "0.1"))
+
+# Trasporto MQTT: tcp (broker esterno) | inprocess (bus in memoria, singolo processo)
+MQTT_TRANSPORT = os.getenv("MQTT_TRANSPORT", "tcp").lower().strip()
+
+# Analisi immagini reali: cartella di input (vuota = valori simulati), bande, zone e tile
+IMAGE_INPUT_DIR = os.getenv("IMAGE_INPUT_DIR", "")
+IMAGE_BANDS = os.getenv("IMAGE_BANDS", "rgb").lower().strip()  # rgb | rgbn
+IMAGE_ZONES = tuple(int(x) for x in os.getenv("IMAGE_ZONES", "3x3").lower().split("x"))
+IMAGE_TILE_PX = int(os.getenv("IMAGE_TILE_PX", "1024"))
+# Pool di processi per l'analisi immagini (0 = analisi nel thread dell'agente)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0"))
+IMAGE_QUEUE_MAX = int(os.getenv("IMAGE_QUEUE_MAX", "64"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "4096"))
+
+# Previsioni meteo: provider (none | simulated | http), endpoint in formato Open-Meteo,
+# cache per cella di griglia e orizzonti pubblicati per la pipeline
+FIELD_LAT = float(os.getenv("FIELD_LAT", "41.90"))
+FIELD_LON = float(os.getenv("FIELD_LON", "12.50"))
+FORECAST_PROVIDER = os.getenv("FORECAST_PROVIDER", "none").lower().strip()
+FORECAST_URL = os.getenv("FORECAST_URL", "")
+FORECAST_TTL_SECS = float(os.getenv("FORECAST_TTL_SECS", "1800"))
+FORECAST_TIMEOUT_SECS = float(os.getenv("FORECAST_TIMEOUT_SECS", "5"))
+FORECAST_GRID_DEG = float(os.getenv("FORECAST_GRID_DEG", "0.1"))
+FORECAST_PUBLISH_SECS = float(os.getenv("FORECAST_PUBLISH_SECS", "300"))
+FORECAST_HORIZONS_H = [int(x) for x in os.getenv("FORECAST_HORIZONS_H", "6,24,48").split(",") if x.strip()]
+
+# Storico decisioni in Parquet partizionato per campo/giorno (vuoto = disattivato)
+HISTORY_DIR = os.getenv("HISTORY_DIR", "")
+HISTORY_FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", "10000"))
+HISTORY_FLUSH_SECS = float(os.getenv("HISTORY_FLUSH_SECS", "300"))
+HISTORY_ROW_GROUP_ROWS = int(os.getenv("HISTORY_ROW_GROUP_ROWS", "65536"))
+HISTORY_COMPRESSION = os.getenv("HISTORY_COMPRESSION", "zstd")
+
+# Rollup server-side delle decisioni: risoluzione (s) → numero di bucket conservati,
+# e periodo di pubblicazione della panoramica multi-campo
+ROLLUP_RESOLUTIONS = {
+    int(k): int(v)
+    for k, v in (
+        p.split(":", 1)
+        for p in os.getenv("ROLLUP_RESOLUTIONS", "60:120,3600:168").split(",")
+        if ":" in p
+    )
+}
+ROLLUP_PUBLISH_SECS = float(os.getenv("ROLLUP_PUBLISH_SECS", "5"))
+
+# Valutazione in ombra: strategie candidate (separate da virgola, vuoto = disattivata),
+# budget per tick, worker dedicati e periodo di pubblicazione delle statistiche
+SHADOW_STRATEGIES = [s.strip().lower() for s in os.getenv("SHADOW_STRATEGIES", "").split(",") if s.strip()]
+SHADOW_BUDGET_MS = float(os.getenv("SHADOW_BUDGET_MS", "200"))
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "2"))
+SHADOW_STATS_SECS = float(os.getenv("SHADOW_STATS_SECS", "60"))
+
+# Budget di latenza (ms) della strategia primaria non a regole: oltre il budget
+# il DecisionAgent usa il risultato di SimpleRuleStrategy (0 = nessun budget)
+ESTIMATION_BUDGET_MS = float(os.getenv("ESTIMATION_BUDGET_MS", "250"))
+
+# Spool su disco dei publisher (sensori, meteo) per le disconnessioni dal broker:
+# cartella (vuota = disattivato), dimensione massima, batch e velocità di recupero
+SPOOL_DIR = os.getenv("SPOOL_DIR", "")
+SPOOL_MAX_MB = float(os.getenv("SPOOL_MAX_MB", "50"))
+SPOOL_BATCH_SIZE = int(os.getenv("SPOOL_BATCH_SIZE", "500"))
+SPOOL_DRAIN_RATE = float(os.getenv("SPOOL_DRAIN_RATE", "2000"))  # letture/s
+
+# Pianificazione irrigazione multi-zona (una zona per campo): periodo di ripianificazione
+# (0 = disattivata), budget idrico condiviso sull'orizzonte (0 = illimitato), portata della
+# pompa e della singola zona (l/min), slot e orizzonte, superfici delle zone (m²)
+IRRIGATION_PLAN_SECS = float(os.getenv("IRRIGATION_PLAN_SECS", "60"))
+IRRIGATION_WATER_BUDGET_L = float(os.getenv("IRRIGATION_WATER_BUDGET_L", "50000"))
+IRRIGATION_PUMP_LPM = float(os.getenv("IRRIGATION_PUMP_LPM", "600"))
+IRRIGATION_ZONE_LPM = float(os.getenv("IRRIGATION_ZONE_LPM", "60"))
+IRRIGATION_SLOT_MIN = float(os.getenv("IRRIGATION_SLOT_MIN", "15"))
+IRRIGATION_HORIZON_SLOTS = int(os.getenv("IRRIGATION_HORIZON_SLOTS", "96"))
+IRRIGATION_DEFAULT_AREA_M2 = float(os.getenv("IRRIGATION_DEFAULT_AREA_M2", "1000"))
+IRRIGATION_ZONE_AREAS = {
+    k.strip(): float(v)
+    for k, v in (
+        p.split("=", 1)
+        for p in os.getenv("IRRIGATION_ZONE_AREAS", "").split(",")
+        if "=" in p
+    )
+}
+# Zone senza decisioni da più di così (secondi) escono dal piano
+IRRIGATION_MAX_AGE_SECS = float(os.getenv("IRRIGATION_MAX_AGE_SECS", "600"))
+
+# Rilevamento anomalie per sensore (picchi, sonda bloccata, deriva): le letture
+# segnalate non entrano nella fusione e finiscono su greenfield/<campo>/anomalies.
+# La deriva si valuta solo dopo 10 / ANOMALY_EWMA_SLOW letture per sensore: con i
+# default 2000 letture, circa 2,8 ore a SENSOR_PUBLISH_INTERVAL_SECS=5
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "true").lower() == "true"
+ANOMALY_SPIKE_Z = float(os.getenv("ANOMALY_SPIKE_Z", "6"))
+ANOMALY_FLATLINE_N = int(os.getenv("ANOMALY_FLATLINE_N", "60"))
+ANOMALY_DRIFT_Z = float(os.getenv("ANOMALY_DRIFT_Z", "4"))
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "30"))
+ANOMALY_EWMA_FAST = float(os.getenv("ANOMALY_EWMA_FAST", "0.2"))
+ANOMALY_EWMA_SLOW = float(os.getenv("ANOMALY_EWMA_SLOW", "0.005"))
+
+# Modalità multi-campo: un FleetDecisionAgent decide per tutti i campi
+# (greenfield/+/...) su uno store a colonne, al posto del DecisionAgent per campo
+FLEET_MODE = os.getenv("FLEET_MODE", "false").lower() == "true"
+FLEET_TICK_SECS = float(os.getenv("FLEET_TICK_SECS", "1"))
+FLEET_CAPACITY = int(os.getenv("FLEET_CAPACITY", "1024"))
+
+# Dati simulati degli agenti: uniform (valori casuali indipendenti, default) |
+# realistic (serie correlate con ciclo diurno: di notte luce < 80 e umidità alta
+# fanno scattare "alert/extreme-conditions" a ogni notte); seed vuoto = casuale
+SYNTHETIC_DATA = os.getenv("SYNTHETIC_DATA", "uniform").lower().strip()
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED")) if os.getenv("SYNTHETIC_SEED", "").strip() else None
+
+# Riavvio a caldo del DecisionAgent: snapshot periodico dello stato su disco
+# (es. data/state/decision_agent.json; vuoto = disattivato), ripristinato
+# all'avvio; con RETAIN_LAST_VALUES sensori, meteo, immagini e decisioni
+# complete sono pubblicati come retained. Dei delta non resta traccia sul
+# broker: un nuovo sottoscrittore parte da uno snapshot vecchio fino a
+# DECISION_HEARTBEAT_SECS e il primo delta che riceve conta un salto di seq
+STATE_SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH", "")
+STATE_SNAPSHOT_SECS = float(os.getenv("STATE_SNAPSHOT_SECS", "30"))
+RETAIN_LAST_VALUES = os.getenv("RETAIN_LAST_VALUES", "false").lower() == "true"
@@ -0,0 +1,70 @@
+# src/common/expiry.py
+
+import heapq
+import itertools
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+# ============================================================
+#  ExpiryHeap – scadenza dei valori in cache con min-heap
+# ============================================================
+
+class ExpiryHeap:
+    """
+    Tiene traccia della scadenza (TTL) di ogni chiave con un min-heap di
+    deadline: touch() costa O(log n) e expire() estrae solo le voci scadute,
+    senza scansionare tutte le chiavi ad ogni tick.
+
+    Le voci superate da un touch() successivo restano nel heap e vengono
+    scartate pigramente grazie al numero di versione.
+    """
+
+    def __init__(self, ttls: Dict[Hashable, float], default_ttl: Optional[float] = None):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._version: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+
+    def ttl(self, key: Hashable) -> Optional[float]:
+        return self.ttls.get(key, self.default_ttl)
+
+    def touch(self, key: Hashable, ts: float):
+        """Registra un aggiornamento di `key` avvenuto all'istante `ts`."""
+        ttl = self.ttl(key)
+        if ttl is None:
+            return
+        seq = next(self._seq)
+        self._version[key] = seq
+        heapq.heappush(self._heap, (ts + ttl, seq, key))
+        # Compattazione se le voci obsolete dominano il heap
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._version):
+            self._compact()
+
+    def discard(self, key: Hashable):
+        """Rimuove la chiave (es. valore azzerato manualmente)."""
+        self._version.pop(key, None)
+
+    def expire(self, now: float) -> List[Hashable]:
+        """Estrae e restituisce le chiavi scadute entro `now`."""
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            _, seq, key = heapq.heappop(heap)
+            if self._version.get(key) == seq:
+                del self._version[key]
+                expired.append(key)
+        return expired
+
+    def next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap and self._version.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def _compact(self):
+        self._heap = [e for e in self._heap if self._version.get(e[2]) == e[1]]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._version)
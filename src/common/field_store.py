@@ -0,0 +1,219 @@
+# src/common/field_store.py
+
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from ..ai.strategies import ACTIONS, REASONS, BaseStrategy
+from ..pipeline.vectorized import features_batch
+
+
+INPUT_KEYS = ("temperature", "humidity", "light", "wind_kmh", "radiation", "vegetation_health")
+
+# Ingressi minimi per decidere (come il ciclo LIVE del DecisionAgent)
+REQUIRED_KEYS = ("temperature", "humidity")
+
+NO_DECISION = -1
+
+
+# ============================================================
+#  FieldStore – stato di molti campi in colonne NumPy
+# ============================================================
+
+class FieldStore:
+    """
+    Ultimi ingressi, timestamp e ultima decisione di tutti i campi in
+    colonne NumPy preallocate, una riga per campo (mappa field_id → riga).
+    La capacità raddoppia quando serve: crescita ammortizzata O(1).
+
+    - valori float32, NaN = mancante o scaduto
+    - timestamp float32 in secondi dall'`epoch` dello store (risoluzione
+      sotto il secondo per mesi di esercizio)
+    - decisione: codici azione / motivo (ACTIONS / REASONS) e volume
+
+    Circa 70 byte di colonne per campo, contro i kilobyte di due dict
+    Python di float boxed per campo. evaluate() valuta tutti i campi
+    sporchi con features_batch + estimate_batch in un'unica passata.
+    """
+
+    def __init__(self, capacity: int = 1024, epoch: Optional[float] = None):
+        self.epoch = time.time() if epoch is None else epoch
+        self.index: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self._alloc(max(1, capacity))
+
+    # ---------------------------------------------------------
+    # Colonne
+    # ---------------------------------------------------------
+    def _alloc(self, capacity: int):
+        old = self.__dict__.get("values")
+        n = len(self.ids)
+        values = {k: np.full(capacity, np.nan, dtype=np.float32) for k in INPUT_KEYS}
+        stamps = {k: np.full(capacity, np.nan, dtype=np.float32) for k in INPUT_KEYS}
+        cols = {
+            "wsi": np.full(capacity, np.nan, dtype=np.float32),
+            "action": np.full(capacity, NO_DECISION, dtype=np.int8),
+            "reason": np.full(capacity, NO_DECISION, dtype=np.int8),
+            "volume": np.zeros(capacity, dtype=np.float32),
+            "decided_ts": np.full(capacity, np.nan, dtype=np.float32),
+            "full_ts": np.full(capacity, -np.inf, dtype=np.float32),
+            "seq": np.zeros(capacity, dtype=np.uint32),
+            "dirty": np.zeros(capacity, dtype=bool),
+        }
+        if old is not None:
+            for k in INPUT_KEYS:
+                values[k][:n] = self.values[k][:n]
+                stamps[k][:n] = self.stamps[k][:n]
+            for name, arr in cols.items():
+                arr[:n] = getattr(self, name)[:n]
+        self.values = values
+        self.stamps = stamps
+        for name, arr in cols.items():
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        cols = list(self.values.values()) + list(self.stamps.values()) + [
+            self.wsi, self.action, self.reason, self.volume, self.decided_ts,
+            self.full_ts, self.seq, self.dirty]
+        return sum(c.nbytes for c in cols)
+
+    def bytes_per_field(self) -> float:
+        """Byte di colonne per riga (esclusa la mappa degli id)."""
+        return self.nbytes() / self.capacity
+
+    # ---------------------------------------------------------
+    # Righe
+    # ---------------------------------------------------------
+    def row(self, field_id: str) -> int:
+        i = self.index.get(field_id)
+        if i is None:
+            i = self.index[field_id] = len(self.ids)
+            if i >= self.capacity:
+                self._alloc(2 * self.capacity)
+            self.ids.append(field_id)
+        return i
+
+    def rows(self, field_ids: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.row(f) for f in field_ids), dtype=np.int64)
+
+    def rel(self, ts) -> np.ndarray:
+        """Timestamp assoluti → secondi dall'epoch dello store (float32)."""
+        return (np.asarray(ts, dtype=np.float64) - self.epoch).astype(np.float32)
+
+    # ---------------------------------------------------------
+    # Ingestione
+    # ---------------------------------------------------------
+    def set_many(self, rows: np.ndarray, key: str, values: Sequence[float], ts: Sequence[float]):
+        """
+        Scrive una grandezza per molte righe. Vince la lettura più recente:
+        valori più vecchi di quello in colonna (backfill) sono ignorati, e tra
+        più letture della stessa riga nel blocco resta quella con ts maggiore.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        values = np.asarray(values, dtype=np.float32)
+        rel = self.rel(ts)
+        # Ordine per ts: con indici ripetuti NumPy mantiene l'ultima scrittura
+        order = np.argsort(rel, kind="stable")
+        rows, values, rel = rows[order], values[order], rel[order]
+        cur = self.stamps[key][rows]
+        newer = np.isnan(cur) | (rel >= cur)
+        rows, values, rel = rows[newer], values[newer], rel[newer]
+        self.values[key][rows] = values
+        self.stamps[key][rows] = rel
+        self.dirty[rows] = True
+
+    def expire(self, now: float, ttls: Dict[str, float], default_ttl: Optional[float] = None) -> int:
+        """Azzera (NaN) i valori più vecchi del proprio TTL; restituisce quanti."""
+        n = len(self.ids)
+        now_rel = np.float32(now - self.epoch)
+        expired = 0
+        for key in INPUT_KEYS:
+            ttl = ttls.get(key, default_ttl)
+            if ttl is None:
+                continue
+            stale = ~np.isnan(self.values[key][:n]) & (now_rel - self.stamps[key][:n] > ttl)
+            if stale.any():
+                self.values[key][:n][stale] = np.nan
+                self.dirty[:n] |= stale
+                expired += int(stale.sum())
+        return expired
+
+    # ---------------------------------------------------------
+    # Valutazione
+    # ---------------------------------------------------------
+    def evaluate(self, strategy: BaseStrategy, now: float) -> Dict[str, np.ndarray]:
+        """
+        Valuta in un'unica passata vettoriale tutti i campi sporchi con gli
+        ingressi minimi. Restituisce le righe valutate e quelle la cui
+        decisione (azione, motivo o volume) è cambiata.
+
+        I campi sporchi senza ingressi minimi (es. temperatura scaduta)
+        perdono la decisione: come il DecisionAgent, che con la cache
+        incompleta non decide, non ricevono più heartbeat finché i dati
+        non tornano.
+        """
+        n = len(self.ids)
+        dirty = self.dirty[:n]
+        ready = dirty.copy()
+        for key in REQUIRED_KEYS:
+            ready &= ~np.isnan(self.values[key][:n])
+        unready = np.flatnonzero(dirty & ~ready)
+        self.action[unready] = NO_DECISION
+        self.reason[unready] = NO_DECISION
+        self.volume[unready] = 0.0
+        self.wsi[unready] = np.nan
+        rows = np.flatnonzero(ready)
+        self.dirty[:n] = False
+        if not len(rows):
+            return {"rows": rows, "changed": rows}
+
+        cols = {k: self.values[k][rows].astype(np.float64) for k in INPUT_KEYS}
+        feats = features_batch(cols)
+        out = strategy.estimate_batch(feats)
+
+        action = out["action"].astype(np.int8)
+        reason = out["reason"].astype(np.int8)
+        volume = out["volume_l_m2"].astype(np.float32)
+        changed = (action != self.action[rows]) | (reason != self.reason[rows]) | (volume != self.volume[rows])
+
+        self.wsi[rows] = feats["water_stress_index"]
+        self.action[rows] = action
+        self.reason[rows] = reason
+        self.volume[rows] = volume
+        self.decided_ts[rows] = np.float32(now - self.epoch)
+        return {"rows": rows, "changed": rows[changed]}
+
+    def heartbeat_due(self, now: float, heartbeat_secs: float) -> np.ndarray:
+        """Righe con una decisione il cui ultimo snapshot completo è più vecchio di heartbeat_secs."""
+        n = len(self.ids)
+        now_rel = np.float32(now - self.epoch)
+        due = (self.action[:n] != NO_DECISION) & (now_rel - self.full_ts[:n] >= heartbeat_secs)
+        return np.flatnonzero(due)
+
+    # ---------------------------------------------------------
+    # Vista di una riga (messaggi, debug)
+    # ---------------------------------------------------------
+    def record(self, i: int) -> Dict[str, Any]:
+        """Stato di un campo nel formato dei messaggi `decisions` (snapshot completo)."""
+        out: Dict[str, Any] = {}
+        for key in INPUT_KEYS:
+            v = self.values[key][i]
+            out[key] = None if np.isnan(v) else round(float(v), 3)
+        wsi = self.wsi[i]
+        out["water_stress_index"] = None if np.isnan(wsi) else round(float(wsi), 3)
+        if self.action[i] != NO_DECISION:
+            out["suggestion"] = {
+                "action": ACTIONS[self.action[i]],
+                "reason": REASONS[self.reason[i]],
+                "volume_l_m2": round(float(self.volume[i]), 2),
+            }
+        decided = self.decided_ts[i]
+        out["ts"] = None if np.isnan(decided) else self.epoch + float(decided)
+        return out
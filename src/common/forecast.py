@@ -0,0 +1,212 @@
+# src/common/forecast.py
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    FORECAST_GRID_DEG, FORECAST_HORIZONS_H, FORECAST_PROVIDER, FORECAST_TIMEOUT_SECS,
+    FORECAST_TTL_SECS, FORECAST_URL,
+)
+
+Cell = Tuple[float, float]
+
+
+# ============================================================
+#  Orizzonti di previsione
+# ============================================================
+
+def summarize_hourly(times: List[str], temps: List[float], rain: List[float],
+                     now: Optional[datetime] = None,
+                     horizons_h: List[int] = FORECAST_HORIZONS_H) -> Dict[str, Any]:
+    """
+    Riduce una serie oraria (formato Open-Meteo: time, temperature_2m,
+    precipitation) agli orizzonti usati dalla pipeline:
+    forecast_rain_mm_<H>h e forecast_temp_max_<H>h a partire dall'ora corrente.
+    """
+    now = now or datetime.now(timezone.utc)
+    current = now.strftime("%Y-%m-%dT%H:00")
+    start = 0
+    for i, t in enumerate(times):
+        if t[:16] >= current:
+            start = i
+            break
+
+    out: Dict[str, Any] = {}
+    for h in horizons_h:
+        window_t = [x for x in temps[start:start + h] if x is not None]
+        window_r = [x for x in rain[start:start + h] if x is not None]
+        out[f"forecast_rain_mm_{h}h"] = round(sum(window_r), 2) if window_r else None
+        out[f"forecast_temp_max_{h}h"] = round(max(window_t), 1) if window_t else None
+    return out
+
+
+# ============================================================
+#  Provider base + simulato
+# ============================================================
+
+class ForecastProvider:
+    name = "base"
+
+    def cell(self, lat: float, lon: float) -> Cell:
+        g = FORECAST_GRID_DEG
+        return (round(round(lat / g) * g, 4), round(round(lon / g) * g, 4))
+
+    def get(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class SimulatedForecastProvider(ForecastProvider):
+    """Previsioni fittizie, coerenti con i valori casuali del WeatherAgent."""
+    name = "simulated"
+
+    def get(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        out: Dict[str, Any] = {}
+        for h in FORECAST_HORIZONS_H:
+            out[f"forecast_rain_mm_{h}h"] = round(random.choice([0.0, 0.0, random.uniform(0.0, h / 2)]), 2)
+            out[f"forecast_temp_max_{h}h"] = round(random.uniform(15.0, 36.0), 1)
+        return out
+
+
+# ============================================================
+#  Provider HTTP con cache TTL, revalidazione e coalescing
+# ============================================================
+
+class _CellEntry:
+    __slots__ = ("hourly", "fetched_at", "etag", "last_modified", "lock")
+
+    def __init__(self):
+        # Serie oraria grezza (time, temperature_2m, precipitation): gli
+        # orizzonti si ricalcolano a ogni lettura a partire dall'ora corrente
+        self.hourly: Optional[Tuple[List[str], List[float], List[float]]] = None
+        self.fetched_at = 0.0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        # Un solo fetch per cella: gli altri chiamanti attendono questo lock
+        self.lock = threading.Lock()
+
+
+class HttpForecastProvider(ForecastProvider):
+    """
+    Previsioni da un endpoint HTTP in formato Open-Meteo
+    (GET ?latitude=..&longitude=..&hourly=temperature_2m,precipitation).
+
+    - cache per cella di griglia (FORECAST_GRID_DEG) con TTL: i campi nella
+      stessa cella condividono la stessa voce, quindi le chiamate al
+      provider sono O(celle), non O(campi)
+    - alla scadenza del TTL la voce viene rivalidata con If-None-Match /
+      If-Modified-Since: un 304 rinnova la voce senza trasferire dati
+    - la voce conserva la serie oraria grezza e get() la riduce agli
+      orizzonti a partire dall'ora corrente, così le finestre avanzano
+      anche quando la serie è servita dalla cache o da un 304
+    - richieste concorrenti sulla stessa cella vengono unite (coalescing):
+      una sola esegue il fetch, le altre riusano il risultato
+    - sessione requests condivisa con pool di connessioni keep-alive
+    - in caso di errore si restituisce l'ultimo dato valido (stale)
+    """
+    name = "http"
+
+    def __init__(self, url: str = FORECAST_URL, ttl_secs: float = FORECAST_TTL_SECS,
+                 timeout: float = FORECAST_TIMEOUT_SECS, session: Optional[requests.Session] = None):
+        self.url = url
+        self.ttl = ttl_secs
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._entries: Dict[Cell, _CellEntry] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "fetches": 0, "not_modified": 0, "coalesced": 0, "errors": 0}
+
+    def _entry(self, cell: Cell) -> _CellEntry:
+        with self._lock:
+            entry = self._entries.get(cell)
+            if entry is None:
+                entry = self._entries[cell] = _CellEntry()
+            return entry
+
+    @staticmethod
+    def _summary(entry: _CellEntry) -> Optional[Dict[str, Any]]:
+        hourly = entry.hourly
+        return summarize_hourly(*hourly) if hourly is not None else None
+
+    def get(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        cell = self.cell(lat, lon)
+        entry = self._entry(cell)
+
+        if entry.hourly is not None and time.time() - entry.fetched_at < self.ttl:
+            self.stats["hits"] += 1
+            return self._summary(entry)
+
+        # Se un altro thread sta già aggiornando la cella, si attende il suo risultato
+        if not entry.lock.acquire(blocking=False):
+            self.stats["coalesced"] += 1
+            with entry.lock:
+                return self._summary(entry)
+        try:
+            if entry.hourly is not None and time.time() - entry.fetched_at < self.ttl:
+                self.stats["hits"] += 1
+            else:
+                self._refresh(cell, entry)
+            return self._summary(entry)
+        finally:
+            entry.lock.release()
+
+    def _refresh(self, cell: Cell, entry: _CellEntry):
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        params = {
+            "latitude": cell[0],
+            "longitude": cell[1],
+            "hourly": "temperature_2m,precipitation",
+            "forecast_days": max(1, -(-max(FORECAST_HORIZONS_H) // 24) + 1),
+            "timezone": "UTC",
+        }
+        try:
+            resp = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304 and entry.hourly is not None:
+                self.stats["not_modified"] += 1
+                entry.fetched_at = time.time()
+                return
+            resp.raise_for_status()
+            hourly = resp.json()["hourly"]
+            entry.hourly = (hourly["time"], hourly["temperature_2m"], hourly["precipitation"])
+            entry.etag = resp.headers.get("ETag")
+            entry.last_modified = resp.headers.get("Last-Modified")
+            entry.fetched_at = time.time()
+            self.stats["fetches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[Forecast] Errore aggiornando la cella {cell}: {e}")
+
+
+# ============================================================
+#  FACTORY — provider condiviso di processo
+# ============================================================
+
+_shared: Optional[ForecastProvider] = None
+_shared_lock = threading.Lock()
+
+
+def get_forecast_provider() -> Optional[ForecastProvider]:
+    """Provider configurato con FORECAST_PROVIDER (none | simulated | http)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            if FORECAST_PROVIDER == "http" and FORECAST_URL:
+                _shared = HttpForecastProvider()
+            elif FORECAST_PROVIDER == "simulated":
+                _shared = SimulatedForecastProvider()
+        return _shared
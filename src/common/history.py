@@ -0,0 +1,299 @@
+# src/common/history.py
+
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .config import (
+    FEATURE_WINDOWS_SECS, FORECAST_HORIZONS_H, HISTORY_COMPRESSION, HISTORY_DIR,
+    HISTORY_FLUSH_ROWS, HISTORY_FLUSH_SECS, HISTORY_ROW_GROUP_ROWS,
+)
+from ..pipeline.features import window_label
+
+TimeLike = Union[None, float, int, datetime, date]
+
+# Partizioni hive: <root>/field_id=<campo>/date=<AAAA-MM-GG>/
+PARTITIONING = ds.partitioning(pa.schema([("field_id", pa.string()), ("date", pa.string())]),
+                               flavor="hive")
+
+COMPACTED_NAME = "compacted.parquet"
+
+_FIELD_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+# ============================================================
+#  Schema e conversione messaggio → riga
+# ============================================================
+
+def history_schema() -> pa.Schema:
+    """
+    Colonne di una decisione: input, feature, finestre mobili e orizzonti
+    di previsione configurati, suggerimento appiattito.
+    """
+    fields = [
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("light", pa.float64()),
+        ("wind_kmh", pa.float64()),
+        ("radiation", pa.float64()),
+        ("vegetation_health", pa.float64()),
+        ("water_stress_index", pa.float64()),
+        ("vpd_kpa", pa.float64()),
+        ("et0_mm_h", pa.float64()),
+    ]
+    for w in FEATURE_WINDOWS_SECS:
+        label = window_label(w)
+        fields += [(f"wsi_mean_{label}", pa.float64()),
+                   (f"stress_hours_{label}", pa.float64()),
+                   (f"et0_mm_{label}", pa.float64())]
+    for h in FORECAST_HORIZONS_H:
+        fields += [(f"forecast_rain_mm_{h}h", pa.float64()),
+                   (f"forecast_temp_max_{h}h", pa.float64())]
+    fields += [
+        ("scenario_t", pa.float64()),
+        # Poche modalità ripetute: codifica a dizionario, file piccoli e scan veloci
+        ("action", pa.dictionary(pa.int8(), pa.string())),
+        ("reason", pa.dictionary(pa.int8(), pa.string())),
+        ("volume_l_m2", pa.float64()),
+    ]
+    return pa.schema(fields)
+
+
+def decision_row(state: Dict[str, Any], schema: pa.Schema) -> Dict[str, Any]:
+    """Riga piatta dallo stato ricostruito di una decisione."""
+    suggestion = state.get("suggestion") or {}
+    ts = state.get("ts") or time.time()
+    row = {name: state.get(name) for name in schema.names}
+    row["ts"] = int(float(ts) * 1000)
+    row["action"] = suggestion.get("action")
+    row["reason"] = suggestion.get("reason")
+    row["volume_l_m2"] = suggestion.get("volume_l_m2")
+    return row
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Allinea un file scritto con una configurazione diversa allo schema corrente."""
+    columns = []
+    for f in schema:
+        if f.name in table.column_names:
+            columns.append(table.column(f.name).cast(f.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, f.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _write_atomic(table: pa.Table, path: str, row_group_rows: int, compression: str):
+    # I file che iniziano con "." sono ignorati dalle query: niente letture parziali
+    tmp = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(table, tmp, row_group_size=row_group_rows, compression=compression,
+                   use_dictionary=["action", "reason"], write_statistics=True)
+    os.replace(tmp, path)
+
+
+# ============================================================
+#  HistorySink – buffer per partizione e scrittura a batch
+# ============================================================
+
+class HistorySink:
+    """
+    Accumula le decisioni in memoria per (campo, giorno UTC) e le scrive in
+    file Parquet compressi quando il buffer raggiunge `flush_rows` righe o
+    la riga più vecchia supera `flush_secs`.
+
+    Ogni flush produce un file part-*.parquet; compact() riunisce i file dei
+    giorni chiusi in un unico file ordinato per ts, con row group grandi
+    (`row_group_rows`) e statistiche min/max usate per il pruning.
+    """
+
+    def __init__(self, root: str = HISTORY_DIR, flush_rows: int = HISTORY_FLUSH_ROWS,
+                 flush_secs: float = HISTORY_FLUSH_SECS, row_group_rows: int = HISTORY_ROW_GROUP_ROWS,
+                 compression: str = HISTORY_COMPRESSION):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self.schema = history_schema()
+        self._buffers: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._oldest: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.files_written = 0
+
+    def partition_dir(self, field_id: str, day: str) -> str:
+        return os.path.join(self.root, f"field_id={field_id}", f"date={day}")
+
+    # ---------------------------------------------------------
+    # Scrittura
+    # ---------------------------------------------------------
+    def append(self, field_id: str, state: Dict[str, Any]):
+        if not _FIELD_RE.match(field_id) or field_id in (".", ".."):
+            print(f"[History] Campo non valido ignorato: {field_id!r}")
+            return
+        row = decision_row(state, self.schema)
+        day = datetime.fromtimestamp(row["ts"] / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+        key = (field_id, day)
+        with self._lock:
+            buf = self._buffers.setdefault(key, [])
+            if not buf:
+                self._oldest[key] = time.time()
+            buf.append(row)
+            full = len(buf) >= self.flush_rows
+        if full:
+            self._flush_keys([key])
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """Scrive le partizioni piene o troppo vecchie; restituisce le righe scritte."""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [k for k, buf in self._buffers.items()
+                   if buf and (len(buf) >= self.flush_rows or now - self._oldest[k] >= self.flush_secs)]
+        return self._flush_keys(due)
+
+    def flush(self) -> int:
+        """Scrive tutti i buffer (arresto dell'agente)."""
+        with self._lock:
+            keys = [k for k, buf in self._buffers.items() if buf]
+        return self._flush_keys(keys)
+
+    def _flush_keys(self, keys: Iterable[Tuple[str, str]]) -> int:
+        written = 0
+        for key in keys:
+            with self._lock:
+                rows = self._buffers.pop(key, None)
+                self._oldest.pop(key, None)
+            if not rows:
+                continue
+            field_id, day = key
+            table = pa.Table.from_pylist(rows, schema=self.schema).sort_by("ts")
+            path = self.partition_dir(field_id, day)
+            os.makedirs(path, exist_ok=True)
+            name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}.parquet"
+            try:
+                _write_atomic(table, os.path.join(path, name), self.row_group_rows, self.compression)
+            except OSError as e:
+                print(f"[History] Errore scrivendo {path}: {e}")
+                continue
+            written += len(rows)
+            self.rows_written += len(rows)
+            self.files_written += 1
+        return written
+
+    # ---------------------------------------------------------
+    # Compattazione dei giorni chiusi
+    # ---------------------------------------------------------
+    def compact_partition(self, path: str) -> bool:
+        """Unisce i file di una partizione in compacted.parquet ordinato per ts."""
+        files = sorted(
+            f for f in os.listdir(path)
+            if f.endswith(".parquet") and not f.startswith((".", "_"))
+        )
+        parts = [f for f in files if f != COMPACTED_NAME]
+        if not parts:
+            return False
+
+        tables = [_conform(pq.read_table(os.path.join(path, f)), self.schema) for f in files]
+        table = pa.concat_tables(tables).unify_dictionaries().sort_by("ts")
+        _write_atomic(table, os.path.join(path, COMPACTED_NAME), self.row_group_rows, self.compression)
+        for f in parts:
+            os.remove(os.path.join(path, f))
+        return True
+
+    def compact(self, before: Optional[str] = None) -> int:
+        """Compatta tutte le partizioni con data < `before` (default: oggi UTC)."""
+        before = before or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        if not os.path.isdir(self.root):
+            return 0
+        compacted = 0
+        for field_dir in os.listdir(self.root):
+            field_path = os.path.join(self.root, field_dir)
+            if not field_dir.startswith("field_id=") or not os.path.isdir(field_path):
+                continue
+            for day_dir in os.listdir(field_path):
+                if not day_dir.startswith("date=") or day_dir[5:] >= before:
+                    continue
+                try:
+                    compacted += self.compact_partition(os.path.join(field_path, day_dir))
+                except Exception as e:
+                    print(f"[History] Errore compattando {field_dir}/{day_dir}: {e}")
+        return compacted
+
+
+# ============================================================
+#  Query con pushdown di predicati e colonne
+# ============================================================
+
+def _to_datetime(value: TimeLike) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return datetime.fromtimestamp(float(value), tz=timezone.utc)
+
+
+def open_history(root: str = HISTORY_DIR) -> ds.Dataset:
+    """Dataset Arrow sullo storico; le colonne mancanti nei file vecchi valgono null."""
+    schema = history_schema()
+    for f in PARTITIONING.schema:
+        schema = schema.append(f)
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING, schema=schema)
+
+
+def query_history(field_id: Union[None, str, List[str]] = None, start: TimeLike = None,
+                  end: TimeLike = None, columns: Optional[List[str]] = None,
+                  where: Optional[ds.Expression] = None, days: Optional[float] = None,
+                  root: str = HISTORY_DIR) -> pd.DataFrame:
+    """
+    Carica lo storico delle decisioni leggendo solo ciò che serve:
+    - field_id e l'intervallo temporale scartano intere partizioni
+      (cartelle field_id=/date=) senza aprirle
+    - il filtro su ts e `where` (espressione pyarrow.dataset, es.
+      ds.field("action") == "alert") usano le statistiche dei row group
+    - `columns` limita le colonne decodificate; ts è sempre incluso
+
+    Esempio: campo X, ultimi 30 giorni, solo WSI e azione
+        query_history("field-01", days=30, columns=["water_stress_index", "action"])
+    """
+    if days is not None and start is None:
+        start = time.time() - days * 86400
+    start_dt, end_dt = _to_datetime(start), _to_datetime(end)
+
+    if columns is not None:
+        columns = ["ts"] + [c for c in columns if c != "ts"]
+    if not os.path.isdir(root):
+        names = columns or (history_schema().names + PARTITIONING.schema.names)
+        return pd.DataFrame(columns=names)
+
+    expr = None
+
+    def both(e):
+        return e if expr is None else expr & e
+
+    if field_id is not None:
+        ids = [field_id] if isinstance(field_id, str) else list(field_id)
+        expr = both(ds.field("field_id").isin(ids))
+    if start_dt is not None:
+        expr = both(ds.field("date") >= start_dt.strftime("%Y-%m-%d"))
+        expr = both(ds.field("ts") >= pa.scalar(start_dt, pa.timestamp("ms", tz="UTC")))
+    if end_dt is not None:
+        expr = both(ds.field("date") <= end_dt.strftime("%Y-%m-%d"))
+        expr = both(ds.field("ts") < pa.scalar(end_dt, pa.timestamp("ms", tz="UTC")))
+    if where is not None:
+        expr = both(where)
+
+    table = open_history(root).to_table(columns=columns, filter=expr)
+    if table.num_rows:
+        table = table.sort_by("ts")
+    return table.to_pandas()
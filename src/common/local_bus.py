@@ -0,0 +1,286 @@
+# src/common/local_bus.py
+
+import itertools
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# ============================================================
+#  Messaggio e topic matching (semantica MQTT)
+# ============================================================
+
+class LocalMessage:
+    """Equivalente minimo di paho.mqtt.client.MQTTMessage."""
+
+    __slots__ = ("topic", "payload", "qos", "retain", "mid")
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False, mid: int = 0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Confronto MQTT: '+' = un livello, '#' = tutti i livelli restanti."""
+    p = pattern.split("/")
+    t = topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t):
+            return False
+        if part != "+" and part != t[i]:
+            return False
+    return len(p) == len(t)
+
+
+def _to_bytes(payload: Any) -> bytes:
+    if payload is None:
+        return b""
+    if isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, (bytearray, memoryview)):
+        return bytes(payload)
+    return str(payload).encode("utf-8")
+
+
+class _PublishInfo:
+    """Sostituto di MQTTMessageInfo: pubblicazione già completata."""
+
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, mid: int, rc: int = 0):
+        self.rc = rc
+        self.mid = mid
+
+    def wait_for_publish(self, timeout: Optional[float] = None):
+        return None
+
+    def is_published(self) -> bool:
+        return True
+
+
+# ============================================================
+#  LocalBroker – broker in-process
+# ============================================================
+
+class LocalBroker:
+    """
+    Broker MQTT in memoria per installazioni su un solo host e per i test.
+
+    Le sottoscrizioni esatte sono indicizzate per topic (lookup O(1)); quelle
+    con wildcard sono valutate a parte. I messaggi retained vengono
+    consegnati ai nuovi sottoscrittori come su un broker reale.
+    Con synchronous=True la consegna avviene nel thread di publish(), in
+    ordine deterministico: utile per simulazioni ad alta frequenza.
+    """
+
+    def __init__(self, synchronous: bool = False):
+        self.synchronous = synchronous
+        self._lock = threading.RLock()
+        self._exact: Dict[str, List["LocalClient"]] = {}
+        self._wild: List[Tuple[str, "LocalClient"]] = []
+        self._retained: Dict[str, LocalMessage] = {}
+        self._mid = itertools.count(1)
+
+    def subscribe(self, client: "LocalClient", pattern: str):
+        with self._lock:
+            if "+" in pattern or "#" in pattern:
+                if (pattern, client) not in self._wild:
+                    self._wild.append((pattern, client))
+            else:
+                subs = self._exact.setdefault(pattern, [])
+                if client not in subs:
+                    subs.append(client)
+            retained = [m for t, m in self._retained.items() if topic_matches(pattern, t)]
+        for m in retained:
+            client._deliver(m)
+
+    def unsubscribe(self, client: "LocalClient", pattern: str):
+        with self._lock:
+            if pattern in self._exact and client in self._exact[pattern]:
+                self._exact[pattern].remove(client)
+            self._wild = [(p, c) for p, c in self._wild if not (p == pattern and c is client)]
+
+    def detach(self, client: "LocalClient"):
+        with self._lock:
+            for subs in self._exact.values():
+                if client in subs:
+                    subs.remove(client)
+            self._wild = [(p, c) for p, c in self._wild if c is not client]
+
+    def publish(self, topic: str, payload: bytes, qos: int, retain: bool) -> int:
+        mid = next(self._mid)
+        msg = LocalMessage(topic, payload, qos, False, mid)
+        with self._lock:
+            if retain:
+                # Payload vuoto = cancellazione del retained, come su MQTT
+                if payload:
+                    self._retained[topic] = LocalMessage(topic, payload, qos, True, mid)
+                else:
+                    self._retained.pop(topic, None)
+            targets = list(self._exact.get(topic, ()))
+            for pattern, c in self._wild:
+                if c not in targets and topic_matches(pattern, topic):
+                    targets.append(c)
+        for c in targets:
+            c._deliver(msg)
+        return mid
+
+
+_default_broker: Optional[LocalBroker] = None
+_default_lock = threading.Lock()
+
+
+def get_local_broker() -> LocalBroker:
+    """Broker condiviso di processo usato da make_client()."""
+    global _default_broker
+    with _default_lock:
+        if _default_broker is None:
+            _default_broker = LocalBroker()
+        return _default_broker
+
+
+# ============================================================
+#  LocalClient – sottoinsieme dell'API paho usato dagli agenti
+# ============================================================
+
+class LocalClient:
+    """
+    Client compatibile con l'uso che gli agenti fanno di paho.mqtt.client.Client:
+    connect, publish, subscribe (con wildcard), on_message, loop_start/loop_stop,
+    loop_forever, disconnect.
+
+    I messaggi ricevuti vengono accodati e consegnati a on_message da un
+    thread dedicato avviato con loop_start() (come il thread di rete paho);
+    con un broker sincrono la consegna avviene direttamente in publish().
+    La coda è limitata a max_queued messaggi: se il loop non gira o non
+    tiene il passo, i nuovi messaggi vengono scartati e contati in `dropped`
+    invece di far crescere la memoria senza limite.
+    """
+
+    MAX_QUEUED = 10000
+
+    def __init__(self, client_id: str = "", broker: Optional[LocalBroker] = None,
+                 max_queued: int = MAX_QUEUED):
+        self._client_id = client_id
+        self._broker = broker or get_local_broker()
+        self._inbox: "queue.Queue[Optional[LocalMessage]]" = queue.Queue(maxsize=max_queued)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._connected = False
+        self.on_message: Optional[Callable[[Any, Any, LocalMessage], None]] = None
+        self.on_connect: Optional[Callable[..., None]] = None
+        self.on_disconnect: Optional[Callable[..., None]] = None
+        self.userdata: Any = None
+
+    # ---------------------------------------------------------
+    # Connessione
+    # ---------------------------------------------------------
+    def connect(self, host: str = "", port: int = 0, keepalive: int = 60) -> int:
+        self._connected = True
+        if self.on_connect:
+            self.on_connect(self, self.userdata, {}, 0)
+        return 0
+
+    def connect_async(self, host: str = "", port: int = 0, keepalive: int = 60):
+        self.connect(host, port, keepalive)
+
+    def reconnect(self) -> int:
+        return self.connect()
+
+    def disconnect(self) -> int:
+        self._connected = False
+        self._broker.detach(self)
+        if self.on_disconnect:
+            self.on_disconnect(self, self.userdata, 0)
+        return 0
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    # ---------------------------------------------------------
+    # Publish / subscribe
+    # ---------------------------------------------------------
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> _PublishInfo:
+        if not self._connected:
+            # Come paho: MQTT_ERR_NO_CONN, il messaggio non viene inviato
+            return _PublishInfo(0, rc=4)
+        mid = self._broker.publish(topic, _to_bytes(payload), qos, retain)
+        return _PublishInfo(mid)
+
+    def subscribe(self, topic: Any, qos: int = 0) -> Tuple[int, int]:
+        # Come paho: stringa singola oppure lista di (topic, qos)
+        topics = [topic] if isinstance(topic, str) else [t for t, _ in topic]
+        for t in topics:
+            self._broker.subscribe(self, t)
+        return 0, 1
+
+    def unsubscribe(self, topic: str) -> Tuple[int, int]:
+        self._broker.unsubscribe(self, topic)
+        return 0, 1
+
+    # ---------------------------------------------------------
+    # Consegna
+    # ---------------------------------------------------------
+    def _deliver(self, msg: LocalMessage):
+        if self._broker.synchronous:
+            self._dispatch(msg)
+            return
+        try:
+            self._inbox.put_nowait(msg)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"[LocalBus] Coda piena ({self._client_id}): {self.dropped} messaggi scartati")
+
+    def _dispatch(self, msg: LocalMessage):
+        cb = self.on_message
+        if cb is None:
+            return
+        try:
+            cb(self, self.userdata, msg)
+        except Exception as e:
+            print(f"[LocalBus] Errore in on_message ({self._client_id}):", e)
+
+    def loop(self, timeout: float = 1.0) -> int:
+        """Consegna i messaggi in coda (al massimo attende `timeout`)."""
+        try:
+            msg = self._inbox.get(timeout=timeout)
+        except queue.Empty:
+            return 0
+        while msg is not None:
+            self._dispatch(msg)
+            try:
+                msg = self._inbox.get_nowait()
+            except queue.Empty:
+                break
+        return 0
+
+    def _run(self):
+        while True:
+            msg = self._inbox.get()
+            if msg is None:
+                return
+            self._dispatch(msg)
+
+    def loop_start(self) -> int:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"local-bus-{self._client_id}", daemon=True)
+            self._thread.start()
+        return 0
+
+    def loop_stop(self, force: bool = False) -> int:
+        if self._thread is not None:
+            self._inbox.put(None)
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+        return 0
+
+    def loop_forever(self, *args, **kwargs) -> int:
+        self._run()
+        return 0
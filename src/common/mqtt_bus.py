@@ -1,9 +1,38 @@
 from paho.mqtt import client as mqtt
+import time
 import uuid
-from .config import MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_CLIENT_PREFIX
+from .config import MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_CLIENT_PREFIX, MQTT_TRANSPORT
+from .local_bus import LocalClient
 
-def make_client(name: str) -> mqtt.Client:
+def make_client(name: str, lazy: bool = False) -> mqtt.Client:
+    """
+    lazy=True: connessione asincrona, stabilita (e ristabilita) dal thread
+    di rete dopo loop_start(); il client si crea anche con il broker giù.
+    """
     client_id = f"{MQTT_CLIENT_PREFIX}-{name}-{uuid.uuid4().hex[:6]}"
+    # Installazione su singolo host: bus in-process, nessun broker né socket
+    if MQTT_TRANSPORT == "inprocess":
+        c = LocalClient(client_id=client_id)
+        c.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, keepalive=60)
+        return c
     c = mqtt.Client(client_id=client_id, clean_session=True, protocol=mqtt.MQTTv311)
-    c.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, keepalive=60)
+    if lazy:
+        c.reconnect_delay_set(min_delay=1, max_delay=60)
+        c.connect_async(MQTT_BROKER_HOST, MQTT_BROKER_PORT, keepalive=60)
+    else:
+        c.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, keepalive=60)
     return c
+
+def arrival_ts(msg, payload) -> float:
+    """
+    Istante di validità di un messaggio ricevuto: l'arrivo, tranne per i
+    retained, che valgono dal "ts" della misura (mai oltre l'arrivo): un
+    ultimo valore vecchio scade subito invece di sembrare fresco.
+    """
+    now = time.time()
+    if getattr(msg, "retain", False) and isinstance(payload, dict):
+        try:
+            return min(float(payload["ts"]), now)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return now
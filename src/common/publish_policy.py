@@ -0,0 +1,161 @@
+# src/common/publish_policy.py
+
+from typing import Any, Dict, Optional
+
+from .config import DECISION_DEADBANDS, DECISION_HEARTBEAT_SECS, DECISION_PUBLISH_MODE
+
+
+# Chiavi che cambiano ad ogni tick e non vanno confrontate
+_VOLATILE_KEYS = ("ts", "kind", "seq")
+
+
+def _moved(key: str, old: Any, new: Any, deadbands: Dict[str, float], rel: float) -> bool:
+    """True se `new` si discosta da `old` oltre la banda morta della feature."""
+    if old is None or new is None:
+        return old is not new
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        band = deadbands.get(key)
+        if band is None:
+            band = abs(old) * rel
+        return abs(new - old) > band
+    return old != new
+
+
+# ============================================================
+#  DecisionPublisher – politica di pubblicazione delle decisioni
+# ============================================================
+
+class DecisionPublisher:
+    """
+    Decide cosa pubblicare sul topic `decisions` ad ogni tick.
+
+    Modalità:
+    - always : snapshot completo ad ogni tick (comportamento storico)
+    - changes: snapshot completo solo se cambia il suggerimento, più heartbeat
+    - delta  : delta compatti (suggerimento + input oltre la banda morta,
+               chiavi sparite in "removed"), più uno snapshot completo
+               periodico come heartbeat
+
+    Ogni messaggio ha "kind" (full | delta) e un "seq" crescente; il
+    ricevitore ricostruisce lo stato con DecisionStateDecoder.
+    """
+
+    # Soglia relativa per le feature numeriche senza banda configurata
+    DEFAULT_REL_DEADBAND = 0.05
+
+    def __init__(self, mode: str = DECISION_PUBLISH_MODE,
+                 heartbeat_secs: float = DECISION_HEARTBEAT_SECS,
+                 deadbands: Optional[Dict[str, float]] = None):
+        self.mode = (mode or "delta").lower().strip()
+        self.heartbeat_secs = heartbeat_secs
+        self.deadbands = dict(DECISION_DEADBANDS if deadbands is None else deadbands)
+        self._sent: Dict[str, Any] = {}
+        self._last_full = float("-inf")
+        self._seq = 0
+        self.published = 0
+        self.suppressed = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def resume(self, seq: int):
+        """Riprende la numerazione dopo un riavvio: il ricevitore non vede salti."""
+        self._seq = int(seq)
+
+    def reset(self):
+        """Forza uno snapshot completo al prossimo tick."""
+        self._sent = {}
+        self._last_full = float("-inf")
+
+    def _full(self, processed: Dict[str, Any], now: float) -> Dict[str, Any]:
+        self._sent = dict(processed)
+        self._last_full = now
+        self._seq += 1
+        self.published += 1
+        msg = dict(processed)
+        msg["kind"] = "full"
+        msg["seq"] = self._seq
+        return msg
+
+    def next_message(self, processed: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+        """Restituisce il messaggio da pubblicare, oppure None se va soppresso."""
+        if self.mode == "always" or now - self._last_full >= self.heartbeat_secs:
+            return self._full(processed, now)
+
+        suggestion_changed = processed.get("suggestion") != self._sent.get("suggestion")
+
+        if self.mode == "changes":
+            if suggestion_changed:
+                return self._full(processed, now)
+            self.suppressed += 1
+            return None
+
+        # ---- delta ----
+        sent = self._sent
+        changes = {
+            k: v for k, v in processed.items()
+            if k not in _VOLATILE_KEYS
+            and (k not in sent or _moved(k, sent[k], v, self.deadbands, self.DEFAULT_REL_DEADBAND))
+        }
+        # Chiavi sparite dal record (es. previsioni scadute): il ricevitore le rimuove
+        removed = [k for k in sent if k not in processed and k not in _VOLATILE_KEYS]
+        if not changes and not removed:
+            self.suppressed += 1
+            return None
+
+        sent.update(changes)
+        for k in removed:
+            del sent[k]
+        self._seq += 1
+        self.published += 1
+        msg = {"kind": "delta", "seq": self._seq, "ts": processed.get("ts"), "changes": changes}
+        if removed:
+            msg["removed"] = removed
+        return msg
+
+    def suggestion_changed(self, msg: Optional[Dict[str, Any]]) -> bool:
+        """True se il messaggio porta un suggerimento nuovo o è un heartbeat."""
+        if msg is None:
+            return False
+        return msg["kind"] == "full" or "suggestion" in msg.get("changes", {}) \
+            or "suggestion" in msg.get("removed", ())
+
+
+# ============================================================
+#  DecisionStateDecoder – ricostruzione lato ricevitore
+# ============================================================
+
+class DecisionStateDecoder:
+    """
+    Ricostruisce lo stato completo di una decisione da snapshot e delta.
+    I messaggi senza "kind" (publisher storico) sono trattati come snapshot.
+    Un salto di sequenza viene contato; lo stato si riallinea al prossimo
+    heartbeat completo. Partendo dallo snapshot retained, il primo delta
+    ricevuto conta di norma un salto: lo snapshot può precedere di fino a
+    DECISION_HEARTBEAT_SECS i delta live.
+    """
+
+    def __init__(self):
+        self.state: Optional[Dict[str, Any]] = None
+        self._seq: Optional[int] = None
+        self.gaps = 0
+
+    def apply(self, msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        seq = msg.get("seq")
+        if self._seq is not None and seq is not None and seq != self._seq + 1:
+            self.gaps += 1
+        self._seq = seq
+
+        if msg.get("kind", "full") == "full":
+            self.state = {k: v for k, v in msg.items() if k not in ("kind", "seq")}
+            return dict(self.state)
+
+        if self.state is None:
+            # Delta senza snapshot di base: in attesa dell'heartbeat
+            return None
+        self.state.update(msg.get("changes", {}))
+        for k in msg.get("removed", ()):
+            self.state.pop(k, None)
+        self.state["ts"] = msg.get("ts")
+        return dict(self.state)
@@ -0,0 +1,196 @@
+# src/common/rollups.py
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .config import ROLLUP_RESOLUTIONS
+from ..pipeline.features import window_label
+
+
+# Grandezze aggregate per bucket (media, minimo, massimo)
+ROLLUP_METRICS = (
+    "temperature", "humidity", "light", "wind_kmh", "radiation",
+    "vegetation_health", "water_stress_index",
+)
+
+
+# ============================================================
+#  Bucket – aggregati di un intervallo [start, start + res)
+# ============================================================
+
+class Bucket:
+    __slots__ = ("start", "n", "counts", "sums", "mins", "maxs", "actions")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.n = 0
+        m = len(ROLLUP_METRICS)
+        self.counts = [0] * m
+        self.sums = [0.0] * m
+        self.mins: List[Optional[float]] = [None] * m
+        self.maxs: List[Optional[float]] = [None] * m
+        self.actions: Dict[str, int] = {}
+
+    def add(self, state: Dict[str, Any], action: Optional[str]):
+        self.n += 1
+        for i, key in enumerate(ROLLUP_METRICS):
+            v = state.get(key)
+            if v is None:
+                continue
+            v = float(v)
+            self.counts[i] += 1
+            self.sums[i] += v
+            if self.mins[i] is None or v < self.mins[i]:
+                self.mins[i] = v
+            if self.maxs[i] is None or v > self.maxs[i]:
+                self.maxs[i] = v
+        if action:
+            self.actions[action] = self.actions.get(action, 0) + 1
+
+    def mean(self, i: int) -> Optional[float]:
+        return round(self.sums[i] / self.counts[i], 3) if self.counts[i] else None
+
+
+# ============================================================
+#  FieldRollup – serie a più risoluzioni di un campo
+# ============================================================
+
+class FieldRollup:
+    """
+    Un deque di bucket per risoluzione, con lunghezza massima fissa:
+    ogni campione aggiorna solo il bucket corrente (O(1) per risoluzione)
+    e i bucket più vecchi escono automaticamente.
+    """
+
+    def __init__(self, resolutions: Dict[int, int]):
+        self.buckets: Dict[int, Deque[Bucket]] = {
+            res: deque(maxlen=keep) for res, keep in resolutions.items()
+        }
+        self.last: Dict[str, Any] = {}
+        self.last_ts = 0.0
+
+    def add(self, state: Dict[str, Any], ts: float):
+        action = (state.get("suggestion") or {}).get("action")
+        for res, series in self.buckets.items():
+            start = ts - ts % res
+            if not series or start > series[-1].start:
+                series.append(Bucket(start))
+                bucket = series[-1]
+            else:
+                # Decisione in ritardo: cerca il suo bucket tra quelli ancora in memoria
+                bucket = next((b for b in reversed(series) if b.start == start), None)
+                if bucket is None:
+                    continue
+            bucket.add(state, action)
+
+        if ts >= self.last_ts:
+            self.last_ts = ts
+            self.last = state
+
+    def current(self, res: int) -> Optional[Bucket]:
+        series = self.buckets.get(res)
+        return series[-1] if series else None
+
+    def last_closed(self, res: int, now: float) -> Optional[float]:
+        """Inizio dell'ultimo bucket chiuso (anche per campi che non trasmettono più)."""
+        series = self.buckets.get(res)
+        if not series:
+            return None
+        if series[-1].start + res <= now:
+            return series[-1].start
+        return series[-2].start if len(series) > 1 else None
+
+    def series(self, res: int) -> Dict[str, Any]:
+        """Serie colonnare (compatta in JSON) dei bucket di una risoluzione."""
+        buckets = list(self.buckets.get(res, ()))
+        out: Dict[str, Any] = {
+            "res": res,
+            "start": [b.start for b in buckets],
+            "n": [b.n for b in buckets],
+        }
+        for i, key in enumerate(ROLLUP_METRICS):
+            out[key] = {
+                "mean": [b.mean(i) for b in buckets],
+                "min": [b.mins[i] for b in buckets],
+                "max": [b.maxs[i] for b in buckets],
+            }
+        actions = sorted({a for b in buckets for a in b.actions})
+        out["actions"] = {a: [b.actions.get(a, 0) for b in buckets] for a in actions}
+        return out
+
+
+# ============================================================
+#  RollupStore – rollup incrementali di tutti i campi
+# ============================================================
+
+class RollupStore:
+    """
+    Rollup per campo, aggiornati con un campione dell'ultimo stato di ogni
+    campo a cadenza fissa (RollupAgent.tick).
+    overview() costruisce una riga per campo leggendo solo l'ultimo stato e
+    il bucket orario corrente: il costo non dipende dal numero di decisioni.
+    """
+
+    def __init__(self, resolutions: Dict[int, int] = ROLLUP_RESOLUTIONS):
+        self.resolutions = dict(resolutions)
+        self._fields: Dict[str, FieldRollup] = {}
+        self._lock = threading.Lock()
+
+    def add(self, field_id: str, state: Dict[str, Any], ts: float):
+        with self._lock:
+            field = self._fields.get(field_id)
+            if field is None:
+                field = self._fields[field_id] = FieldRollup(self.resolutions)
+            field.add(state, ts)
+
+    def closed(self, now: float) -> Dict[Tuple[str, int], float]:
+        """Ultimo bucket chiuso per (campo, risoluzione)."""
+        out = {}
+        with self._lock:
+            for field_id, field in self._fields.items():
+                for res in self.resolutions:
+                    start = field.last_closed(res, now)
+                    if start is not None:
+                        out[(field_id, res)] = start
+        return out
+
+    def fields(self) -> List[str]:
+        with self._lock:
+            return sorted(self._fields)
+
+    def series(self, field_id: str, res: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            field = self._fields.get(field_id)
+            return field.series(res) if field else None
+
+    def overview(self, now: float) -> List[Dict[str, Any]]:
+        hour = max(self.resolutions)
+        label = window_label(hour)
+        wsi = ROLLUP_METRICS.index("water_stress_index")
+        rows = []
+        with self._lock:
+            items = sorted(self._fields.items())
+            for field_id, field in items:
+                last = field.last
+                suggestion = last.get("suggestion") or {}
+                bucket = field.current(hour)
+                # Istante della decisione, non del campione
+                ts = float(last.get("ts") or field.last_ts)
+                rows.append({
+                    "field_id": field_id,
+                    "ts": ts,
+                    "age_s": round(now - ts, 1),
+                    "temperature": last.get("temperature"),
+                    "humidity": last.get("humidity"),
+                    "vegetation_health": last.get("vegetation_health"),
+                    "water_stress_index": last.get("water_stress_index"),
+                    "action": suggestion.get("action"),
+                    "reason": suggestion.get("reason"),
+                    "volume_l_m2": suggestion.get("volume_l_m2"),
+                    # Bucket corrente della risoluzione più lunga (di norma l'ora in corso)
+                    f"wsi_mean_{label}": bucket.mean(wsi) if bucket else None,
+                    f"wsi_max_{label}": bucket.maxs[wsi] if bucket else None,
+                    f"actions_{label}": dict(bucket.actions) if bucket else {},
+                })
+        return rows
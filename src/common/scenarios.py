@@ -0,0 +1,204 @@
+# src/common/scenarios.py
+
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import SCENARIOS_DIR, SCENARIO_SPEEDUP
+
+
+# ============================================================
+#  Scenario – snapshot statico o serie temporale
+# ============================================================
+
+class Scenario:
+    """
+    Scenario di test caricato da `test_cases/<nome>.json`.
+
+    Sono supportati due formati:
+    - snapshot statico (formato storico): {"temperature": 36, "humidity": 18, ...}
+    - serie temporale:
+        {
+          "description": "...",
+          "speedup": 60,          # opzionale, default SCENARIO_SPEEDUP
+          "loop": false,          # opzionale
+          "steps": [
+            {"t": 0,    "temperature": 24, "humidity": 55},
+            {"t": 3600, "temperature": 31, "humidity": 40}
+          ]
+        }
+      dove `t` è il tempo simulato in secondi. Tra due step i valori numerici
+      vengono interpolati linearmente.
+    """
+
+    __slots__ = ("name", "description", "speedup", "loop", "times", "frames", "keys")
+
+    def __init__(self, name: str, data: Any):
+        self.name = name
+        self.description = ""
+        self.speedup = SCENARIO_SPEEDUP
+        self.loop = False
+
+        if isinstance(data, dict) and "steps" in data:
+            self.description = data.get("description", "")
+            self.speedup = float(data.get("speedup", SCENARIO_SPEEDUP))
+            self.loop = bool(data.get("loop", False))
+            steps = sorted(data["steps"], key=lambda s: float(s.get("t", 0.0)))
+        elif isinstance(data, dict):
+            steps = [dict(data, t=0.0)]
+        else:
+            raise ValueError("formato scenario non valido")
+
+        if not steps:
+            raise ValueError("scenario senza step")
+
+        self.times: List[float] = [float(s.get("t", 0.0)) for s in steps]
+        self.frames: List[Dict[str, Any]] = [
+            {k: v for k, v in s.items() if k != "t"} for s in steps
+        ]
+        self.keys = sorted({k for f in self.frames for k in f})
+
+    @property
+    def is_series(self) -> bool:
+        return len(self.frames) > 1
+
+    @property
+    def duration(self) -> float:
+        return self.times[-1] - self.times[0]
+
+    def at(self, sim_t: float) -> Dict[str, Any]:
+        """Valori dello scenario al tempo simulato `sim_t` (secondi)."""
+        times = self.times
+        if not self.is_series:
+            return dict(self.frames[0])
+
+        t = sim_t + times[0]
+        if self.loop and self.duration > 0:
+            t = times[0] + (sim_t % self.duration)
+
+        if t <= times[0]:
+            return dict(self.frames[0])
+        if t >= times[-1]:
+            return dict(self.frames[-1])
+
+        i = bisect.bisect_right(times, t)
+        t0, t1 = times[i - 1], times[i]
+        a, b = self.frames[i - 1], self.frames[i]
+        w = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+
+        out: Dict[str, Any] = {}
+        for k in self.keys:
+            va, vb = a.get(k), b.get(k)
+            if isinstance(va, (int, float)) and isinstance(vb, (int, float)):
+                out[k] = round(va + (vb - va) * w, 3)
+            else:
+                # Valori non numerici o mancanti: vale lo step precedente
+                out[k] = va if va is not None else vb
+        return out
+
+    def player(self, start: float, speedup: Optional[float] = None) -> "ScenarioPlayer":
+        return ScenarioPlayer(self, start, speedup)
+
+
+# ============================================================
+#  ScenarioPlayer – riproduzione accelerata
+# ============================================================
+
+class ScenarioPlayer:
+    """
+    Riproduce uno scenario a partire dall'istante reale `start`.
+    Con speedup=60 un'ora simulata dura un minuto reale.
+    """
+
+    __slots__ = ("scenario", "start", "speedup")
+
+    def __init__(self, scenario: Scenario, start: float, speedup: Optional[float] = None):
+        self.scenario = scenario
+        self.start = start
+        self.speedup = float(speedup) if speedup else scenario.speedup
+
+    def sim_time(self, now: float) -> float:
+        return max(0.0, now - self.start) * self.speedup
+
+    def finished(self, now: float) -> bool:
+        s = self.scenario
+        return s.is_series and not s.loop and self.sim_time(now) >= s.duration
+
+    def sample(self, now: float) -> Dict[str, Any]:
+        record = self.scenario.at(self.sim_time(now))
+        if self.scenario.is_series:
+            record["scenario_t"] = round(self.sim_time(now), 1)
+        return record
+
+
+# ============================================================
+#  ScenarioCatalog – indice in memoria con reload per mtime
+# ============================================================
+
+class ScenarioCatalog:
+    """
+    Carica gli scenari una sola volta e li indicizza per nome.
+    Un file viene riletto solo se il suo mtime è cambiato; l'elenco della
+    cartella viene riletto solo se cambia il mtime della cartella.
+    """
+
+    def __init__(self, directory: str = SCENARIOS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[float, Scenario]] = {}
+        self._dir_mtime: Optional[float] = None
+        self._names: List[str] = []
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def names(self) -> List[str]:
+        try:
+            mtime = os.stat(self.directory).st_mtime
+        except OSError:
+            return []
+        with self._lock:
+            if mtime != self._dir_mtime:
+                self._names = sorted(
+                    f[:-5] for f in os.listdir(self.directory) if f.endswith(".json")
+                )
+                self._dir_mtime = mtime
+            return list(self._names)
+
+    def get(self, name: str) -> Optional[Scenario]:
+        # Evita path traversal: il nome deve essere un semplice basename
+        if not name or os.path.basename(name) != name:
+            return None
+
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            with self._lock:
+                self._index.pop(name, None)
+            return None
+
+        with self._lock:
+            cached = self._index.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        with open(path, "r") as f:
+            scenario = Scenario(name, json.load(f))
+
+        with self._lock:
+            self._index[name] = (mtime, scenario)
+        return scenario
+
+    def preload(self) -> int:
+        """Carica tutti gli scenari presenti; restituisce quanti sono validi."""
+        loaded = 0
+        for name in self.names():
+            try:
+                if self.get(name):
+                    loaded += 1
+            except Exception as e:
+                print(f"[ScenarioCatalog] Scenario '{name}' non valido: {e}")
+        return loaded
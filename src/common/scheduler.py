@@ -0,0 +1,235 @@
+# src/common/scheduler.py
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from .config import SCHEDULER_WORKERS
+
+
+# ============================================================
+#  ScheduledTask – handle di un task periodico
+# ============================================================
+
+class ScheduledTask:
+    """
+    Handle restituito da Scheduler.schedule_periodic().
+
+    Le scadenze sono ancorate all'istante di partenza (start + n * interval),
+    quindi il ritardo di esecuzione non si accumula nel tempo (drift correction).
+    Il jitter viene applicato alla singola scadenza, senza spostare l'ancora.
+    """
+
+    __slots__ = (
+        "name", "fn", "interval", "jitter", "_anchor", "_n",
+        "_cancelled", "_busy", "runs", "skipped", "errors",
+    )
+
+    def __init__(self, name: str, fn: Callable[[], None], interval: float,
+                 jitter: float, anchor: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self._anchor = anchor
+        self._n = 0
+        self._cancelled = False
+        self._busy = False
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def _next_deadline(self, now: float) -> float:
+        """Calcola la prossima scadenza saltando i periodi già persi."""
+        self._n += 1
+        ideal = self._anchor + self._n * self.interval
+        if ideal < now:
+            # Periodi persi (es. host sospeso): si riallinea senza raffiche
+            missed = int((now - ideal) // self.interval) + 1
+            self._n += missed
+            self.skipped += missed
+            ideal = self._anchor + self._n * self.interval
+        if self.jitter:
+            ideal += random.uniform(-self.jitter, self.jitter)
+        return ideal
+
+
+# ============================================================
+#  Scheduler – min-heap di scadenze + pool di esecuzione
+# ============================================================
+
+class Scheduler:
+    """
+    Scheduler condiviso per gli agenti periodici.
+
+    Un solo thread dispatcher dorme su una Condition fino alla prossima
+    scadenza del min-heap: a riposo il costo CPU è nullo e l'inserimento /
+    estrazione di un task costa O(log n). I callback vengono eseguiti su un
+    piccolo ThreadPoolExecutor, così un callback lento (es. webhook) non
+    ritarda gli altri task. Se un task è ancora in esecuzione alla scadenza
+    successiva, quell'esecuzione viene saltata e conteggiata in `skipped`.
+    """
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS):
+        self._heap: List[Tuple[float, int, ScheduledTask]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix="gf-sched")
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    # ---------------------------------------------------------
+    # Registrazione task
+    # ---------------------------------------------------------
+    def schedule_periodic(self, fn: Callable[[], None], interval: float,
+                          jitter: float = 0.0, first_delay: Optional[float] = None,
+                          name: Optional[str] = None) -> ScheduledTask:
+        """
+        Registra `fn` ogni `interval` secondi.
+        - jitter: scostamento casuale massimo (±secondi) su ogni scadenza
+        - first_delay: ritardo della prima esecuzione (default: subito)
+        """
+        if interval <= 0:
+            raise ValueError("interval deve essere > 0")
+
+        now = time.monotonic()
+        anchor = now + (first_delay or 0.0)
+        task = ScheduledTask(name or getattr(fn, "__name__", "task"), fn,
+                             float(interval), float(jitter), anchor)
+
+        first = anchor
+        if jitter:
+            first += random.uniform(0.0, jitter)
+
+        with self._cond:
+            heapq.heappush(self._heap, (first, next(self._seq), task))
+            # Sveglia il dispatcher solo se la nuova scadenza è la più vicina
+            if self._heap[0][2] is task:
+                self._cond.notify()
+        self.start()
+        return task
+
+    def cancel(self, task: ScheduledTask):
+        """
+        Annulla il task. La voce nel heap viene scartata pigramente, ma il
+        dispatcher viene svegliato subito così non resta in attesa inutile.
+        """
+        with self._cond:
+            task._cancelled = True
+            self._cond.notify()
+
+    # ---------------------------------------------------------
+    # Ciclo di vita
+    # ---------------------------------------------------------
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="gf-scheduler", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, wait: bool = True):
+        """Ferma il dispatcher immediatamente (nessuna sleep da attendere)."""
+        with self._cond:
+            self._running = False
+            for _, _, task in self._heap:
+                task._cancelled = True
+            self._heap.clear()
+            self._cond.notify_all()
+        if wait and self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __len__(self):
+        with self._cond:
+            return sum(1 for _, _, t in self._heap if not t._cancelled)
+
+    # ---------------------------------------------------------
+    # Dispatcher
+    # ---------------------------------------------------------
+    def _loop(self):
+        heap = self._heap
+        while True:
+            with self._cond:
+                while self._running:
+                    # Scarta i task annullati in testa al heap
+                    while heap and heap[0][2]._cancelled:
+                        heapq.heappop(heap)
+                    if not heap:
+                        self._cond.wait()
+                        continue
+                    delay = heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._running:
+                    return
+
+                now = time.monotonic()
+                due = []
+                while heap and heap[0][0] <= now:
+                    _, _, task = heapq.heappop(heap)
+                    if task._cancelled:
+                        continue
+                    heapq.heappush(heap, (task._next_deadline(now), next(self._seq), task))
+                    due.append(task)
+
+            for task in due:
+                if task._busy:
+                    task.skipped += 1
+                    continue
+                task._busy = True
+                try:
+                    self._executor.submit(self._run_task, task)
+                except RuntimeError:
+                    # Executor già chiuso durante lo shutdown
+                    task._busy = False
+                    return
+
+    @staticmethod
+    def _run_task(task: ScheduledTask):
+        try:
+            if not task._cancelled:
+                task.fn()
+                task.runs += 1
+        except Exception as e:
+            task.errors += 1
+            print(f"[Scheduler] Errore nel task '{task.name}':", e)
+        finally:
+            task._busy = False
+
+
+# ============================================================
+#  Scheduler condiviso di processo
+# ============================================================
+
+_shared: Optional[Scheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Restituisce lo scheduler condiviso, creandolo alla prima richiesta."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Scheduler()
+        return _shared
+
+
+def shutdown_scheduler():
+    """Arresta lo scheduler condiviso (se creato)."""
+    global _shared
+    with _shared_lock:
+        sched, _shared = _shared, None
+    if sched is not None:
+        sched.shutdown()
@@ -0,0 +1,86 @@
+# src/common/snapshot.py
+
+import threading
+from collections import deque
+from typing import Any, Callable, Generic, List, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+# ============================================================
+#  IngestQueue – coda limitata con conteggio degli scarti
+# ============================================================
+
+class IngestQueue:
+    """
+    Coda limitata tra il thread di rete MQTT (produttore) e il writer dello
+    stato (consumatore). Quando è piena scarta il messaggio più vecchio e lo
+    conteggia in `dropped`: una raffica non blocca mai il callback paho.
+
+    append/popleft di deque sono atomiche, quindi non serve un lock.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._q: deque = deque(maxlen=maxlen)
+        self.received = 0
+        self.dropped = 0
+        self.high_watermark = 0
+
+    def put(self, item: Any):
+        q = self._q
+        if len(q) >= self.maxlen:
+            self.dropped += 1
+        q.append(item)
+        self.received += 1
+        n = len(q)
+        if n > self.high_watermark:
+            self.high_watermark = n
+
+    def drain(self, limit: Optional[int] = None) -> List[Any]:
+        q = self._q
+        n = len(q) if limit is None else min(limit, len(q))
+        out = []
+        for _ in range(n):
+            try:
+                out.append(q.popleft())
+            except IndexError:
+                break
+        return out
+
+    def __len__(self):
+        return len(self._q)
+
+
+# ============================================================
+#  SnapshotHolder – snapshot versionati, lettura senza lock
+# ============================================================
+
+class SnapshotHolder(Generic[T]):
+    """
+    Contiene lo snapshot corrente di uno stato immutabile.
+
+    - read(): restituisce il riferimento corrente, senza lock. L'assegnazione
+      di un riferimento è atomica, quindi il lettore vede sempre uno snapshot
+      intero, mai uno stato a metà aggiornamento.
+    - update(fn): i writer costruiscono un nuovo snapshot a partire da quello
+      corrente e lo pubblicano con un solo assegnamento. Il lock serializza
+      solo i writer tra loro; i lettori non lo toccano mai.
+    """
+
+    def __init__(self, initial: T):
+        self._current = initial
+        self._write_lock = threading.Lock()
+        self.version = 0
+
+    def read(self) -> T:
+        return self._current
+
+    def update(self, fn: Callable[[T], T]) -> T:
+        with self._write_lock:
+            new = fn(self._current)
+            if new is not self._current:
+                self.version += 1
+                self._current = new
+            return new
@@ -0,0 +1,301 @@
+# src/common/spool.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .config import SPOOL_BATCH_SIZE, SPOOL_DIR, SPOOL_DRAIN_RATE, SPOOL_MAX_MB
+
+# Posizione nel log: (numero di segmento, offset in byte)
+Position = Tuple[int, int]
+
+# Esito di read_batch da confermare: posizione, righe lette in totale e
+# righe lette nel segmento finale (righe corrotte comprese)
+ReadMark = Tuple[Position, int, int]
+
+MQTT_ERR_SUCCESS = 0
+
+
+# ============================================================
+#  DiskSpool – log append-only a segmenti, dimensione limitata
+# ============================================================
+
+class _Segment:
+    __slots__ = ("seq", "size", "count")
+
+    def __init__(self, seq: int, size: int = 0, count: int = 0):
+        self.seq = seq
+        self.size = size
+        self.count = count
+
+
+class DiskSpool:
+    """
+    Coda persistente di messaggi (topic, payload JSON) su file.
+
+    - una riga JSON per messaggio, scritta in append sul segmento corrente
+    - oltre `max_bytes` vengono eliminati i segmenti più vecchi: si perdono
+      per primi i dati più vecchi
+    - read_batch() legge dal cursore senza consumare; commit() sposta il
+      cursore (salvato su disco) ed elimina i segmenti già inviati, così
+      dopo un riavvio il recupero riparte da dove si era fermato
+
+    Durabilità: ogni append() fa solo flush() (nessun fsync per lettura, che
+    costerebbe una scrittura sincrona sul disco a ogni messaggio). Un crash
+    del processo non perde nulla; un crash del sistema o un'interruzione di
+    corrente può perdere le righe del segmento corrente non ancora scritte
+    dal sistema operativo. I segmenti chiusi (al cambio di segmento e in
+    close()) sono sincronizzati con os.fsync.
+    """
+
+    CURSOR_FILE = "cursor.json"
+
+    def __init__(self, directory: str, max_bytes: int, segment_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes or max(64 * 1024, max_bytes // 8)
+        self._lock = threading.Lock()
+        self._segments: Deque[_Segment] = deque()
+        self._cursor: Position = (0, 0)
+        self._consumed = 0      # messaggi già inviati nel segmento del cursore
+        self._fh = None
+        self.pending = 0
+        self.appended = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # ---------------------------------------------------------
+    # File e recupero dopo riavvio
+    # ---------------------------------------------------------
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"seg-{seq:012d}.log")
+
+    def _recover(self):
+        seqs = sorted(
+            int(f[4:-4]) for f in os.listdir(self.directory)
+            if f.startswith("seg-") and f.endswith(".log")
+        )
+        cursor_path = os.path.join(self.directory, self.CURSOR_FILE)
+        if os.path.exists(cursor_path):
+            try:
+                with open(cursor_path, "r") as f:
+                    c = json.load(f)
+                self._cursor = (int(c["seq"]), int(c["offset"]))
+            except (ValueError, KeyError, OSError):
+                self._cursor = (seqs[0], 0) if seqs else (0, 0)
+
+        for seq in seqs:
+            if seq < self._cursor[0]:
+                os.remove(self._path(seq))
+                continue
+            with open(self._path(seq), "rb") as f:
+                data = f.read()
+            seg = _Segment(seq, len(data), data.count(b"\n"))
+            self._segments.append(seg)
+            if seq == self._cursor[0]:
+                self._consumed = data[:self._cursor[1]].count(b"\n")
+                self.pending += seg.count - self._consumed
+            else:
+                self.pending += seg.count
+
+        if not self._segments:
+            self._segments.append(_Segment(self._cursor[0]))
+        if self._cursor[0] < self._segments[0].seq:
+            self._cursor, self._consumed = (self._segments[0].seq, 0), 0
+        self._fh = open(self._path(self._segments[-1].seq), "ab")
+
+    def _save_cursor(self):
+        tmp = os.path.join(self.directory, ".cursor.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"seq": self._cursor[0], "offset": self._cursor[1]}, f)
+        os.replace(tmp, os.path.join(self.directory, self.CURSOR_FILE))
+
+    # ---------------------------------------------------------
+    # Scrittura
+    # ---------------------------------------------------------
+    def append(self, topic: str, payload: str):
+        line = (json.dumps([topic, payload], separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            tail = self._segments[-1]
+            if tail.size and tail.size + len(line) > self.segment_bytes:
+                self._close_segment()
+                tail = _Segment(tail.seq + 1)
+                self._segments.append(tail)
+                self._fh = open(self._path(tail.seq), "ab")
+            self._fh.write(line)
+            self._fh.flush()
+            tail.size += len(line)
+            tail.count += 1
+            self.pending += 1
+            self.appended += 1
+            self._enforce_limit()
+
+    def _enforce_limit(self):
+        total = sum(s.size for s in self._segments)
+        while total > self.max_bytes and len(self._segments) > 1:
+            old = self._segments.popleft()
+            total -= old.size
+            lost = old.count - (self._consumed if old.seq == self._cursor[0] else 0)
+            self.pending -= lost
+            self.dropped += lost
+            if old.seq >= self._cursor[0]:
+                self._cursor, self._consumed = (self._segments[0].seq, 0), 0
+                self._save_cursor()
+            os.remove(self._path(old.seq))
+
+    # ---------------------------------------------------------
+    # Lettura / conferma
+    # ---------------------------------------------------------
+    def read_batch(self, max_records: int) -> Tuple[List[Tuple[str, str]], ReadMark]:
+        """
+        Messaggi dal cursore in poi (al massimo max_records) e il segno da
+        passare a commit(). Le righe corrotte vengono saltate ma contate,
+        così il commit le consuma insieme ai messaggi validi.
+        """
+        with self._lock:
+            records: List[Tuple[str, str]] = []
+            seq, offset = self._cursor
+            lines = tail_lines = 0
+            for seg in list(self._segments):
+                if seg.seq < seq or len(records) >= max_records:
+                    continue
+                if seg.seq > seq:
+                    seq, offset, tail_lines = seg.seq, 0, 0
+                with open(self._path(seg.seq), "rb") as f:
+                    f.seek(offset)
+                    while len(records) < max_records:
+                        line = f.readline()
+                        if not line.endswith(b"\n"):
+                            break  # riga incompleta (scrittura interrotta) o fine file
+                        offset += len(line)
+                        lines += 1
+                        tail_lines += 1
+                        try:
+                            topic, payload = json.loads(line)
+                        except ValueError:
+                            continue
+                        records.append((topic, payload))
+            return records, ((seq, offset), lines, tail_lines)
+
+    def commit(self, mark: ReadMark):
+        """Conferma l'invio di quanto letto da read_batch()."""
+        pos, lines, tail_lines = mark
+        with self._lock:
+            if pos < self._cursor:
+                return  # segmenti nel frattempo eliminati per limite di spazio
+            if pos[0] != self._cursor[0]:
+                # Nel nuovo segmento del cursore contano solo le righe lette lì
+                self._consumed = tail_lines
+            else:
+                self._consumed += tail_lines
+            self._cursor = pos
+            self.pending = max(0, self.pending - lines)
+            while len(self._segments) > 1 and self._segments[0].seq < pos[0]:
+                os.remove(self._path(self._segments.popleft().seq))
+            self._save_cursor()
+
+    def _close_segment(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._close_segment()
+                self._fh = None
+
+
+# ============================================================
+#  SpooledPublisher – pubblicazione con store-and-forward
+# ============================================================
+
+class SpooledPublisher:
+    """
+    Publisher per gli agenti sensore / meteo.
+
+    - publish(): invio diretto se il client è connesso, altrimenti (o se
+      l'invio fallisce) la lettura finisce nello spool su disco
+    - drain(): eseguito periodicamente, rimanda il backlog in messaggi
+      {"batch": [...], "backfill": true} da `batch_size` letture, con QoS 1
+      e al massimo `rate` letture al secondo (token bucket)
+
+    Le letture nuove vanno subito in diretta anche durante il recupero:
+    il DecisionAgent riceve quindi timestamp fuori ordine e tiene il valore
+    più recente per ogni grandezza. Per lo stesso motivo i batch di recupero
+    non sono mai retained: sostituirebbero l'ultimo valore con uno arretrato.
+    """
+
+    def __init__(self, client, spool: DiskSpool, batch_size: int = SPOOL_BATCH_SIZE,
+                 rate: float = SPOOL_DRAIN_RATE):
+        self.client = client
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.rate = rate
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.backfilled = 0
+
+    def publish(self, topic: str, data: Dict[str, Any], retain: bool = False) -> bool:
+        payload = json.dumps(data)
+        if self.client.is_connected():
+            info = self.client.publish(topic, payload, qos=0, retain=retain)
+            if info.rc == MQTT_ERR_SUCCESS:
+                return True
+        self.spool.append(topic, payload)
+        return False
+
+    def drain(self) -> int:
+        now = time.monotonic()
+        # Capacità massima: un secondo di letture (almeno un batch)
+        cap = max(float(self.batch_size), self.rate)
+        self._tokens = min(cap, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if not self.spool.pending or not self.client.is_connected():
+            return 0
+
+        sent = 0
+        while self._tokens >= 1 and self.spool.pending:
+            records, mark = self.spool.read_batch(min(self.batch_size, int(self._tokens)))
+            if not records:
+                if mark[1]:
+                    # Solo righe corrotte: si confermano per non restare bloccati
+                    self.spool.commit(mark)
+                    continue
+                break
+
+            by_topic: Dict[str, List[Any]] = {}
+            for topic, payload in records:
+                by_topic.setdefault(topic, []).append(json.loads(payload))
+            for topic, items in by_topic.items():
+                body = json.dumps({"batch": items, "backfill": True})
+                info = self.client.publish(topic, body, qos=1, retain=False)
+                if info.rc != MQTT_ERR_SUCCESS:
+                    # Link di nuovo giù: il batch resta nello spool
+                    return sent
+
+            self.spool.commit(mark)
+            self._tokens -= len(records)
+            sent += len(records)
+
+        self.backfilled += sent
+        if sent and not self.spool.pending:
+            print(f"[Spool] Backlog di {self.spool.directory} recuperato ({self.backfilled} letture)")
+        return sent
+
+    def close(self):
+        self.spool.close()
+
+
+def make_spooled_publisher(client, name: str) -> Optional[SpooledPublisher]:
+    """Publisher con spool in SPOOL_DIR/<name>, oppure None se SPOOL_DIR è vuoto."""
+    if not SPOOL_DIR:
+        return None
+    spool = DiskSpool(os.path.join(SPOOL_DIR, name), int(SPOOL_MAX_MB * 1024 * 1024))
+    if spool.pending:
+        print(f"[Spool] {name}: {spool.pending} letture in attesa da una sessione precedente")
+    return SpooledPublisher(client, spool)
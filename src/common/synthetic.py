@@ -0,0 +1,256 @@
+# src/common/synthetic.py
+
+import math
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .config import FIELD_ID, FIELD_LAT, FIELD_LON, SYNTHETIC_DATA, SYNTHETIC_SEED
+from ..pipeline.vectorized import CLEAN_RANGES
+
+
+SERIES_KEYS = ("temperature", "humidity", "light", "wind_kmh", "radiation", "vegetation_health")
+
+DAY = 86400.0
+
+# Scale temporali dei processi (secondi)
+TAU_SYNOPTIC = 3 * DAY        # regimi meteo di più giorni
+TAU_CLOUD = 4 * 3600.0        # persistenza della copertura nuvolosa
+TAU_HEATING = 3 * 3600.0      # inerzia termica: la temperatura segue la radiazione in ritardo
+TAU_WIND = 2 * 3600.0
+TAU_NOISE = 20 * 60.0
+TAU_STRESS = 5 * DAY          # la vegetazione risponde alla siccità in giorni
+
+# Rumore di misura per sensore (deviazione standard) usato dagli agenti live
+SENSOR_NOISE = {"temperature": 0.15, "humidity": 0.8, "light": 15.0,
+                "wind_kmh": 0.5, "radiation": 8.0, "vegetation_health": 0.01}
+
+
+def ar_filter(u: np.ndarray, a: float, y0: np.ndarray) -> np.ndarray:
+    """
+    Ricorsione del primo ordine y[t] = a·y[t-1] + u[t] lungo l'asse 1,
+    vettorizzata su tutte le righe: a blocchi, con
+    y[t] = a^t · (y0 + Σ_k u[k]·a^-k), lunghezza del blocco scelta in modo
+    che a^-L resti ≤ 1e6 (nessuna perdita di precisione in float64).
+    """
+    n = u.shape[1]
+    out = np.empty_like(u, dtype=np.float64)
+    la = -math.log(a) if a > 0 else math.inf
+    block = int(max(1, min(n, 4096, 13.8 / la if la > 0 else n)))
+    k = np.arange(1, block + 1, dtype=np.float64)
+    up, down = a ** k, a ** -k
+    y = np.asarray(y0, dtype=np.float64)
+    for s in range(0, n, block):
+        e = min(n, s + block)
+        m = e - s
+        acc = np.cumsum(u[:, s:e] * down[:m], axis=1)
+        out[:, s:e] = up[:m] * (y[:, None] + acc)
+        y = out[:, e - 1]
+    return out
+
+
+def solar_elevation_sin(ts: np.ndarray, lat_deg: np.ndarray, lon_deg: np.ndarray) -> np.ndarray:
+    """Seno dell'elevazione solare (righe = campi, colonne = istanti UTC)."""
+    doy = (ts / DAY) % 365.25
+    decl = np.radians(23.44) * np.sin(2 * np.pi * (doy - 81) / 365.25)
+    solar_h = (ts % DAY) / 3600.0 + lon_deg[:, None] / 15.0
+    hour_angle = np.radians(15.0 * (solar_h - 12.0))
+    lat = np.radians(lat_deg)[:, None]
+    return np.sin(lat) * np.sin(decl) + np.cos(lat) * np.cos(decl) * np.cos(hour_angle)
+
+
+def saturation_vp(t: np.ndarray) -> np.ndarray:
+    return np.exp(17.625 * t / (243.04 + t))
+
+
+# ============================================================
+#  SyntheticGenerator – serie correlate per molti campi
+# ============================================================
+
+class SyntheticGenerator:
+    """
+    Serie sintetiche fisicamente plausibili per molti campi, come matrici
+    (campi × istanti), generate a blocchi con lo stato dei processi
+    conservato tra un blocco e il successivo (next_chunk continua la serie).
+
+    - radiazione: geometria solare (latitudine, giorno dell'anno, ora)
+      attenuata da una copertura nuvolosa persistente (AR(1), ore)
+    - temperatura: stagione + anomalia sinottica (AR(1), giorni, in parte
+      comune a tutti i campi) + riscaldamento = radiazione filtrata con
+      inerzia termica di alcune ore
+    - umidità: dal punto di rugiada della giornata, quindi cala quando la
+      temperatura sale; più alta con cielo coperto
+    - luce: proporzionale alla radiazione (scala 0–2000 della pipeline)
+    - vento: AR(1) + rimescolamento diurno
+    - vegetation_health: cala con lo stress da deficit di pressione di
+      vapore accumulato su giorni, risale con tempo nuvoloso
+
+    Stesso seed e stessi campi → stesse serie.
+    """
+
+    def __init__(self, fields: Union[int, Sequence[str]] = 1, step_secs: float = 60.0,
+                 start: Optional[float] = None, seed: Optional[int] = SYNTHETIC_SEED,
+                 lat: float = FIELD_LAT, lon: float = FIELD_LON):
+        self.field_ids: List[str] = (
+            [f"field-{i + 1:0{max(2, len(str(fields)))}d}" for i in range(fields)]
+            if isinstance(fields, int) else list(fields)
+        )
+        n = len(self.field_ids)
+        self.step = float(step_secs)
+        self.t = (time.time() if start is None else float(start))
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+
+        # Parametri per campo (microclima)
+        self.lat = lat + rng.uniform(-0.5, 0.5, n)
+        self.lon = lon + rng.uniform(-0.5, 0.5, n)
+        self.t_offset = rng.normal(0.0, 1.5, n)
+        self.diurnal_amp = rng.uniform(8.0, 13.0, n)
+        self.dry_bias = rng.normal(0.0, 1.0, n)
+        self.veg_base = rng.uniform(0.65, 0.92, n)
+        self.veg_sensitivity = rng.uniform(0.2, 0.45, n)
+
+        # Stato dei processi (una voce per campo; il regionale è comune)
+        self._regional = rng.normal(0.0, 1.0, 1)
+        self._synoptic = rng.normal(0.0, 1.0, n)
+        self._cloud = rng.normal(0.0, 1.0, n)
+        self._heat = np.full(n, 150.0)
+        self._wind = rng.normal(0.0, 1.0, n)
+        self._noise = np.zeros(n)
+        self._stress = np.full(n, 0.2)
+
+    @property
+    def n_fields(self) -> int:
+        return len(self.field_ids)
+
+    def _ar1(self, state: np.ndarray, tau: float, n_steps: int) -> np.ndarray:
+        """Processo AR(1) a varianza unitaria con tempo di correlazione tau."""
+        a = math.exp(-self.step / tau)
+        u = self.rng.standard_normal((len(state), n_steps)) * math.sqrt(1.0 - a * a)
+        return ar_filter(u, a, state)
+
+    def _lowpass(self, x: np.ndarray, state: np.ndarray, tau: float) -> np.ndarray:
+        a = math.exp(-self.step / tau)
+        return ar_filter((1.0 - a) * x, a, state)
+
+    def next_chunk(self, n_steps: int) -> Dict[str, np.ndarray]:
+        """I prossimi n_steps istanti: "ts" (n_steps,) e una matrice (campi × n_steps) per grandezza."""
+        n = self.n_fields
+        ts = self.t + self.step * np.arange(n_steps, dtype=np.float64)
+        self.t = float(ts[-1] + self.step)
+
+        # --- regimi sinottici: componente regionale comune + locale
+        regional = self._ar1(self._regional, TAU_SYNOPTIC, n_steps)
+        local = self._ar1(self._synoptic, TAU_SYNOPTIC, n_steps)
+        self._regional, self._synoptic = regional[:, -1], local[:, -1]
+        syn = 0.8 * regional + 0.6 * local      # > 0: alta pressione, caldo e sereno
+
+        # --- nuvolosità e radiazione
+        cloud_lat = self._ar1(self._cloud, TAU_CLOUD, n_steps)
+        self._cloud = cloud_lat[:, -1]
+        cloud = 1.0 / (1.0 + np.exp(-(1.4 * cloud_lat - 1.0 * syn - 0.2)))
+        sin_e = np.clip(solar_elevation_sin(ts, self.lat, self.lon), 0.0, None)
+        clear = 1050.0 * sin_e ** 1.2
+        radiation = clear * (1.0 - 0.75 * cloud ** 3.4)
+
+        # --- temperatura: stagione + sinottica + riscaldamento con inerzia
+        doy = (ts / DAY) % 365.25
+        season = 15.0 + 9.0 * np.cos(2 * np.pi * (doy - 200) / 365.25)
+        heat = self._lowpass(radiation, self._heat, TAU_HEATING)
+        self._heat = heat[:, -1]
+        noise = self._ar1(self._noise, TAU_NOISE, n_steps)
+        self._noise = noise[:, -1]
+        day_mean = season[None, :] + self.t_offset[:, None] + 3.0 * syn
+        temperature = day_mean + self.diurnal_amp[:, None] * (heat / 600.0 - 0.4) + 0.3 * noise
+
+        # --- umidità dal punto di rugiada (più secco con alta pressione, più umido se coperto)
+        dewpoint = day_mean - (6.0 + 1.5 * syn + self.dry_bias[:, None]) + 4.0 * cloud
+        humidity = np.clip(100.0 * saturation_vp(dewpoint) / saturation_vp(temperature), 8.0, 100.0)
+
+        # --- vento: AR(1) + rimescolamento diurno
+        wind_lat = self._ar1(self._wind, TAU_WIND, n_steps)
+        self._wind = wind_lat[:, -1]
+        wind = np.maximum(0.0, 6.0 + 3.5 * wind_lat + 4.0 * heat / 600.0 - 1.5 * syn)
+
+        # --- luce (scala della pipeline) e salute della vegetazione
+        light = np.clip(radiation * 1.9, 0.0, 2000.0)
+        vpd = 0.6108 * saturation_vp(temperature) * (1.0 - humidity / 100.0)
+        dryness = np.clip(vpd / 2.5, 0.0, 1.0) * (sin_e > 0) - 0.5 * (cloud > 0.8)
+        stress = self._lowpass(dryness, self._stress, TAU_STRESS)
+        self._stress = stress[:, -1]
+        vegetation = np.clip(self.veg_base[:, None] - self.veg_sensitivity[:, None] * np.clip(stress, 0.0, None),
+                             0.05, 1.0)
+
+        out: Dict[str, np.ndarray] = {"ts": ts}
+        for key, arr in (("temperature", temperature), ("humidity", humidity), ("light", light),
+                         ("wind_kmh", wind), ("radiation", radiation), ("vegetation_health", vegetation)):
+            out[key] = arr.astype(np.float32)
+        return out
+
+    def iter_chunks(self, n_steps: int, chunk_steps: int = 1440) -> Iterator[Dict[str, np.ndarray]]:
+        """Serie lunghe (mesi) a blocchi: memoria costante."""
+        done = 0
+        while done < n_steps:
+            m = min(chunk_steps, n_steps - done)
+            yield self.next_chunk(m)
+            done += m
+
+
+# ============================================================
+#  LiveSynthetic – stesse serie per gli agenti in tempo reale
+# ============================================================
+
+class LiveSynthetic:
+    """
+    Sorgente condivisa dagli agenti simulati (sensori, meteo, immagini):
+    genera un'ora alla volta in anticipo e restituisce il valore "vero" del
+    campo all'istante richiesto; ogni sensore aggiunge il proprio rumore.
+    """
+
+    def __init__(self, fields: Sequence[str] = (FIELD_ID,), step_secs: float = 5.0,
+                 horizon_secs: float = 3600.0, seed: Optional[int] = SYNTHETIC_SEED):
+        self.gen = SyntheticGenerator(fields, step_secs=step_secs, seed=seed)
+        self.index = {f: i for i, f in enumerate(self.gen.field_ids)}
+        self.chunk_steps = max(1, int(horizon_secs / step_secs))
+        self.rng = np.random.default_rng(None if seed is None else seed + 1)
+        self._lock = threading.Lock()
+        self._chunk = self.gen.next_chunk(self.chunk_steps)
+
+    def sample(self, field_id: str = FIELD_ID, now: Optional[float] = None) -> Dict[str, float]:
+        now = time.time() if now is None else now
+        with self._lock:
+            while now >= self._chunk["ts"][-1] + self.gen.step:
+                self._chunk = self.gen.next_chunk(self.chunk_steps)
+            chunk = self._chunk
+            k = int(np.clip((now - chunk["ts"][0]) // self.gen.step, 0, len(chunk["ts"]) - 1))
+            i = self.index.get(field_id, 0)
+            return {key: float(chunk[key][i, k]) for key in SERIES_KEYS}
+
+    def reading(self, kind: str, field_id: str = FIELD_ID, now: Optional[float] = None) -> float:
+        """
+        Lettura di un singolo sensore: valore del campo + rumore di misura,
+        limitata all'intervallo fisico della grandezza (niente luce negativa
+        di notte né umidità oltre il 100%).
+        """
+        value = self.sample(field_id, now)[kind]
+        with self._lock:
+            value += float(self.rng.normal(0.0, SENSOR_NOISE.get(kind, 0.0)))
+        lo, hi = CLEAN_RANGES.get(kind, (-math.inf, math.inf))
+        return min(hi, max(lo, value))
+
+
+_live: Optional[LiveSynthetic] = None
+_live_lock = threading.Lock()
+
+
+def get_live_synthetic() -> Optional[LiveSynthetic]:
+    """Sorgente condivisa del processo, oppure None con SYNTHETIC_DATA=uniform."""
+    global _live
+    if SYNTHETIC_DATA != "realistic":
+        return None
+    with _live_lock:
+        if _live is None:
+            _live = LiveSynthetic()
+        return _live
@@ -0,0 +1,237 @@
+# src/pipeline/anomaly.py
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from ..common.config import (
+    ANOMALY_DRIFT_Z, ANOMALY_EWMA_FAST, ANOMALY_EWMA_SLOW, ANOMALY_FLATLINE_N,
+    ANOMALY_SPIKE_Z, ANOMALY_WARMUP,
+)
+from .vectorized import CLEAN_RANGES
+
+
+# Codici anomalia (0 = lettura valida); in caso di più anomalie vince la prima
+ANOMALIES = ("ok", "spike", "flatline", "drift")
+OK, SPIKE, FLATLINE, DRIFT = range(4)
+
+# Rumore minimo atteso per grandezza: limite inferiore delle deviazioni
+# standard, per non dividere per ~0 su sensori molto stabili
+NOISE_FLOOR = {
+    "temperature": 0.3, "humidity": 1.5, "light": 30.0,
+    "wind_kmh": 1.0, "radiation": 20.0, "vegetation_health": 0.02,
+}
+DEFAULT_NOISE_FLOOR = 0.01
+
+# Letture uguali entro questa tolleranza contano per il flatline
+FLAT_EPS = 1e-6
+
+# Salti consecutivi oltre i quali il nuovo livello viene accettato
+SPIKE_ACCEPT = 3
+
+# Statistiche dello scarto EWMA veloce - lenta: α_gap = α_lenta / GAP_ALPHA_DIV,
+# rilevamento deriva solo dopo DRIFT_WARMUP_FACTOR / α_gap letture
+GAP_ALPHA_DIV = 10.0
+DRIFT_WARMUP_FACTOR = 1.0
+
+
+# ============================================================
+#  AnomalyDetector – statistiche O(1) per sensore, in colonne
+# ============================================================
+
+class AnomalyDetector:
+    """
+    Rilevatori streaming per sensore su colonne NumPy (una riga per sensore):
+
+    - spike    : variazione rispetto alla lettura precedente oltre SPIKE_Z
+                 deviazioni standard delle variazioni (media / varianza di
+                 Welford). La lettura anomala non entra nelle statistiche;
+                 dopo SPIKE_ACCEPT salti consecutivi il nuovo livello è accettato
+    - flatline : FLATLINE_N letture consecutive identiche (sonda bloccata),
+                 tranne agli estremi fisici della grandezza (CLEAN_RANGES):
+                 luce e radiazione restano a 0 tutta la notte, l'umidità a
+                 100 con la nebbia
+    - drift    : scarto tra EWMA veloce e lenta oltre DRIFT_Z volte la sua
+                 variabilità abituale (media / varianza esponenziali ancora più
+                 lente, che assorbono il ciclo diurno), mai sotto il rumore
+                 della sonda (σ_d / √2); attivo dopo DRIFT_WARMUP_FACTOR / α letture
+
+    observe() elabora un blocco di letture in poche operazioni vettoriali
+    (le letture ripetute dello stesso sensore vanno in passate successive)
+    e restituisce un codice per lettura. I cambi di stato di ogni sensore
+    si raccolgono con pop_events().
+
+    Le letture arretrate (backfill dallo spool, ts precedente all'ultima
+    lettura del sensore) non vengono controllate né entrano nelle
+    statistiche: risultano sempre "ok".
+    """
+
+    def __init__(self, capacity: int = 1024, flatline_n: int = ANOMALY_FLATLINE_N,
+                 spike_z: float = ANOMALY_SPIKE_Z, drift_z: float = ANOMALY_DRIFT_Z,
+                 warmup: int = ANOMALY_WARMUP, alpha_fast: float = ANOMALY_EWMA_FAST,
+                 alpha_slow: float = ANOMALY_EWMA_SLOW):
+        self.flatline_n = flatline_n
+        self.spike_z = spike_z
+        self.drift_z = drift_z
+        self.warmup = warmup
+        self.alpha_fast = alpha_fast
+        self.alpha_slow = alpha_slow
+        self.alpha_gap = alpha_slow / GAP_ALPHA_DIV
+        self.drift_warmup = max(warmup, int(DRIFT_WARMUP_FACTOR / self.alpha_gap))
+
+        self.index: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.kinds: List[str] = []
+        self._events: List[Dict[str, Any]] = []
+        self._alloc(capacity)
+
+    # ---------------------------------------------------------
+    # Colonne
+    # ---------------------------------------------------------
+    _FLOAT_COLS = ("floor", "lo", "hi", "last", "last_ts", "d_mean", "d_m2", "ew_fast", "ew_slow", "gap_mean", "gap_var")
+    _INT_COLS = ("n", "d_n", "flat", "spikes")
+
+    def _alloc(self, capacity: int):
+        old = {c: getattr(self, c) for c in self._FLOAT_COLS + self._INT_COLS + ("state",)} \
+            if hasattr(self, "n") else None
+        for c in self._FLOAT_COLS:
+            setattr(self, c, np.zeros(capacity, dtype=np.float64))
+        for c in self._INT_COLS:
+            setattr(self, c, np.zeros(capacity, dtype=np.int64))
+        self.state = np.zeros(capacity, dtype=np.int8)
+        if old:
+            for c, arr in old.items():
+                getattr(self, c)[:len(arr)] = arr
+
+    def _row(self, key: str, kind: str) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.keys)
+            if i >= len(self.n):
+                self._alloc(2 * len(self.n))
+            self.keys.append(key)
+            self.kinds.append(kind)
+            self.floor[i] = NOISE_FLOOR.get(kind, DEFAULT_NOISE_FLOOR)
+            self.lo[i], self.hi[i] = CLEAN_RANGES.get(kind, (-np.inf, np.inf))
+        return i
+
+    # ---------------------------------------------------------
+    # Osservazione
+    # ---------------------------------------------------------
+    def observe(self, keys: Sequence[str], kinds: Sequence[str], values: Sequence[float],
+                ts: Sequence[float]) -> np.ndarray:
+        """Codici anomalia (indici in ANOMALIES) delle letture, nell'ordine ricevuto."""
+        m = len(keys)
+        codes = np.zeros(m, dtype=np.int8)
+        if not m:
+            return codes
+        rows = np.fromiter((self._row(k, c) for k, c in zip(keys, kinds)), dtype=np.int64, count=m)
+        values = np.asarray(values, dtype=np.float64)
+        ts = np.asarray(ts, dtype=np.float64)
+
+        # Occorrenza di ogni lettura tra quelle dello stesso sensore (0, 1, ...)
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+        occ = np.empty(m, dtype=np.int64)
+        occ[order] = np.arange(m) - np.repeat(starts, np.diff(np.r_[starts, m]))
+
+        for k in range(int(occ.max()) + 1):
+            sel = np.flatnonzero(occ == k)
+            codes[sel] = self._step(rows[sel], values[sel], ts[sel])
+        return codes
+
+    def _step(self, r: np.ndarray, v: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """Una lettura per sensore (righe `r` distinte)."""
+        codes = np.zeros(len(r), dtype=np.int8)
+
+        # Prima lettura del sensore: inizializza le statistiche
+        first = self.n[r] == 0
+        if first.any():
+            f = r[first]
+            self.last[f] = self.ew_fast[f] = self.ew_slow[f] = v[first]
+            self.last_ts[f] = t[first]
+            self.n[f] = 1
+
+        # Letture arretrate (spool) più vecchie dell'ultima: nessun confronto
+        live = ~first & (t >= self.last_ts[r])
+        if not live.any():
+            return codes
+        idx = np.flatnonzero(live)
+        r, v, t = r[live], v[live], t[live]
+        floor = self.floor[r]
+
+        # --- rate-of-change: variazione vs media/varianza di Welford delle variazioni
+        d = v - self.last[r]
+        d_n = self.d_n[r]
+        d_mean = self.d_mean[r]
+        d_std = np.sqrt(np.where(d_n > 1, self.d_m2[r] / np.maximum(d_n - 1, 1), 0.0))
+        z = np.abs(d - d_mean) / np.maximum(d_std, floor)
+        spike = (d_n >= self.warmup) & (z > self.spike_z)
+        spikes = np.where(spike, self.spikes[r] + 1, 0)
+        # Troppi salti di fila: è un cambio di livello, non un picco
+        spike &= spikes <= SPIKE_ACCEPT
+        self.spikes[r] = np.where(spikes > SPIKE_ACCEPT, 0, spikes)
+
+        # --- flatline: letture identiche consecutive, non agli estremi fisici
+        flat = np.where(np.abs(d) <= FLAT_EPS, self.flat[r] + 1, 0)
+        inside = (v > self.lo[r] + FLAT_EPS) & (v < self.hi[r] - FLAT_EPS)
+        flatline = (flat >= self.flatline_n) & inside
+
+        # --- drift: EWMA veloce contro EWMA lenta
+        ew_fast = self.ew_fast[r] + self.alpha_fast * (v - self.ew_fast[r])
+        gap = ew_fast - self.ew_slow[r]
+        gap_dev = gap - self.gap_mean[r]
+        spread = np.maximum(np.sqrt(self.gap_var[r]), np.maximum(d_std / np.sqrt(2.0), floor))
+        drift = (self.n[r] >= self.drift_warmup) & (np.abs(gap_dev) > self.drift_z * spread)
+
+        code = np.where(spike, SPIKE, np.where(flatline, FLATLINE, np.where(drift, DRIFT, OK))).astype(np.int8)
+        codes[idx] = code
+
+        # Aggiornamento delle statistiche con le sole letture accettate
+        ok = ~spike
+        ru, vu, du = r[ok], v[ok], d[ok]
+        n1 = self.d_n[ru] + 1
+        delta = du - self.d_mean[ru]
+        self.d_mean[ru] += delta / n1
+        self.d_m2[ru] += delta * (du - self.d_mean[ru])
+        self.d_n[ru] = n1
+        self.flat[ru] = flat[ok]
+        self.ew_fast[ru] = ew_fast[ok]
+        self.ew_slow[ru] += self.alpha_slow * (vu - self.ew_slow[ru])
+        g, ag = gap_dev[ok], self.alpha_gap
+        self.gap_mean[ru] += ag * g
+        self.gap_var[ru] = (1.0 - ag) * (self.gap_var[ru] + ag * g * g)
+        self.last[ru] = vu
+        self.last_ts[ru] = t[ok]
+        self.n[ru] += 1
+
+        # Eventi: solo i cambi di stato del sensore
+        changed = np.flatnonzero(code != self.state[r])
+        for j in changed:
+            i = int(r[j])
+            self._events.append({
+                "sensor": self.keys[i],
+                "type": self.kinds[i],
+                "anomaly": ANOMALIES[code[j]],
+                "previous": ANOMALIES[self.state[i]],
+                "value": float(v[j]),
+                "ts": float(t[j]),
+            })
+        self.state[r] = code
+        return codes
+
+    # ---------------------------------------------------------
+    # Eventi / stato
+    # ---------------------------------------------------------
+    def pop_events(self) -> List[Dict[str, Any]]:
+        events, self._events = self._events, []
+        return events
+
+    def active(self) -> Dict[str, str]:
+        """Sensori attualmente in anomalia → tipo di anomalia."""
+        n = len(self.keys)
+        return {self.keys[i]: ANOMALIES[self.state[i]] for i in np.flatnonzero(self.state[:n])}
+
+    def __len__(self):
+        return len(self.keys)
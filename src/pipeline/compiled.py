@@ -0,0 +1,187 @@
+# src/pipeline/compiled.py
+
+from typing import Any, Callable, Dict, List, Optional
+
+from .handlers import (
+    AgronomicHandler, CleaningHandler, EstimationHandler, FeatureEngineeringHandler,
+    Handler, RollingStressHandler,
+)
+
+
+# ============================================================
+#  FieldRecord – record a layout fisso (__slots__)
+# ============================================================
+
+class FieldRecord:
+    """
+    Record di un campo con layout fisso, usato dalla pipeline compilata al
+    posto del Dict[str, Any]. Le chiavi non previste (es. feature delle
+    finestre mobili) finiscono in `extra`.
+
+    Espone get / [] / in come un dict, così le strategie esistenti lo
+    accettano senza modifiche. Un valore None è trattato come assente:
+    get() restituisce il default.
+    """
+
+    FIELDS = (
+        "temperature", "humidity", "light", "wind_kmh", "radiation", "vegetation_health",
+        "ts", "scenario_t", "water_stress_index", "vpd_kpa", "et0_mm_h", "suggestion",
+    )
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, temperature=None, humidity=None, light=None, wind_kmh=None,
+                 radiation=None, vegetation_health=None, ts=None, scenario_t=None):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.light = light
+        self.wind_kmh = wind_kmh
+        self.radiation = radiation
+        self.vegetation_health = vegetation_health
+        self.ts = ts
+        self.scenario_t = scenario_t
+        self.water_stress_index = None
+        self.vpd_kpa = None
+        self.et0_mm_h = None
+        self.suggestion = None
+        self.extra: Dict[str, Any] = {}
+
+    # ---------------------------------------------------------
+    # Interfaccia dict-like
+    # ---------------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _SLOT_SET:
+            v = getattr(self, key)
+        else:
+            v = self.extra.get(key)
+        return default if v is None else v
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _SLOT_SET:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _SLOT_SET:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key in _SLOT_SET:
+            return getattr(self, key) is not None
+        return key in self.extra
+
+    def update(self, data: Dict[str, Any]):
+        if _SLOT_SET.isdisjoint(data):
+            # Caso comune (feature delle finestre mobili): tutto in extra
+            self.extra.update(data)
+            return
+        for k, v in data.items():
+            self[k] = v
+
+    # ---------------------------------------------------------
+    # Conversioni
+    # ---------------------------------------------------------
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FieldRecord":
+        r = cls()
+        for k, v in data.items():
+            r[k] = v
+        return r
+
+    def update_from(self, data: Dict[str, Any]):
+        for k in self.FIELDS:
+            setattr(self, k, data.get(k))
+        self.extra = {k: v for k, v in data.items() if k not in _SLOT_SET}
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {k: getattr(self, k) for k in self.FIELDS}
+        if self.scenario_t is None:
+            del out["scenario_t"]
+        out.update(self.extra)
+        return out
+
+
+_SLOT_SET = frozenset(FieldRecord.FIELDS)
+
+
+# ============================================================
+#  Catena fusa: gli stessi _process degli handler sul FieldRecord
+# ============================================================
+# I _process degli stadi standard usano solo get / [] / in / update, che il
+# FieldRecord espone come un dict: la catena fusa li chiama direttamente sul
+# record, senza copie né conversioni dict tra uno stadio e l'altro. La logica
+# resta definita una volta sola, negli handler.
+_RECORD_STAGES = (
+    CleaningHandler, FeatureEngineeringHandler, AgronomicHandler, RollingStressHandler, EstimationHandler,
+)
+
+
+def _adapt(handler: Handler) -> Callable[[FieldRecord], None]:
+    """Stadio sconosciuto: passa per il dict e riporta il risultato nel record."""
+    def run(r: FieldRecord):
+        r.update_from(handler._process(r.to_dict()))
+    return run
+
+
+def compile_chain(head: Handler) -> Callable[[FieldRecord], FieldRecord]:
+    """
+    Fonde la catena di handler in un'unica funzione FieldRecord → FieldRecord.
+
+    Gli stadi standard (Cleaning, FeatureEngineering, Agronomic, RollingStress,
+    Estimation) lavorano in place sul record con il proprio _process; le
+    sottoclassi e gli handler non riconosciuti passano da un adattatore dict,
+    così il risultato resta identico a quello della catena classica. La
+    composizione è fissata alla costruzione: modificare la catena richiede una
+    nuova compilazione, mentre lo scambio della strategia (handler.estimator)
+    resta immediato.
+    """
+    stages: List[Callable[[FieldRecord], Any]] = []
+    h: Optional[Handler] = head
+    while h is not None:
+        stages.append(h._process if type(h) in _RECORD_STAGES else _adapt(h))
+        h = h._next
+    fused_stages = tuple(stages)
+
+    def fused(r: FieldRecord) -> FieldRecord:
+        for stage in fused_stages:
+            stage(r)
+        return r
+
+    return fused
+
+
+# ============================================================
+#  CompiledPipeline – adattatore con la stessa API della catena
+# ============================================================
+
+class CompiledPipeline:
+    """
+    Pipeline compilata con la stessa interfaccia di Handler:
+    - handle(dict) → dict per i chiamanti esistenti
+    - run(FieldRecord) → FieldRecord per il percorso veloce
+    """
+
+    def __init__(self, head: Handler):
+        self.head = head
+        self.run: Callable[[FieldRecord], FieldRecord] = compile_chain(head)
+
+    def handle(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.run(FieldRecord.from_dict(data)).to_dict()
+
+    def run_many(self, records: List[FieldRecord]) -> List[FieldRecord]:
+        run = self.run
+        for r in records:
+            run(r)
+        return records
+
+
+def make_pipeline(head: Handler, mode: str):
+    """
+    Restituisce l'oggetto con .handle() per la modalità richiesta:
+    "chain" = catena classica, "compiled" (default) = pipeline fusa.
+    """
+    if (mode or "compiled").lower().strip() == "chain":
+        return head
+    return CompiledPipeline(head)
@@ -0,0 +1,220 @@
+# src/pipeline/features.py
+
+import bisect
+import itertools
+import math
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# ============================================================
+#  GRANDEZZE AGRONOMICHE ISTANTANEE (FAO-56)
+# ============================================================
+
+# Costante psicrometrica a ~100 kPa (kPa/°C)
+PSYCHROMETRIC_GAMMA = 0.0665
+# Albedo della coltura di riferimento
+ALBEDO = 0.23
+# W/m² → MJ/m²/h
+WM2_TO_MJ_H = 0.0036
+
+
+def saturation_vapor_pressure(temp_c: float) -> float:
+    """Pressione di vapore saturo es (kPa) alla temperatura data."""
+    return 0.6108 * math.exp(17.27 * temp_c / (temp_c + 237.3))
+
+
+def vapor_pressure_deficit(temp_c: float, rh: float) -> float:
+    """Deficit di pressione di vapore VPD = es - ea (kPa)."""
+    es = saturation_vapor_pressure(temp_c)
+    return max(0.0, es * (1.0 - rh / 100.0))
+
+
+def reference_et0_hourly(temp_c: float, rh: float, wind_kmh: float, radiation_wm2: float) -> float:
+    """
+    Evapotraspirazione di riferimento oraria (mm/h), Penman-Monteith FAO-56.
+
+    Semplificazioni: vento misurato a 2 m, radiazione netta stimata come
+    (1 - albedo) * Rs senza bilancio a onde lunghe, flusso nel suolo
+    G = 0.1 Rn di giorno e 0.5 Rn di notte.
+    """
+    es = saturation_vapor_pressure(temp_c)
+    ea = es * rh / 100.0
+    delta = 4098.0 * es / (temp_c + 237.3) ** 2
+    u2 = max(0.0, wind_kmh) / 3.6
+
+    rn = (1.0 - ALBEDO) * max(0.0, radiation_wm2) * WM2_TO_MJ_H
+    g = (0.1 if radiation_wm2 > 0 else 0.5) * rn
+
+    num = 0.408 * delta * (rn - g) + PSYCHROMETRIC_GAMMA * (37.0 / (temp_c + 273.0)) * u2 * (es - ea)
+    den = delta + PSYCHROMETRIC_GAMMA * (1.0 + 0.34 * u2)
+    return max(0.0, num / den)
+
+
+# ============================================================
+#  WATER STRESS INDEX – coefficienti condivisi
+# ============================================================
+# Usati da FeatureEngineeringHandler (scalare) e da vectorized.wsi_batch:
+# WSI = (T / T_ref) · (1 - UR/100) · (luce / luce_ref) · (base - pendenza · vh),
+# limitato a [0, WSI_MAX] e arrotondato a WSI_DECIMALS cifre.
+
+# Valori usati quando un ingresso manca
+WSI_DEFAULTS = {"temperature": 25.0, "humidity": 50.0, "light": 500.0, "vegetation_health": 0.7}
+WSI_TEMP_REF = 35.0
+WSI_LIGHT_REF = 1000.0
+# Modulazione con la salute della vegetazione: 1.1 (vh = 0) → 0.9 (vh = 1)
+WSI_VH_BASE = 1.1
+WSI_VH_SLOPE = 0.2
+WSI_MAX = 2.0
+WSI_DECIMALS = 3
+
+
+# ============================================================
+#  FINESTRE MOBILI INCREMENTALI
+# ============================================================
+
+class RollingWindow:
+    """
+    Finestra temporale mobile con aggiornamento O(1) ammortizzato.
+
+    Per ogni campione mantiene la somma dei valori e l'integrale nel tempo
+    (valore × durata dall'ultimo campione, in ore): le statistiche non
+    richiedono mai di ripercorrere la finestra.
+    """
+
+    __slots__ = ("span", "_items", "_sum", "_integral")
+
+    def __init__(self, span_secs: float):
+        self.span = float(span_secs)
+        self._items: deque = deque()
+        self._sum = 0.0
+        self._integral = 0.0
+
+    def push(self, ts: float, value: float, dt_h: float):
+        area = value * dt_h
+        self._items.append((ts, value, area))
+        self._sum += value
+        self._integral += area
+        self.evict(ts)
+
+    def evict(self, now: float):
+        items = self._items
+        limit = now - self.span
+        while items and items[0][0] < limit:
+            _, v, a = items.popleft()
+            self._sum -= v
+            self._integral -= a
+
+    def reset(self):
+        self._items.clear()
+        self._sum = 0.0
+        self._integral = 0.0
+
+    def load(self, items: Iterable[Tuple[float, float, float]]):
+        """Ricarica campioni (ts, valore, area) già nella finestra; somme ricalcolate."""
+        self.reset()
+        self._items.extend(items)
+        self._sum = math.fsum(v for _, v, _ in self._items)
+        self._integral = math.fsum(a for _, _, a in self._items)
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / len(self._items) if self._items else None
+
+    @property
+    def integral(self) -> float:
+        # Clamp contro l'accumulo di errori di arrotondamento
+        return max(0.0, self._integral)
+
+
+def window_label(span_secs: float) -> str:
+    """900 → '15m', 3600 → '1h', 86400 → '1d'."""
+    s = int(span_secs)
+    if s % 86400 == 0:
+        return f"{s // 86400}d"
+    if s % 3600 == 0:
+        return f"{s // 3600}h"
+    if s % 60 == 0:
+        return f"{s // 60}m"
+    return f"{s}s"
+
+
+class RollingFeatureEngine:
+    """
+    Accumula WSI ed ET0 su più finestre configurabili.
+
+    Per ogni finestra `w` espone:
+    - wsi_mean_<w>     : media mobile del WSI
+    - stress_hours_<w> : integrale del WSI nel tempo (WSI × ore)
+    - et0_mm_<w>       : ET0 cumulata (mm = L/m²)
+    """
+
+    # Gap massimo tra due campioni considerato continuo (ore)
+    MAX_GAP_H = 1.0
+
+    def __init__(self, windows_secs: Iterable[float]):
+        self.windows: Tuple[Tuple[str, RollingWindow, RollingWindow], ...] = tuple(
+            (window_label(w), RollingWindow(w), RollingWindow(w)) for w in sorted(set(windows_secs))
+        )
+        self._last_ts: Optional[float] = None
+
+    def reset(self):
+        self._last_ts = None
+        for _, wsi_w, et0_w in self.windows:
+            wsi_w.reset()
+            et0_w.reset()
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Campioni per il riavvio a caldo: basta la finestra più lunga, che
+        contiene quelli di tutte le altre.
+        """
+        if not self.windows:
+            return {"last_ts": self._last_ts, "wsi": [], "et0": []}
+        _, wsi_w, et0_w = self.windows[-1]
+        return {"last_ts": self._last_ts, "wsi": list(wsi_w._items), "et0": list(et0_w._items)}
+
+    def restore(self, state: Dict[str, Any]):
+        """Ripristina le finestre da state(); le altre ricevono il proprio suffisso."""
+        self.reset()
+        last_ts = state.get("last_ts")
+        if last_ts is None:
+            return
+        self._last_ts = float(last_ts)
+        wsi: List[Tuple[float, float, float]] = list(state.get("wsi", ()))
+        et0: List[Tuple[float, float, float]] = list(state.get("et0", ()))
+        wsi_ts = [it[0] for it in wsi]
+        et0_ts = [it[0] for it in et0]
+        for _, wsi_w, et0_w in self.windows:
+            # Campioni ordinati per ts: ogni finestra riceve il suffisso che le spetta
+            limit = self._last_ts - wsi_w.span
+            wsi_w.load(itertools.islice(wsi, bisect.bisect_left(wsi_ts, limit), None))
+            et0_w.load(itertools.islice(et0, bisect.bisect_left(et0_ts, limit), None))
+
+    def update(self, ts: float, wsi: float, et0_mm_h: Optional[float]) -> Dict[str, float]:
+        if self._last_ts is not None and ts < self._last_ts:
+            # Campione fuori ordine: non altera le finestre
+            return self.features()
+        dt_h = 0.0 if self._last_ts is None else min(self.MAX_GAP_H, (ts - self._last_ts) / 3600.0)
+        self._last_ts = ts
+
+        for _, wsi_w, et0_w in self.windows:
+            wsi_w.push(ts, wsi, dt_h)
+            if et0_mm_h is not None:
+                et0_w.push(ts, et0_mm_h, dt_h)
+            else:
+                et0_w.evict(ts)
+        return self.features()
+
+    def features(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for label, wsi_w, et0_w in self.windows:
+            m = wsi_w.mean
+            out[f"wsi_mean_{label}"] = round(m, 3) if m is not None else None
+            out[f"stress_hours_{label}"] = round(wsi_w.integral, 3)
+            out[f"et0_mm_{label}"] = round(et0_w.integral, 3)
+        return out
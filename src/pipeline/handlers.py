@@ -1,4 +1,11 @@
-from typing import Any, Dict, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from .features import (
+    WSI_DECIMALS, WSI_DEFAULTS, WSI_LIGHT_REF, WSI_MAX, WSI_TEMP_REF, WSI_VH_BASE, WSI_VH_SLOPE,
+    RollingFeatureEngine, reference_et0_hourly, vapor_pressure_deficit,
+)
 
 # ============================================================
 #  BASE HANDLER (Chain of Responsibility)
@@ -62,6 +69,22 @@ class CleaningHandler(Handler):
             except:
                 data["vegetation_health"] = None
 
+        # Vento: clamp 0–200 km/h
+        if "wind_kmh" in data and data["wind_kmh"] is not None:
+            try:
+                v = float(data["wind_kmh"])
+                data["wind_kmh"] = max(0.0, min(200.0, v))
+            except:
+                data["wind_kmh"] = None
+
+        # Radiazione solare: clamp 0–1500 W/m²
+        if "radiation" in data and data["radiation"] is not None:
+            try:
+                v = float(data["radiation"])
+                data["radiation"] = max(0.0, min(1500.0, v))
+            except:
+                data["radiation"] = None
+
         return data
 
 
@@ -78,10 +101,11 @@ class FeatureEngineeringHandler(Handler):
         light = data.get("light")
         vh = data.get("vegetation_health")
 
-        if temp is None: temp = 25.0
-        if hum is None: hum = 50.0
-        if light is None: light = 500.0
-        if vh is None: vh = 0.7
+        d = WSI_DEFAULTS
+        if temp is None: temp = d["temperature"]
+        if hum is None: hum = d["humidity"]
+        if light is None: light = d["light"]
+        if vh is None: vh = d["vegetation_health"]
 
         temp = float(temp)
         hum = float(hum)
@@ -89,27 +113,169 @@ class FeatureEngineeringHandler(Handler):
         vh = float(vh)
 
         # ---- Calcolo WSI base ----
-        wsi = (temp / 35.0) * ((100.0 - hum) / 100.0) * (light / 1000.0)
+        wsi = (temp / WSI_TEMP_REF) * ((100.0 - hum) / 100.0) * (light / WSI_LIGHT_REF)
 
         # ---- Modulazione in base alla salute vegetazione ----
         vh_clamped = max(0.0, min(vh, 1.0))
-        modulation_factor = 1.1 - vh_clamped * 0.2  # range 1.1 → 0.9
+        modulation_factor = WSI_VH_BASE - vh_clamped * WSI_VH_SLOPE  # range 1.1 → 0.9
         wsi *= modulation_factor
 
-        data["water_stress_index"] = round(max(0.0, min(wsi, 2.0)), 3)
+        data["water_stress_index"] = round(max(0.0, min(wsi, WSI_MAX)), WSI_DECIMALS)
+        return data
+
+
+# ============================================================
+#  AGRONOMIC HANDLER
+# VPD ed evapotraspirazione di riferimento (Penman-Monteith)
+# ============================================================
+class AgronomicHandler(Handler):
+    def _process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        temp = data.get("temperature")
+        hum = data.get("humidity")
+
+        if temp is None or hum is None:
+            data["vpd_kpa"] = None
+            data["et0_mm_h"] = None
+            return data
+
+        temp = float(temp)
+        hum = float(hum)
+        data["vpd_kpa"] = round(vapor_pressure_deficit(temp, hum), 3)
+
+        # ET0 solo se il meteo fornisce vento e radiazione
+        wind = data.get("wind_kmh")
+        rad = data.get("radiation")
+        if wind is None or rad is None:
+            data["et0_mm_h"] = None
+        else:
+            data["et0_mm_h"] = round(reference_et0_hourly(temp, hum, float(wind), float(rad)), 4)
+        return data
+
+
+# ============================================================
+#  ROLLING STRESS HANDLER
+# Stress e ET0 cumulati su finestre mobili (aggiornamento O(1))
+# ============================================================
+class RollingStressHandler(Handler):
+    def __init__(self, windows_secs: Iterable[float], nxt: Optional['Handler'] = None):
+        super().__init__(nxt)
+        self.engine = RollingFeatureEngine(windows_secs)
+
+    def reset(self):
+        """Svuota le finestre (es. al passaggio LIVE ↔ DEMO)."""
+        self.engine.reset()
+
+    def state(self) -> Dict[str, Any]:
+        return self.engine.state()
+
+    def restore(self, state: Dict[str, Any]):
+        """Riavvio a caldo: finestre dallo snapshot (stesso motore, la catena fusa lo referenzia)."""
+        self.engine.restore(state)
+
+    def _process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Negli scenari accelerati conta il tempo simulato, non quello reale
+        ts = data.get("scenario_t", data.get("ts"))
+        wsi = data.get("water_stress_index")
+        if ts is None or wsi is None:
+            data.update(self.engine.features())
+            return data
+
+        data.update(self.engine.update(float(ts), float(wsi), data.get("et0_mm_h")))
         return data
 
 
 # ============================================================
 #  ESTIMATION HANDLER
-# Strategy: regole o AI placeholder
+# Strategy: regole o AI placeholder, con budget di latenza e fallback
 # ============================================================
 class EstimationHandler(Handler):
-    def __init__(self, estimator, nxt: Optional['Handler'] = None):
+    """
+    Senza `fallback` chiama la strategia direttamente (comportamento storico).
+
+    Con una strategia di `fallback` (di norma SimpleRuleStrategy):
+    - le strategie con `inline = True` (regole) girano direttamente nel
+      thread chiamante, senza budget
+    - per le altre il fallback viene calcolato per primo; un alert
+      "extreme-conditions" viene restituito subito, senza attendere il modello
+    - il modello gira poi su un thread dedicato con `budget_ms` di tempo:
+      oltre il budget, se il worker è ancora occupato da una chiamata
+      precedente o in caso di errore si restituisce il fallback con
+      "fallback": true e la causa in "fallback_cause"
+    """
+
+    # Esiti recenti conservati per il tasso di deadline mancate
+    WINDOW = 100
+
+    def __init__(self, estimator, nxt: Optional['Handler'] = None,
+                 fallback=None, budget_ms: float = 0.0):
         super().__init__(nxt)
         self.estimator = estimator
+        self.fallback = fallback
+        self.budget = budget_ms / 1000.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Optional[Future] = None
+        self._recent: Deque[bool] = deque(maxlen=self.WINDOW)
+        self.stats = {"calls": 0, "misses": 0, "busy": 0, "errors": 0, "short_circuit": 0}
+
+    def suggest(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcola il suggerimento senza modificare il record."""
+        estimator = self.estimator
+        if self.fallback is None or self.budget <= 0 or getattr(estimator, "inline", False):
+            return estimator.estimate(data)
+
+        self.stats["calls"] += 1
+        quick = self.fallback.estimate(data)
+        if quick.get("reason") == "extreme-conditions":
+            # Gli alert non aspettano mai un modello lento
+            self.stats["short_circuit"] += 1
+            return quick
+
+        if self._inflight is not None and not self._inflight.done():
+            self.stats["busy"] += 1
+            return self._fallback(quick, "busy")
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estimation")
+        # Copia del record: il worker può sopravvivere alla chiamata
+        snapshot = data.to_dict() if hasattr(data, "to_dict") else dict(data)
+        fut = self._inflight = self._executor.submit(estimator.estimate, snapshot)
+        try:
+            out = fut.result(timeout=self.budget)
+        except TimeoutError:
+            self.stats["misses"] += 1
+            return self._fallback(quick, "deadline")
+        except Exception as e:
+            print(f"[EstimationHandler] Errore strategia '{getattr(estimator, 'name', '?')}': {e}")
+            self.stats["errors"] += 1
+            return self._fallback(quick, "error")
+
+        self._recent.append(False)
+        return out
+
+    def _fallback(self, quick: Dict[str, Any], cause: str) -> Dict[str, Any]:
+        self._recent.append(True)
+        out = dict(quick)
+        out["fallback"] = True
+        out["fallback_cause"] = cause
+        return out
+
+    def deadline_stats(self) -> Dict[str, Any]:
+        """Contatori e tasso di fallback sulle ultime WINDOW chiamate offloaded."""
+        recent = self._recent
+        return dict(
+            self.stats,
+            strategy=getattr(self.estimator, "name", None),
+            budget_ms=round(self.budget * 1000.0, 1),
+            fallback_rate=round(sum(recent) / len(recent), 4) if recent else None,
+        )
+
+    def shutdown(self, wait: bool = False):
+        """Chiude il worker del modello (se creato); una nuova chiamata lo ricrea."""
+        executor, self._executor = self._executor, None
+        self._inflight = None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
 
     def _process(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        suggestion = self.estimator.estimate(data)
-        data["suggestion"] = suggestion
+        data["suggestion"] = self.suggest(data)
         return data
@@ -0,0 +1,72 @@
+# src/pipeline/vectorized.py
+
+from typing import Dict
+
+import numpy as np
+
+from .features import (
+    WSI_DECIMALS, WSI_DEFAULTS, WSI_LIGHT_REF, WSI_MAX, WSI_TEMP_REF, WSI_VH_BASE, WSI_VH_SLOPE,
+)
+
+
+# ============================================================
+#  Versioni vettorizzate di Cleaning + FeatureEngineering
+# ============================================================
+# Stesse formule di CleaningHandler e FeatureEngineeringHandler applicate a
+# colonne NumPy: servono per valutare milioni di record in un colpo solo
+# (sweep di sensitività, state store multi-campo). I NaN rappresentano i
+# valori mancanti e ricevono gli stessi default della pipeline scalare.
+
+CLEAN_RANGES = {
+    "temperature": (-20.0, 60.0),
+    "humidity": (0.0, 100.0),
+    "light": (0.0, 2000.0),
+    "vegetation_health": (0.0, 1.0),
+    "wind_kmh": (0.0, 200.0),
+    "radiation": (0.0, 1500.0),
+}
+
+# Default degli ingressi mancanti: gli stessi della pipeline scalare
+FEATURE_DEFAULTS = WSI_DEFAULTS
+
+
+def clean_batch(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Clamp delle colonne note ai range fisici (NaN restano NaN)."""
+    out = dict(cols)
+    for key, (lo, hi) in CLEAN_RANGES.items():
+        if key in out:
+            out[key] = np.clip(np.asarray(out[key], dtype=np.float64), lo, hi)
+    return out
+
+
+def wsi_batch(temp: np.ndarray, hum: np.ndarray, light: np.ndarray, vh: np.ndarray) -> np.ndarray:
+    """
+    Water Stress Index vettorizzato, come FeatureEngineeringHandler.
+    L'arrotondamento a 3 decimali usa np.round (può differire dal round()
+    Python solo sull'ultima cifra nei casi di parità).
+    """
+    d = FEATURE_DEFAULTS
+    temp = np.where(np.isnan(temp), d["temperature"], temp)
+    hum = np.where(np.isnan(hum), d["humidity"], hum)
+    light = np.where(np.isnan(light), d["light"], light)
+    vh = np.where(np.isnan(vh), d["vegetation_health"], vh)
+
+    wsi = (temp / WSI_TEMP_REF) * ((100.0 - hum) / 100.0) * (light / WSI_LIGHT_REF)
+    wsi *= WSI_VH_BASE - np.clip(vh, 0.0, 1.0) * WSI_VH_SLOPE
+    return np.round(np.clip(wsi, 0.0, WSI_MAX), WSI_DECIMALS)
+
+
+# Colonne prodotte da features_batch (ingressi puliti + WSI)
+BATCH_FEATURES = frozenset(CLEAN_RANGES) | {"water_stress_index"}
+
+
+def features_batch(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Cleaning + WSI: restituisce le colonne pulite con water_stress_index."""
+    n = len(next(iter(cols.values())))
+    nan = np.full(n, np.nan)
+    out = clean_batch(cols)
+    out["water_stress_index"] = wsi_batch(
+        out.get("temperature", nan), out.get("humidity", nan),
+        out.get("light", nan), out.get("vegetation_health", nan),
+    )
+    return out
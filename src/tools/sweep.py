@@ -0,0 +1,221 @@
+# src/tools/sweep.py
+"""
+Sweep di sensitività di una strategia sullo spazio
+temperatura × umidità × luce × vegetation_health.
+
+Valuta la catena Cleaning → WSI → Strategy su una griglia densa (anche
+10^7+ punti) a blocchi vettorizzati di dimensione fissa, quindi la memoria
+non dipende dalla dimensione della griglia. Produce:
+- mappe di decisione 2D (azione prevalente e sua frazione per ogni cella,
+  marginalizzando sulle altre dimensioni)
+- statistiche di frontiera: per ogni asse, quante coppie di punti vicini
+  cambiano azione, dove (istogramma lungo l'asse) e tra quali azioni
+
+Esempio:
+    python -m src.tools.sweep --strategy simple_rules --out sweep_out
+    python -m src.tools.sweep --temperature -5:50:111 --humidity 0:100:201 --chunk 2000000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ..ai.strategies import ACTIONS, REASONS, BaseStrategy, make_strategy
+from ..pipeline.vectorized import features_batch
+
+
+AXES = ("temperature", "humidity", "light", "vegetation_health")
+
+DEFAULT_GRID = {
+    "temperature": (-5.0, 50.0, 111),
+    "humidity": (0.0, 100.0, 101),
+    "light": (0.0, 2000.0, 41),
+    "vegetation_health": (0.0, 1.0, 21),
+}
+
+
+def parse_axis(spec: str) -> Tuple[float, float, int]:
+    """'min:max:n' → (min, max, n)"""
+    lo, hi, n = spec.split(":")
+    return float(lo), float(hi), int(n)
+
+
+# ============================================================
+#  Sweep
+# ============================================================
+
+class StrategySweep:
+    def __init__(self, strategy: BaseStrategy, grid: Dict[str, Tuple[float, float, int]],
+                 chunk: int = 1_000_000, map_pairs: List[Tuple[str, str]] = None):
+        self.strategy = strategy
+        self.axes = [np.linspace(*grid[a]) for a in AXES]
+        self.shape = tuple(len(v) for v in self.axes)
+        self.size = int(np.prod(self.shape))
+        self.chunk = chunk
+        self.map_pairs = map_pairs or list(itertools.combinations(AXES, 2))
+
+        n_a = len(ACTIONS)
+        self.action_counts = np.zeros(n_a, dtype=np.int64)
+        self.reason_counts = np.zeros(len(REASONS), dtype=np.int64)
+        self.volume_sum = 0.0
+        # Conteggi (cella 2D, azione) per ogni coppia di assi
+        self._maps = {
+            pair: np.zeros((self.shape[AXES.index(pair[0])], self.shape[AXES.index(pair[1])], n_a),
+                           dtype=np.int64)
+            for pair in self.map_pairs
+        }
+        # Frontiere: transizioni per asse, posizione lungo l'asse e coppia (da, a)
+        self._edges = {a: np.zeros(self.shape[i], dtype=np.int64) for i, a in enumerate(AXES)}
+        self._pairs = {a: np.zeros((n_a, n_a), dtype=np.int64) for a in AXES}
+        self._neighbors = {a: 0 for a in AXES}
+
+    def _evaluate(self, idx: Tuple[np.ndarray, ...]) -> Dict[str, np.ndarray]:
+        cols = {a: self.axes[i][idx[i]] for i, a in enumerate(AXES)}
+        return self.strategy.estimate_batch(features_batch(cols))
+
+    def run(self) -> "StrategySweep":
+        n_a = len(ACTIONS)
+        for start in range(0, self.size, self.chunk):
+            flat = np.arange(start, min(self.size, start + self.chunk), dtype=np.int64)
+            idx = np.unravel_index(flat, self.shape)
+            out = self._evaluate(idx)
+            action = out["action"].astype(np.int64)
+
+            self.action_counts += np.bincount(action, minlength=n_a)
+            self.reason_counts += np.bincount(out["reason"].astype(np.int64), minlength=len(REASONS))
+            self.volume_sum += float(out["volume_l_m2"].sum(dtype=np.float64))
+
+            for (a, b), counts in self._maps.items():
+                ia, ib = idx[AXES.index(a)], idx[AXES.index(b)]
+                nb = counts.shape[1]
+                cell = (ia * nb + ib) * n_a + action
+                counts += np.bincount(cell, minlength=counts.size).reshape(counts.shape)
+
+            # Vicino successivo lungo ogni asse: una valutazione in più per asse
+            for k, axis in enumerate(AXES):
+                has_next = idx[k] < self.shape[k] - 1
+                if not has_next.any():
+                    continue
+                nidx = tuple(
+                    (ix[has_next] + 1) if j == k else ix[has_next] for j, ix in enumerate(idx)
+                )
+                a0 = action[has_next]
+                a1 = self._evaluate(nidx)["action"].astype(np.int64)
+                changed = a0 != a1
+                self._neighbors[axis] += int(has_next.sum())
+                self._edges[axis] += np.bincount(idx[k][has_next][changed], minlength=self.shape[k])
+                self._pairs[axis] += np.bincount(a0[changed] * n_a + a1[changed],
+                                                 minlength=n_a * n_a).reshape(n_a, n_a)
+        return self
+
+    # ---------------------------------------------------------
+    # Risultati
+    # ---------------------------------------------------------
+    def decision_maps(self) -> Dict[str, Dict[str, np.ndarray]]:
+        maps = {}
+        for (a, b), counts in self._maps.items():
+            total = counts.sum(axis=2)
+            maps[f"{a}__{b}"] = {
+                "action": counts.argmax(axis=2).astype(np.int8),
+                "share": (counts.max(axis=2) / np.maximum(total, 1)).astype(np.float32),
+            }
+        return maps
+
+    def summary(self) -> Dict[str, object]:
+        boundaries = {}
+        for i, axis in enumerate(AXES):
+            edges = self._edges[axis]
+            values = self.axes[i]
+            top = np.argsort(edges)[::-1][:5]
+            pairs = self._pairs[axis]
+            flat = [(int(pairs[x, y]), ACTIONS[x], ACTIONS[y])
+                    for x in range(len(ACTIONS)) for y in range(len(ACTIONS)) if pairs[x, y]]
+            flat.sort(reverse=True)
+            boundaries[axis] = {
+                "transitions": int(edges.sum()),
+                "fraction": round(float(edges.sum()) / max(self._neighbors[axis], 1), 5),
+                # Posizione lungo l'asse: tra values[j] e values[j+1]
+                "hotspots": [
+                    {"between": [round(float(values[j]), 3), round(float(values[j + 1]), 3)],
+                     "transitions": int(edges[j])}
+                    for j in top if edges[j] > 0
+                ],
+                "top_pairs": [{"from": f, "to": t, "count": c} for c, f, t in flat[:5]],
+            }
+
+        return {
+            "strategy": self.strategy.name,
+            "points": self.size,
+            "grid": {a: [float(v[0]), float(v[-1]), len(v)] for a, v in zip(AXES, self.axes)},
+            "actions": {ACTIONS[i]: int(c) for i, c in enumerate(self.action_counts) if c},
+            "reasons": {REASONS[i]: int(c) for i, c in enumerate(self.reason_counts) if c},
+            "mean_volume_l_m2": round(self.volume_sum / max(self.size, 1), 4),
+            "boundaries": boundaries,
+        }
+
+    def save(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        arrays = {}
+        for name, m in self.decision_maps().items():
+            arrays[f"{name}__action"] = m["action"]
+            arrays[f"{name}__share"] = m["share"]
+        for a, v in zip(AXES, self.axes):
+            arrays[f"axis__{a}"] = v
+        np.savez_compressed(os.path.join(out_dir, "decision_maps.npz"),
+                            actions=np.array(ACTIONS), **arrays)
+
+        # CSV leggibili per le mappe principali
+        for name, m in self.decision_maps().items():
+            a, b = name.split("__")
+            va, vb = self.axes[AXES.index(a)], self.axes[AXES.index(b)]
+            with open(os.path.join(out_dir, f"map_{name}.csv"), "w") as f:
+                f.write(f"{a}\\{b}," + ",".join(f"{x:g}" for x in vb) + "\n")
+                for i, x in enumerate(va):
+                    f.write(f"{x:g}," + ",".join(ACTIONS[c] for c in m["action"][i]) + "\n")
+
+        with open(os.path.join(out_dir, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+# ============================================================
+#  CLI
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep di sensitività delle strategie decisionali")
+    parser.add_argument("--strategy", default="simple_rules")
+    for axis in AXES:
+        lo, hi, n = DEFAULT_GRID[axis]
+        parser.add_argument(f"--{axis.replace('_', '-')}", dest=axis, default=f"{lo}:{hi}:{n}",
+                            help=f"min:max:n (default {lo}:{hi}:{n})")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="punti per blocco vettorizzato")
+    parser.add_argument("--maps", default="temperature:humidity,humidity:light,temperature:vegetation_health",
+                        help="coppie di assi per le mappe 2D, es. temperature:humidity")
+    parser.add_argument("--out", default="sweep_out")
+    args = parser.parse_args()
+
+    grid = {a: parse_axis(getattr(args, a)) for a in AXES}
+    pairs = [tuple(p.split(":")) for p in args.maps.split(",") if p]
+
+    sweep = StrategySweep(make_strategy(args.strategy), grid, chunk=args.chunk, map_pairs=pairs)
+    print(f"[Sweep] {sweep.size:,} punti, strategia '{sweep.strategy.name}'...")
+    t0 = time.time()
+    sweep.run()
+    sweep.save(args.out)
+    elapsed = time.time() - t0
+
+    summary = sweep.summary()
+    print(f"[Sweep] Completato in {elapsed:.1f}s ({sweep.size / max(elapsed, 1e-9):,.0f} punti/s)")
+    print(json.dumps({"actions": summary["actions"], "reasons": summary["reasons"]}, indent=2))
+    for axis, b in summary["boundaries"].items():
+        print(f"  frontiere lungo {axis}: {b['transitions']:,} ({b['fraction']:.2%})")
+    print(f"[Sweep] Risultati in '{args.out}/'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# src/tools/synth.py
+"""
+Generatore di dati sintetici realistici (SyntheticGenerator) da riga di comando.
+
+Serie correlate con ciclo diurno e stagionale per molti campi: mesi di
+dati al minuto in pochi secondi, scritti a blocchi (memoria costante).
+Uscite:
+- Parquet in formato lungo (field_id, ts, grandezze) per benchmark e
+  analisi, leggibile con pyarrow / pandas
+- scenario JSON nel formato di test_cases/ (serie con "steps") per la
+  riproduzione in modalità DEMO del DecisionAgent
+
+Esempio:
+    python -m src.tools.synth --fields 100 --days 90 --out data/synth.parquet
+    python -m src.tools.synth --days 2 --start 2025-07-01 --scenario test_cases/estate_sintetica.json
+    python -m src.tools.synth --fields 1000 --days 30 --bench
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from ..common.synthetic import SERIES_KEYS, SyntheticGenerator
+
+
+def _writer(path: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [("field_id", pa.dictionary(pa.int32(), pa.string())), ("ts", pa.timestamp("ms", tz="UTC"))]
+        + [(k, pa.float32()) for k in SERIES_KEYS]
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return pa, pq.ParquetWriter(path, schema, compression="zstd"), schema
+
+
+def write_parquet(gen: SyntheticGenerator, n_steps: int, chunk_steps: int, path: str) -> int:
+    """Scrive la serie a blocchi; righe ordinate per istante e campo."""
+    pa, writer, schema = _writer(path)
+    ids = pa.array(gen.field_ids).dictionary_encode()
+    n = gen.n_fields
+    rows = 0
+    try:
+        for chunk in gen.iter_chunks(n_steps, chunk_steps):
+            m = len(chunk["ts"])
+            # (campi × istanti) → righe per istante: trasposta e appiattita
+            field_idx = np.tile(np.arange(n, dtype=np.int32), m)
+            ts_ms = np.repeat((chunk["ts"] * 1000).astype(np.int64), n)
+            cols = [
+                pa.DictionaryArray.from_arrays(pa.array(field_idx), ids.dictionary),
+                pa.array(ts_ms, type=pa.timestamp("ms", tz="UTC")),
+            ] + [pa.array(chunk[k].T.ravel()) for k in SERIES_KEYS]
+            writer.write_table(pa.Table.from_arrays(cols, schema=schema))
+            rows += n * m
+    finally:
+        writer.close()
+    return rows
+
+
+def write_scenario(gen: SyntheticGenerator, n_steps: int, every: int, path: str,
+                   description: str, speedup: Optional[float]) -> int:
+    """Primo campo come scenario a step (un punto ogni `every` istanti, t relativo)."""
+    chunk = gen.next_chunk(n_steps)
+    idx = np.arange(0, n_steps, every)
+    t0 = chunk["ts"][0]
+    steps = []
+    for k in idx:
+        step = {"t": round(float(chunk["ts"][k] - t0), 1)}
+        for key in SERIES_KEYS:
+            step[key] = round(float(chunk[key][0, k]), 3 if key == "vegetation_health" else 1)
+        steps.append(step)
+    data = {"description": description, "loop": False, "steps": steps}
+    if speedup:
+        data["speedup"] = speedup
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
+    return len(steps)
+
+
+# ============================================================
+#  CLI
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Dati sintetici correlati con ciclo diurno")
+    parser.add_argument("--fields", type=int, default=1)
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument("--step", type=float, default=60.0, help="passo in secondi")
+    parser.add_argument("--start", default=None, help="data UTC di inizio, es. 2025-07-01 (default: adesso)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-days", type=float, default=1.0, help="giorni per blocco generato")
+    parser.add_argument("--out", default=None, help="file Parquet di uscita")
+    parser.add_argument("--scenario", default=None, help="file JSON scenario (primo campo)")
+    parser.add_argument("--scenario-every", type=float, default=900.0, help="secondi tra due step dello scenario")
+    parser.add_argument("--speedup", type=float, default=None, help="speedup dello scenario")
+    parser.add_argument("--bench", action="store_true", help="solo generazione, senza scrittura")
+    args = parser.parse_args()
+
+    start = (datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+             if args.start else None)
+    gen = SyntheticGenerator(args.fields, step_secs=args.step, start=start, seed=args.seed)
+    n_steps = int(args.days * 86400 / args.step)
+    chunk_steps = max(1, int(args.chunk_days * 86400 / args.step))
+    t0 = time.time()
+
+    if args.scenario:
+        every = max(1, int(args.scenario_every / args.step))
+        n = write_scenario(gen, n_steps, every, args.scenario,
+                           f"Serie sintetica di {args.days:g} giorni (seed {args.seed})", args.speedup)
+        print(f"[Synth] Scenario con {n} step in '{args.scenario}'")
+        return
+
+    if args.out:
+        rows = write_parquet(gen, n_steps, chunk_steps, args.out)
+        dest = f" in '{args.out}'"
+    else:
+        rows = 0
+        for chunk in gen.iter_chunks(n_steps, chunk_steps):
+            rows += chunk["temperature"].size
+        dest = "" if args.bench else " (nessuna uscita: usa --out o --scenario)"
+
+    elapsed = time.time() - t0
+    print(f"[Synth] {rows:,} righe × {len(SERIES_KEYS)} grandezze ({args.fields} campi, "
+          f"{args.days:g} giorni) in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} righe/s){dest}")
+
+
+if __name__ == "__main__":
+    main()
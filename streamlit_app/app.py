@@ -1,5 +1,5 @@
 import streamlit as st
-import time, threading, json, queue, os
+import time, threading, json, queue, os, sys
 from paho.mqtt import client as mqtt
 import pandas as pd
 
@@ -9,6 +9,12 @@ import pandas as pd
 MQTT_HOST = os.getenv("MQTT_BROKER_HOST", "localhost")
 MQTT_PORT = int(os.getenv("MQTT_BROKER_PORT", "1883"))
 FIELD_ID = os.getenv("FIELD_ID", "field-01")
+SCENARIOS_DIR = os.getenv("SCENARIOS_DIR", "test_cases")
+SCENARIO_SPEEDUP = float(os.getenv("SCENARIO_SPEEDUP", "60"))
+HISTORY_DIR = os.getenv("HISTORY_DIR", "")
+
+# Radice del progetto nel path: la dashboard riusa le query dello storico in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # ---------------------------------------------------------
 # Configurazione pagina + CSS
@@ -77,6 +83,14 @@ if "mode" not in st.session_state:
 if "current_strategy" not in st.session_state:
     st.session_state["current_strategy"] = None
 
+# ---------------------------------------------------------
+# Vista: singolo campo / panoramica multi-campo
+# ---------------------------------------------------------
+st.sidebar.header("Vista")
+view = "overview" if st.sidebar.radio(
+    "Pagina", ["Campo", "Panoramica campi"], index=0
+) == "Panoramica campi" else "field"
+
 # ---------------------------------------------------------
 # Scelta modalità LIVE / DEMO
 # ---------------------------------------------------------
@@ -104,6 +118,7 @@ if st.session_state["mode"] != mode_selected:
 # ---------------------------------------------------------
 STRATEGY_LABELS = {
     "senza AI": "simple_rules",
+    "Agronomica (VPD / ET0)": "agronomic",
     "AI (ML placeholder)": "ml_placeholder",
 }
 
@@ -114,17 +129,42 @@ if st.session_state["mode"] == "live":
 else:
     selected_strategy = "simple_rules"
 
+# ---------------------------------------------------------
+# Ricostruzione stato da snapshot completi e delta
+# ---------------------------------------------------------
+# Stesso decoder usato dagli agenti (snapshot, delta e chiavi rimosse)
+from src.common.publish_policy import DecisionStateDecoder
+
+decision_decoder = DecisionStateDecoder()
+
+
 # ---------------------------------------------------------
 # MQTT Setup
 # ---------------------------------------------------------
+# Rollup pubblicati dal RollupAgent (messaggi retained)
+overview_state = {}
+rollups_raw = {}
+
 def on_message(client, userdata, msg):
+    # Serie di drill-down: payload grezzo, decodificato solo per il campo selezionato
+    if "/rollups/" in msg.topic:
+        parts = msg.topic.split("/")
+        rollups_raw[(parts[1], parts[3])] = msg.payload
+        return
+
     try:
         data = json.loads(msg.payload.decode("utf-8"))
     except:
         return
 
+    if msg.topic == "greenfield/overview":
+        overview_state["data"] = data
+        return
+
     if msg.topic.endswith("/decisions"):
-        decisions_q.put(data)
+        state = decision_decoder.apply(data)
+        if state is not None:
+            decisions_q.put(state)
         return
 
 
@@ -134,6 +174,8 @@ def mqtt_loop_sub():
     c.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
 
     c.subscribe(f"greenfield/{FIELD_ID}/decisions", qos=0)
+    c.subscribe("greenfield/overview", qos=0)
+    c.subscribe("greenfield/+/rollups/+", qos=0)
     c.loop_forever()
 
 
@@ -146,26 +188,81 @@ mqtt_pub.loop_start()
 # ---------------------------------------------------------
 # DEMO MODE — Selezione test case
 # ---------------------------------------------------------
+@st.cache_data
+def list_test_cases(dir_mtime: float):
+    # Rilegge la cartella solo quando cambia il suo mtime
+    return sorted(
+        f.replace(".json", "")
+        for f in os.listdir(SCENARIOS_DIR)
+        if f.endswith(".json")
+    )
+
+@st.cache_data
+def scenario_speedup(case: str, file_mtime: float) -> float:
+    # Accelerazione dichiarata dallo scenario (default SCENARIO_SPEEDUP)
+    try:
+        with open(os.path.join(SCENARIOS_DIR, f"{case}.json"), "r") as f:
+            data = json.load(f)
+        return float(data.get("speedup") or SCENARIO_SPEEDUP) if isinstance(data, dict) else SCENARIO_SPEEDUP
+    except (OSError, ValueError):
+        return SCENARIO_SPEEDUP
+
 if st.session_state["mode"] == "demo":
 
     st.sidebar.subheader("Test Cases")
 
-    files = [
-        f.replace(".json", "")
-        for f in os.listdir("test_cases")
-        if f.endswith(".json")
-    ]
+    files = list_test_cases(os.stat(SCENARIOS_DIR).st_mtime)
 
     selected_case = st.sidebar.selectbox("Seleziona scenario", files)
+    case_speedup = int(scenario_speedup(
+        selected_case, os.stat(os.path.join(SCENARIOS_DIR, f"{selected_case}.json")).st_mtime
+    )) if selected_case else int(SCENARIO_SPEEDUP)
+    # Un widget per scenario: il valore iniziale è l'accelerazione dello scenario scelto
+    speedup = st.sidebar.number_input(
+        "Accelerazione serie temporali (x)", min_value=1, max_value=100000,
+        value=case_speedup, step=60, key=f"speedup-{selected_case}"
+    )
 
     if st.sidebar.button("Applica Test Case"):
-        mqtt_pub.publish(
-            f"greenfield/{FIELD_ID}/control/test_case",
-            json.dumps({"mode": "demo", "case": selected_case})
-        )
+        command = {"mode": "demo", "case": selected_case}
+        # Solo se modificata: altrimenti vale quella dichiarata dallo scenario
+        if speedup != case_speedup:
+            command["speedup"] = speedup
+        mqtt_pub.publish(f"greenfield/{FIELD_ID}/control/test_case", json.dumps(command))
         st.sidebar.success(f"Scenario '{selected_case}' applicato!")
 
 
+# ---------------------------------------------------------
+# STORICO DECISIONI (Parquet partizionato per campo / giorno)
+# ---------------------------------------------------------
+@st.cache_data(ttl=60)
+def load_history(field_id: str, days: int):
+    from src.common.history import query_history
+    # Legge solo le partizioni del campo e del periodo, e solo due colonne
+    return query_history(field_id, days=days, columns=["water_stress_index", "action"], root=HISTORY_DIR)
+
+st.sidebar.subheader("Storico decisioni")
+history_days = st.sidebar.slider("Giorni", min_value=1, max_value=90, value=30)
+show_history = st.sidebar.checkbox("Mostra storico", value=False)
+
+if show_history:
+    with st.expander(f"📚 Storico ultimi {history_days} giorni", expanded=True):
+        hist = load_history(FIELD_ID, history_days)
+        if not HISTORY_DIR:
+            st.info("Storico disattivato: impostare HISTORY_DIR (es. data/history).")
+        elif hist.empty:
+            st.info(f"Nessuna decisione archiviata in '{HISTORY_DIR}'.")
+        else:
+            hist = hist.set_index("ts")
+            cols = st.columns(2)
+            with cols[0]:
+                st.write("**Stress Idrico (media oraria)**")
+                st.line_chart(hist["water_stress_index"].resample("1h").mean(), height=250)
+            with cols[1]:
+                st.write("**Decisioni per azione**")
+                st.bar_chart(hist["action"].astype(str).value_counts(), height=250)
+
+
 # ---------------------------------------------------------
 # Funzioni classificazione card
 # ---------------------------------------------------------
@@ -213,6 +310,8 @@ reason_map = {
     "too-cold-to-irrigate": "Temperatura troppo bassa per irrigare.",
     "vegetation-health-critical": "Salute vegetazione critica.",
     "extreme-conditions": "Condizioni ambientali estreme.",
+    "high-vapor-pressure-deficit": "Deficit di pressione di vapore elevato.",
+    "rain-expected": "Pioggia prevista sufficiente: irrigazione rimandata.",
     "simulated-ml-result": "Risultato generato dal modello AI simulato."
 }
 
@@ -225,6 +324,86 @@ action_map = {
 }
 
 
+# ---------------------------------------------------------
+# PANORAMICA MULTI-CAMPO (rollup server-side, nessuna aggregazione qui)
+# ---------------------------------------------------------
+from src.common.config import ROLLUP_RESOLUTIONS
+from src.pipeline.features import window_label
+
+# Risoluzioni configurate del RollupAgent; la panoramica usa la più lunga
+ROLLUP_LABELS = [window_label(res) for res in sorted(ROLLUP_RESOLUTIONS)]
+OVERVIEW_LABEL = ROLLUP_LABELS[-1] if ROLLUP_LABELS else "1h"
+
+OVERVIEW_COLUMNS = {
+    "field_id": "Campo",
+    "action": "Decisione",
+    "temperature": "Temperatura",
+    "humidity": "Umidità",
+    "water_stress_index": "Stress idrico",
+    f"wsi_mean_{OVERVIEW_LABEL}": f"Stress idrico (media {OVERVIEW_LABEL})",
+    f"wsi_max_{OVERVIEW_LABEL}": f"Stress idrico (max {OVERVIEW_LABEL})",
+    "vegetation_health": "Vegetation health",
+    "age_s": "Ultimo dato (s)",
+}
+
+def rollup_frame(series):
+    # Serie colonnare → DataFrame indicizzato per inizio bucket
+    frame = pd.DataFrame({
+        "temperatura": series["temperature"]["mean"],
+        "umidità": series["humidity"]["mean"],
+        "stress_idrico": series["water_stress_index"]["mean"],
+        "stress_idrico_max": series["water_stress_index"]["max"],
+    }, index=pd.to_datetime(series["start"], unit="s"))
+    actions = pd.DataFrame(series["actions"], index=frame.index)
+    return frame, actions
+
+if view == "overview":
+    placeholder_overview = st.empty()
+    drill_field = st.sidebar.text_input("Drill-down campo", value=FIELD_ID)
+    drill_res = st.sidebar.radio("Risoluzione", ROLLUP_LABELS, index=0)
+    placeholder_drill = st.empty()
+
+    while True:
+        data = overview_state.get("data")
+        with placeholder_overview.container():
+            if not data or not data.get("fields"):
+                st.info("In attesa della panoramica dal RollupAgent...")
+            else:
+                rows = pd.DataFrame(data["fields"])
+                counts = rows["action"].value_counts()
+                cols = st.columns(len(action_map))
+                for i, (key, label) in enumerate(action_map.items()):
+                    cols[i].metric(label, int(counts.get(key, 0)))
+                visible = [c for c in OVERVIEW_COLUMNS if c in rows.columns]
+                st.dataframe(
+                    rows[visible].rename(columns=OVERVIEW_COLUMNS),
+                    use_container_width=True, hide_index=True
+                )
+
+        with placeholder_drill.container():
+            raw = rollups_raw.get((drill_field, drill_res))
+            st.markdown(
+                f"<div class='section-title'>🔎 {drill_field} — rollup {drill_res}</div>",
+                unsafe_allow_html=True
+            )
+            if raw is None:
+                st.info("Nessun rollup disponibile per questo campo (il primo bucket non è ancora chiuso).")
+            else:
+                frame, actions = rollup_frame(json.loads(raw))
+                cols = st.columns(2)
+                with cols[0]:
+                    st.write("**Temperatura / Umidità (media)**")
+                    st.line_chart(frame[["temperatura", "umidità"]], height=250)
+                with cols[1]:
+                    st.write("**Stress Idrico (media / max)**")
+                    st.line_chart(frame[["stress_idrico", "stress_idrico_max"]], height=250)
+                if not actions.empty:
+                    st.write("**Decisioni per bucket**")
+                    st.bar_chart(actions, height=250)
+
+        time.sleep(1.0)
+
+
 # ---------------------------------------------------------
 # LOOP PRINCIPALE
 # ---------------------------------------------------------
@@ -268,9 +447,9 @@ while True:
 
         reason_text = reason_map.get(reason, "Stato non disponibile")
 
-        if reason in ["conditions-normal"]:
+        if reason in ["conditions-normal", "rain-expected"]:
             banner_class = "status-ok"
-        elif reason in ["moderate-water-stress", "high-water-stress", "low-humidity"]:
+        elif reason in ["moderate-water-stress", "high-water-stress", "low-humidity", "high-vapor-pressure-deficit"]:
             banner_class = "status-warn"
         else:
             banner_class = "status-bad"
@@ -340,6 +519,12 @@ while True:
 
         volume = suggestion.get("volume_l_m2", 0)
 
+        # Decisione di riserva: il modello primario non ha risposto entro il budget
+        fallback_note = (
+            "<br><b>Decisione di riserva:</b> regole semplici (modello AI oltre il budget di latenza)"
+            if suggestion.get("fallback") else ""
+        )
+
         # colore banner suggeriemento
         if action == "hold":
             banner_class = "status-ok"
@@ -364,7 +549,7 @@ while True:
             line-height: 1.6;
             margin-top: -10px;">
             <b>Motivo:</b> {pretty_reason}<br>
-            <b>Volume consigliato:</b> {volume} L/m²
+            <b>Volume consigliato:</b> {volume} L/m²{fallback_note}
         </div>
         """, unsafe_allow_html=True)
 
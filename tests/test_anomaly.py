@@ -0,0 +1,74 @@
+import numpy as np
+
+from src.pipeline.anomaly import ANOMALIES, SPIKE_ACCEPT, AnomalyDetector
+
+
+def detector(**kw):
+    params = dict(capacity=2, warmup=20, flatline_n=5, spike_z=6.0, drift_z=4.0,
+                  alpha_fast=0.2, alpha_slow=0.05)
+    params.update(kw)
+    return AnomalyDetector(**params)
+
+
+def feed(det, values, sensor="s", kind="temperature", t0=0):
+    return [ANOMALIES[int(det.observe([sensor], [kind], [v], [t0 + i])[0])] for i, v in enumerate(values)]
+
+
+def noisy(n, level=20.0, seed=0):
+    return list(level + np.random.default_rng(seed).normal(0.0, 1.0, n))
+
+
+def test_spike_flagged_and_kept_out_of_statistics():
+    det = detector()
+    assert set(feed(det, noisy(100))) == {"ok"}
+    assert feed(det, [60.0], t0=100) == ["spike"]
+    # La lettura anomala non sposta il riferimento: si torna subito a "ok"
+    assert feed(det, [20.0], t0=101) == ["ok"]
+    assert [e["anomaly"] for e in det.pop_events()] == ["spike", "ok"]
+
+
+def test_sustained_jump_is_accepted_as_new_level():
+    det = detector()
+    feed(det, noisy(100))
+    codes = feed(det, [60.0] * (SPIKE_ACCEPT + 3), t0=100)
+    assert codes[:SPIKE_ACCEPT] == ["spike"] * SPIKE_ACCEPT
+    assert codes[SPIKE_ACCEPT:] == ["ok"] * 3
+
+
+def test_flatline_except_at_physical_bounds():
+    det = detector()
+    codes = feed(det, noisy(50) + [21.5] * 10)
+    assert codes[:50].count("flatline") == 0
+    assert codes[-1] == "flatline"
+
+    # Luce a 0 tutta la notte: estremo fisico, non una sonda bloccata
+    light = list(np.abs(np.random.default_rng(1).normal(300.0, 30.0, 50))) + [0.0] * 200
+    assert "flatline" not in feed(det, light, sensor="l", kind="light")
+
+
+def test_drift_after_warmup():
+    det = detector()
+    stable = noisy(400)
+    ramp = list(20.0 + 0.5 * np.arange(100) + np.random.default_rng(2).normal(0.0, 1.0, 100))
+    codes = feed(det, stable + ramp)
+    assert set(codes[:400]) == {"ok"}
+    assert "drift" in codes[400:]
+    assert "spike" not in codes
+
+
+def test_backfill_is_not_screened():
+    det = detector()
+    feed(det, noisy(100))
+    # Lettura arretrata assurda: nessun controllo, statistiche invariate
+    assert ANOMALIES[int(det.observe(["s"], ["temperature"], [500.0], [10.0])[0])] == "ok"
+    assert feed(det, [20.0], t0=100) == ["ok"]
+
+
+def test_growth_keeps_sensor_statistics():
+    det = detector(capacity=1)
+    feed(det, noisy(100), sensor="a")
+    keys = [f"s{i}" for i in range(9)]
+    det.observe(keys, ["temperature"] * 9, [20.0] * 9, [100.0] * 9)
+    assert len(det) == 10 and len(det.n) >= 10
+    # Le statistiche di "a" sono sopravvissute alla riallocazione
+    assert feed(det, [60.0], sensor="a", t0=200) == ["spike"]
@@ -0,0 +1,39 @@
+import json
+import time
+
+import src.agents.decision_agent as decision_agent
+from src.common.config import FIELD_ID
+from src.common.local_bus import LocalBroker, LocalClient
+
+
+def test_backfill_out_of_order_keeps_newest(monkeypatch):
+    broker = LocalBroker(synchronous=True)
+    monkeypatch.setattr(decision_agent, "make_client", lambda name: LocalClient(name, broker))
+    agent = decision_agent.DecisionAgent()
+    agent.client.connect()
+    pub = LocalClient("sensors", broker)
+    pub.connect()
+    base = f"greenfield/{FIELD_ID}/sensors"
+
+    try:
+        now = time.time()
+        pub.publish(f"{base}/temperature/t1", json.dumps({"type": "temperature", "value": 30.0, "ts": now}))
+        # Backfill dallo spool: letture più vecchie del valore live, poi fuori ordine tra loro
+        pub.publish(f"{base}/temperature/t1", json.dumps({"backfill": True, "batch": [
+            {"type": "temperature", "value": 10.0, "ts": now - 5}]}))
+        pub.publish(f"{base}/humidity/h1", json.dumps({"backfill": True, "batch": [
+            {"type": "humidity", "value": 55.0, "ts": now - 3},
+            {"type": "humidity", "value": 44.0, "ts": now - 8}]}))
+        agent.ingest()
+
+        assert agent.cache["temperature"] == 30.0
+        assert agent.cache["humidity"] == 55.0
+        assert agent.last_update["humidity"] == now - 3
+        # Nessuna lettura oltre l'arrivo: un ts nel futuro vale come l'arrivo
+        pub.publish(f"{base}/light/l1", json.dumps({"backfill": True, "batch": [
+            {"type": "light", "value": 500.0, "ts": now + 3600}]}))
+        agent.ingest()
+        assert agent.cache["light"] == 500.0
+        assert agent.last_update["light"] <= time.time()
+    finally:
+        agent.stop()
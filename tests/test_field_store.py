@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.ai.strategies import make_strategy
+from src.common.field_store import INPUT_KEYS, NO_DECISION, FieldStore
+from src.pipeline.handlers import CleaningHandler, EstimationHandler, FeatureEngineeringHandler
+
+EPOCH = 1.7e9
+
+
+def test_set_many_newest_reading_wins():
+    store = FieldStore(4, epoch=EPOCH)
+    rows = store.rows(["a", "b", "a", "a"])
+    # Nello stesso blocco vince il ts maggiore, non l'ordine di arrivo
+    store.set_many(rows, "temperature", [10.0, 20.0, 30.0, 11.0], [EPOCH + 5, EPOCH + 1, EPOCH + 9, EPOCH + 2])
+    assert store.values["temperature"][store.row("a")] == 30.0
+    assert store.values["temperature"][store.row("b")] == 20.0
+
+    # Backfill più vecchio del valore in colonna: ignorato
+    store.set_many(store.rows(["a", "b"]), "temperature", [1.0, 2.0], [EPOCH + 8, EPOCH + 3])
+    assert store.values["temperature"][store.row("a")] == 30.0
+    assert store.values["temperature"][store.row("b")] == 2.0
+
+
+def test_growth_keeps_existing_rows():
+    store = FieldStore(2, epoch=EPOCH)
+    ids = [f"f{i}" for i in range(9)]
+    for i, f in enumerate(ids):
+        store.set_many(store.rows([f]), "humidity", [float(i)], [EPOCH + i])
+    assert store.capacity == 16 and len(store) == 9
+    assert store.values["humidity"][:9].tolist() == [float(i) for i in range(9)]
+    assert [store.row(f) for f in ids] == list(range(9))
+
+
+def test_expired_inputs_clear_the_decision():
+    store = FieldStore(4, epoch=EPOCH)
+    rows = store.rows(["a"])
+    for key, value in (("temperature", 30.0), ("humidity", 40.0)):
+        store.set_many(rows, key, [value], [EPOCH])
+    strategy = make_strategy("simple_rules")
+    assert store.evaluate(strategy, EPOCH + 1)["changed"].tolist() == [0]
+    assert store.heartbeat_due(EPOCH + 1, 0.0).tolist() == [0]
+
+    assert store.expire(EPOCH + 100, {"temperature": 60.0}) == 1
+    assert len(store.evaluate(strategy, EPOCH + 100)["rows"]) == 0
+    assert store.action[0] == NO_DECISION
+    assert len(store.heartbeat_due(EPOCH + 200, 0.0)) == 0
+    assert "suggestion" not in store.record(0)
+
+    # Al ritorno del dato la decisione è di nuovo "cambiata" e pubblicata
+    store.set_many(rows, "temperature", [30.0], [EPOCH + 300])
+    assert store.evaluate(strategy, EPOCH + 300)["changed"].tolist() == [0]
+
+
+@pytest.mark.parametrize("name", ("simple_rules", "ml_placeholder"))
+def test_evaluate_matches_scalar_pipeline(name):
+    rng = np.random.default_rng(3)
+    n = 500
+    ranges = {"temperature": (-5.0, 45.0), "humidity": (10.0, 95.0), "light": (50.0, 1800.0),
+              "wind_kmh": (0.0, 30.0), "radiation": (0.0, 1000.0), "vegetation_health": (0.1, 1.0)}
+    store = FieldStore(64, epoch=EPOCH)
+    rows = store.rows([f"f{i}" for i in range(n)])
+    for key, (lo, hi) in ranges.items():
+        values = rng.uniform(lo, hi, n).astype(np.float32)
+        if key not in ("temperature", "humidity"):
+            values[rng.random(n) < 0.2] = np.nan
+        store.set_many(rows, key, values, np.full(n, EPOCH))
+
+    random.seed(1)
+    result = store.evaluate(make_strategy(name), EPOCH)
+    assert len(result["rows"]) == n
+
+    head = CleaningHandler()
+    head.set_next(FeatureEngineeringHandler()).set_next(EstimationHandler(make_strategy(name)))
+    random.seed(1)
+    for i in range(n):
+        rec = {k: (None if np.isnan(store.values[k][i]) else float(store.values[k][i])) for k in INPUT_KEYS}
+        expected = head.handle(rec)["suggestion"]
+        got = store.record(i)["suggestion"]
+        assert got["action"] == expected["action"] and got["reason"] == expected["reason"], rec
+        assert got["volume_l_m2"] == pytest.approx(expected["volume_l_m2"], abs=0.01)
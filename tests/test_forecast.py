@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import src.common.forecast as forecast
+from src.common.forecast import HttpForecastProvider
+
+T0 = datetime(2024, 6, 1, 6, 0, tzinfo=timezone.utc)
+
+
+class StubResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+    def json(self):
+        return self._body
+
+
+class StubSession:
+    """Prima risposta 200 con ETag, poi 304 se la richiesta lo rivalida."""
+
+    def __init__(self, body):
+        self.body = body
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return StubResponse(304)
+        return StubResponse(200, self.body, {"ETag": '"v1"'})
+
+
+def hourly_body(hours=72):
+    times = [(T0 + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(hours)]
+    # 1 mm/h nelle prime 6 ore, poi asciutto
+    rain = [1.0 if h < 6 else 0.0 for h in range(hours)]
+    temps = [20.0 + h % 24 for h in range(hours)]
+    return {"hourly": {"time": times, "temperature_2m": temps, "precipitation": rain}}
+
+
+def test_not_modified_advances_horizons(monkeypatch):
+    clock = {"now": T0}
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock["now"]
+
+    monkeypatch.setattr(forecast, "datetime", FrozenDatetime)
+    session = StubSession(hourly_body())
+    provider = HttpForecastProvider(url="http://stub", ttl_secs=0.0, session=session)
+
+    first = provider.get(45.0, 9.0)
+    assert first["forecast_rain_mm_6h"] == 6.0
+    assert provider.stats["fetches"] == 1
+
+    # Tre ore dopo il server risponde 304: la serie in cache va riletta dall'ora corrente
+    clock["now"] = T0 + timedelta(hours=3)
+    later = provider.get(45.0, 9.0)
+    assert session.requests[-1].get("If-None-Match") == '"v1"'
+    assert provider.stats["not_modified"] == 1
+    assert later["forecast_rain_mm_6h"] == 3.0
+    assert later["forecast_temp_max_6h"] == 28.0
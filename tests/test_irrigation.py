@@ -0,0 +1,78 @@
+import json
+import time
+
+import numpy as np
+
+import src.agents.irrigation_agent as irrigation_agent
+from src.ai.irrigation import LIMITS, IrrigationPlanner, _runs, solve_schedule
+from src.common.config import IRRIGATION_MAX_AGE_SECS
+from src.common.local_bus import LocalBroker, LocalClient
+
+
+def test_budget_goes_to_highest_priority_first():
+    sol = solve_schedule(np.array([100.0, 100.0, 100.0]), np.array([0.1, 0.9, 0.5]),
+                         np.full(3, 1000.0), pump_slot_l=1e6, budget_l=150.0, n_slots=4)
+    assert sol["rank"].tolist() == [3, 1, 2]
+    assert sol["planned_l"].tolist() == [0.0, 100.0, 50.0]
+    assert sol["deferred_l"].tolist() == [100.0, 0.0, 50.0]
+    assert [LIMITS[k] for k in sol["limited_by"]] == ["budget", "none", "budget"]
+
+
+def test_zone_flow_caps_the_horizon():
+    sol = solve_schedule(np.array([100.0]), np.array([1.0]), np.array([10.0]),
+                         pump_slot_l=1e6, budget_l=0.0, n_slots=4)
+    assert sol["planned_l"].tolist() == [40.0]
+    assert sol["schedule"].tolist() == [[10.0, 10.0, 10.0, 10.0]]
+    assert LIMITS[sol["limited_by"][0]] == "zone-flow"
+
+
+def test_pump_shared_per_slot_in_priority_order():
+    sol = solve_schedule(np.array([30.0, 30.0]), np.array([0.2, 0.8]), np.full(2, 20.0),
+                         pump_slot_l=25.0, budget_l=0.0, n_slots=2)
+    assert sol["schedule"].tolist() == [[5.0, 15.0], [20.0, 10.0]]
+    assert (sol["schedule"].sum(axis=0) <= 25.0).all()
+    assert sol["planned_l"].tolist() == [20.0, 30.0]
+    assert [LIMITS[k] for k in sol["limited_by"]] == ["pump", "none"]
+
+
+def test_runs_merge_consecutive_slots():
+    litres = np.array([0.0, 5.0, 5.0, 0.0, 3.0])
+    runs = _runs(litres, litres > 0, 1000.0, 900.0)
+    assert runs == [{"start": 1900.0, "end": 3700.0, "litres": 10.0},
+                    {"start": 4600.0, "end": 5500.0, "litres": 3.0}]
+
+
+def retained_plans(broker):
+    """Piani per zona retained sul broker, visti da un nuovo sottoscrittore."""
+    seen = {}
+    c = LocalClient("probe", broker)
+    c.on_message = lambda client, userdata, msg: seen.__setitem__(msg.topic.split("/")[1], msg.payload)
+    c.connect()
+    c.subscribe("greenfield/+/irrigation/plan")
+    c.disconnect()
+    return seen
+
+
+def test_aged_out_zone_plan_is_cleared(monkeypatch):
+    broker = LocalBroker(synchronous=True)
+    monkeypatch.setattr(irrigation_agent, "make_client", lambda name: LocalClient(name, broker))
+    agent = irrigation_agent.IrrigationAgent(planner=IrrigationPlanner(areas={}, default_area_m2=10.0))
+    agent.client.connect()
+    pub = LocalClient("decisions", broker)
+    pub.connect()
+
+    def decide(field_id, seq, ts):
+        pub.publish(f"greenfield/{field_id}/decisions", json.dumps({
+            "kind": "full", "seq": seq, "ts": ts, "water_stress_index": 0.9, "vegetation_health": 0.4,
+            "suggestion": {"action": "irrigate", "reason": "high-water-stress", "volume_l_m2": 4.0}}))
+
+    now = time.time()
+    decide("a", 1, now)
+    decide("b", 1, now)
+    agent.tick()
+    assert set(retained_plans(broker)) == {"a", "b"}
+
+    # L'ultima decisione di b è ormai troppo vecchia: il suo piano retained va cancellato
+    decide("b", 2, now - 2 * IRRIGATION_MAX_AGE_SECS)
+    agent.tick()
+    assert set(retained_plans(broker)) == {"a"}
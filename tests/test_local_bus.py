@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from src.common.local_bus import LocalBroker, LocalClient, topic_matches
+
+
+@pytest.mark.parametrize("pattern, topic, expected", [
+    ("greenfield/a/sensors", "greenfield/a/sensors", True),
+    ("greenfield/+/sensors", "greenfield/a/sensors", True),
+    ("greenfield/+/sensors", "greenfield/a/b/sensors", False),
+    ("greenfield/+", "greenfield", False),
+    ("greenfield/#", "greenfield/a/sensors/temperature", True),
+    ("greenfield/#", "greenfield", True),
+    ("+/+/decisions", "greenfield/a/decisions", True),
+    ("greenfield/a", "greenfield/a/sensors", False),
+])
+def test_topic_matches(pattern, topic, expected):
+    assert topic_matches(pattern, topic) is expected
+
+
+def subscriber(broker, pattern, name="sub", **kw):
+    seen = []
+    c = LocalClient(name, broker, **kw)
+    c.on_message = lambda client, userdata, msg: seen.append((msg.topic, msg.payload, msg.retain))
+    c.connect()
+    c.subscribe(pattern)
+    return c, seen
+
+
+def test_synchronous_delivery_with_wildcards():
+    broker = LocalBroker(synchronous=True)
+    _, exact = subscriber(broker, "greenfield/a/sensors")
+    _, wild = subscriber(broker, "greenfield/+/sensors")
+    pub = LocalClient("pub", broker)
+    pub.connect()
+    pub.publish("greenfield/a/sensors", "1")
+    pub.publish("greenfield/b/sensors", "2")
+    pub.publish("greenfield/b/images", "3")
+    # Consegna già avvenuta dentro publish(), in ordine
+    assert exact == [("greenfield/a/sensors", b"1", False)]
+    assert [p for _, p, _ in wild] == [b"1", b"2"]
+
+
+def test_retained_on_subscribe_and_cleared_by_empty_payload():
+    broker = LocalBroker(synchronous=True)
+    pub = LocalClient("pub", broker)
+    pub.connect()
+    pub.publish("greenfield/a/decisions", "old", retain=True)
+    pub.publish("greenfield/a/decisions", "new", retain=True)
+    pub.publish("greenfield/b/decisions", "b", retain=True)
+
+    _, seen = subscriber(broker, "greenfield/+/decisions")
+    assert sorted(seen) == [("greenfield/a/decisions", b"new", True), ("greenfield/b/decisions", b"b", True)]
+
+    pub.publish("greenfield/a/decisions", b"", retain=True)
+    _, late = subscriber(broker, "greenfield/#", name="late")
+    assert late == [("greenfield/b/decisions", b"b", True)]
+
+
+def test_inbox_is_bounded_without_loop():
+    broker = LocalBroker()
+    client, seen = subscriber(broker, "t", max_queued=3)
+    pub = LocalClient("pub", broker)
+    pub.connect()
+    for i in range(10):
+        pub.publish("t", str(i))
+    # Nessun loop attivo: restano i primi 3, il resto è scartato e contato
+    assert client.dropped == 7
+    client.loop(timeout=0.0)
+    assert [p for _, p, _ in seen] == [b"0", b"1", b"2"]
+
+
+def test_loop_thread_delivers_in_order():
+    broker = LocalBroker()
+    done = threading.Event()
+    client, seen = subscriber(broker, "t")
+    on_message = client.on_message
+
+    def record(c, userdata, msg):
+        on_message(c, userdata, msg)
+        if len(seen) == 50:
+            done.set()
+
+    client.on_message = record
+    client.loop_start()
+    pub = LocalClient("pub", broker)
+    pub.connect()
+    for i in range(50):
+        pub.publish("t", str(i))
+    assert done.wait(2.0)
+    client.loop_stop()
+    assert [p for _, p, _ in seen] == [str(i).encode() for i in range(50)]
+    assert client.dropped == 0
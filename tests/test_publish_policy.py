@@ -0,0 +1,35 @@
+from src.common.publish_policy import DecisionPublisher, DecisionStateDecoder
+
+
+def record(**extra):
+    rec = {"temperature": 30.0, "humidity": 40.0, "water_stress_index": 0.3,
+           "suggestion": {"action": "hold", "reason": "conditions-normal", "volume_l_m2": 0.0}}
+    rec.update(extra)
+    return rec
+
+
+def test_delta_reports_removed_keys():
+    pub = DecisionPublisher(mode="delta", heartbeat_secs=60.0)
+    dec = DecisionStateDecoder()
+    dec.apply(pub.next_message(record(vpd_kpa=1.2, forecast_rain_mm_24h=3.0, ts=0.0), 0.0))
+
+    msg = pub.next_message(record(ts=1.0), 1.0)
+    assert msg is not None and msg["kind"] == "delta"
+    assert sorted(msg["removed"]) == ["forecast_rain_mm_24h", "vpd_kpa"]
+    state = dec.apply(msg)
+    assert "vpd_kpa" not in state and "forecast_rain_mm_24h" not in state
+
+    # Già rimosse: nessun nuovo messaggio
+    assert pub.next_message(record(ts=2.0), 2.0) is None
+
+
+def test_delta_decoder_matches_full_snapshots():
+    pub = DecisionPublisher(mode="delta", heartbeat_secs=60.0, deadbands={})
+    dec = DecisionStateDecoder()
+    stream = [record(vpd_kpa=1.0), record(vpd_kpa=2.0, fallback=True), record(), record(vpd_kpa=3.0)]
+    for i, rec in enumerate(stream):
+        rec["ts"] = float(i)
+        msg = pub.next_message(rec, float(i))
+        if msg is not None:
+            state = dec.apply(msg)
+        assert state == rec
@@ -0,0 +1,47 @@
+import json
+import time
+
+import src.agents.rollup_agent as rollup_agent
+from src.common.config import DECISION_HEARTBEAT_SECS
+from src.common.local_bus import LocalBroker, LocalClient
+from src.common.rollups import RollupStore
+
+
+def make_agent(monkeypatch):
+    broker = LocalBroker(synchronous=True)
+    monkeypatch.setattr(rollup_agent, "make_client", lambda name: LocalClient(name, broker))
+    agent = rollup_agent.RollupAgent(store=RollupStore({60: 10}))
+    agent.client.connect()
+    pub = LocalClient("decisions", broker)
+    pub.connect()
+    return agent, pub
+
+
+def test_samples_weight_states_by_duration(monkeypatch):
+    agent, pub = make_agent(monkeypatch)
+    t0 = time.time() // 60 * 60
+    pub.publish("greenfield/a/decisions", json.dumps(
+        {"kind": "full", "seq": 1, "ts": t0, "water_stress_index": 1.0,
+         "suggestion": {"action": "irrigate", "reason": "high-water-stress", "volume_l_m2": 4.0}}))
+    agent.sample(t0)
+    # Un solo delta, poi lo stato resta fermo per il resto del minuto
+    pub.publish("greenfield/a/decisions", json.dumps(
+        {"kind": "delta", "seq": 2, "ts": t0 + 1, "changes": {"water_stress_index": 0.0}}))
+    for k in range(1, 10):
+        agent.sample(t0 + 5 * k)
+
+    series = agent.store.series("a", 60)
+    assert series["n"] == [10]
+    assert series["water_stress_index"]["mean"] == [0.1]
+    assert series["actions"] == {"irrigate": [10]}
+
+
+def test_silent_field_is_no_longer_sampled(monkeypatch):
+    agent, pub = make_agent(monkeypatch)
+    now = time.time()
+    pub.publish("greenfield/a/decisions", json.dumps({"kind": "full", "seq": 1, "ts": now, "temperature": 20.0}))
+    agent.sample(now)
+    agent.sample(now + 3 * DECISION_HEARTBEAT_SECS)
+    assert sum(agent.store.series("a", 60)["n"]) == 1
+    row = agent.store.overview(now + 10)[0]
+    assert row["ts"] == now and row["age_s"] == 10.0
@@ -0,0 +1,163 @@
+import json
+import os
+
+import src.common.spool as spool_module
+from src.common.spool import MQTT_ERR_SUCCESS, DiskSpool, SpooledPublisher
+
+
+def fill(spool: DiskSpool, n: int, start: int = 0):
+    for i in range(start, start + n):
+        spool.append("t", json.dumps({"i": i}))
+
+
+def segment_lines(directory: str):
+    """Righe per file di segmento, dal più vecchio."""
+    out = []
+    for name in sorted(f for f in os.listdir(directory) if f.startswith("seg-") and f.endswith(".log")):
+        with open(os.path.join(directory, name), "rb") as f:
+            out.append(len(f.read().splitlines()))
+    return out
+
+
+def read_ids(spool: DiskSpool, n: int = 1000):
+    records, mark = spool.read_batch(n)
+    return [json.loads(p)["i"] for _, p in records], mark
+
+
+def test_commit_across_segments_survives_restart(tmp_path):
+    spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6, segment_bytes=200)
+    fill(spool, 40)
+    lines = segment_lines(str(tmp_path))
+    assert len(lines) > 2
+
+    # Batch a cavallo di due segmenti
+    ids, mark = read_ids(spool, lines[0] + 2)
+    assert ids == list(range(lines[0] + 2))
+    spool.commit(mark)
+    assert spool.pending == 40 - lines[0] - 2
+    assert len(segment_lines(str(tmp_path))) == len(lines) - 1
+    spool.close()
+
+    # Dopo il riavvio si riparte dal cursore, a metà del nuovo primo segmento
+    spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6, segment_bytes=200)
+    assert spool.pending == 40 - lines[0] - 2
+    ids, mark = read_ids(spool)
+    assert ids == list(range(lines[0] + 2, 40))
+    spool.commit(mark)
+    assert spool.pending == 0
+
+
+def test_corrupt_lines_are_consumed(tmp_path):
+    spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6)
+    fill(spool, 3)
+    spool.close()
+    # Riga illeggibile nel segmento (es. disco pieno a metà scrittura)
+    with open(os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0]), "ab") as f:
+        f.write(b"not json\n")
+    spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6)
+    assert spool.pending == 4
+    fill(spool, 2, start=3)
+
+    ids, mark = read_ids(spool)
+    assert ids == list(range(5))
+    spool.commit(mark)
+    assert spool.pending == 0
+    spool.close()
+    assert DiskSpool(str(tmp_path), max_bytes=10 ** 6).pending == 0
+
+
+def test_dropped_counts_only_unsent(tmp_path):
+    spool = DiskSpool(str(tmp_path), max_bytes=2000, segment_bytes=400)
+    fill(spool, 5)
+    records, mark = spool.read_batch(3)
+    spool.commit(mark)
+    fill(spool, 200, start=5)
+    assert spool.appended - 3 == spool.pending + spool.dropped
+    assert sum(segment_lines(str(tmp_path))) >= spool.pending
+
+
+# ============================================================
+#  SpooledPublisher.drain
+# ============================================================
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Info:
+    def __init__(self, rc):
+        self.rc = rc
+
+
+class StubClient:
+    """Client MQTT finto: registra i publish, fallisce sui topic in `down`."""
+
+    def __init__(self):
+        self.connected = True
+        self.down = set()
+        self.sent = []
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if topic in self.down:
+            return Info(4)
+        self.sent.append((topic, json.loads(payload), qos, retain))
+        return Info(MQTT_ERR_SUCCESS)
+
+
+def make_publisher(tmp_path, monkeypatch, **kw):
+    clock = Clock()
+    monkeypatch.setattr(spool_module, "time", clock)
+    client = StubClient()
+    return SpooledPublisher(client, DiskSpool(str(tmp_path), max_bytes=10 ** 6), **kw), client, clock
+
+
+def backfilled(client):
+    return [item["i"] for _, body, _, _ in client.sent for item in body["batch"]]
+
+
+def test_drain_respects_token_bucket(tmp_path, monkeypatch):
+    pub, client, clock = make_publisher(tmp_path, monkeypatch, batch_size=5, rate=10.0)
+    client.connected = False
+    for i in range(100):
+        assert pub.publish("t", {"i": i}) is False
+    client.connected = True
+
+    assert pub.drain() == 0
+    clock.now = 1.0
+    assert pub.drain() == 10
+    clock.now = 1.5
+    assert pub.drain() == 5
+    # Dopo una lunga pausa il bucket è pieno al massimo per un secondo di letture
+    clock.now = 100.0
+    assert pub.drain() == 10
+    assert backfilled(client) == list(range(25))
+    assert all(qos == 1 and not retain and body["backfill"] for _, body, qos, retain in client.sent)
+    assert pub.spool.pending == 75
+
+
+def test_drain_keeps_batch_on_partial_failure(tmp_path, monkeypatch):
+    pub, client, clock = make_publisher(tmp_path, monkeypatch, batch_size=10, rate=100.0)
+    client.connected = False
+    for i in range(4):
+        pub.publish("a" if i % 2 else "b", {"i": i})
+    client.connected = True
+
+    # Il secondo topic del batch fallisce: nulla viene confermato
+    client.down = {"a"}
+    clock.now = 1.0
+    assert pub.drain() == 0
+    assert pub.spool.pending == 4
+
+    # Al ritorno del link il batch intero viene rimandato (almeno una volta)
+    client.down = set()
+    clock.now = 2.0
+    assert pub.drain() == 4
+    assert pub.spool.pending == 0
+    assert sorted(backfilled(client)) == [0, 0, 1, 2, 2, 3]
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+
+import src.agents.decision_agent as decision_agent
+from src.common.local_bus import LocalBroker, LocalClient
+from src.common.state_store import StateSnapshotStore, pack_samples, unpack_samples
+from src.pipeline.features import RollingFeatureEngine
+
+
+def test_pack_unpack_round_trip():
+    items = [(1.7e9 + 0.25 * i, 0.1 * i, 0.01 * i) for i in range(1000)]
+    out = unpack_samples(pack_samples(items))
+    assert [ts for ts, _, _ in out] == [ts for ts, _, _ in items]
+    # ts esatti in float64, valore e area in float32
+    for col in (1, 2):
+        assert [r[col] for r in out] == pytest.approx([r[col] for r in items], rel=1e-6, abs=1e-7)
+    assert unpack_samples(pack_samples([])) == []
+    assert unpack_samples(None) == []
+
+
+def feed(engine, n, t0=1.7e9, step=60.0):
+    out = None
+    for i in range(n):
+        out = engine.update(t0 + step * i, 0.25 * ((i * 7) % 5), 0.125 if i % 3 else None)
+    return out
+
+
+def test_rolling_state_restore_matches_features():
+    engine = RollingFeatureEngine([900, 3600, 86400])
+    feed(engine, 300)
+    state = engine.state()
+    packed = json.loads(json.dumps({"last_ts": state["last_ts"], "wsi": pack_samples(state["wsi"]),
+                                    "et0": pack_samples(state["et0"])}))
+
+    restored = RollingFeatureEngine([900, 3600, 86400])
+    restored.restore({"last_ts": packed["last_ts"], "wsi": unpack_samples(packed["wsi"]),
+                      "et0": unpack_samples(packed["et0"])})
+    # Valori esatti in float32: le feature ripristinate coincidono
+    assert restored.features() == engine.features()
+    # Le finestre continuano come l'originale
+    t = state["last_ts"] + 60.0
+    assert restored.update(t, 0.5, 0.25) == engine.update(t, 0.5, 0.25)
+
+
+def test_snapshot_store_round_trip_and_version(tmp_path):
+    store = StateSnapshotStore(str(tmp_path / "agent" / "state.json"))
+    store.save({"cache": {"temperature": 21.5}})
+    assert store.load()["cache"] == {"temperature": 21.5}
+    (tmp_path / "agent" / "state.json").write_text(json.dumps({"version": 0}))
+    assert store.load() is None
+
+
+def test_restore_drops_values_past_ttl(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.json")
+    now = time.time()
+    StateSnapshotStore(path).save({
+        "ts": now - 5,
+        "cache": {"temperature": 28.0, "humidity": 40.0},
+        # humidity scaduta rispetto a STALENESS_TTL_SECS (15 s di default)
+        "last_update": {"temperature": now - 5, "humidity": now - 600},
+        "strategy_name": "agronomic",
+        "seq": 41,
+    })
+    broker = LocalBroker(synchronous=True)
+    monkeypatch.setattr(decision_agent, "make_client", lambda name: LocalClient(name, broker))
+    monkeypatch.setattr(decision_agent, "STATE_SNAPSHOT_PATH", path)
+    agent = decision_agent.DecisionAgent()
+    try:
+        assert agent.cache["temperature"] == 28.0
+        assert agent.cache["humidity"] is None
+        assert agent.current_strategy_name == "agronomic"
+        assert agent.publisher.seq == 41
+    finally:
+        agent.stop()
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.ai.strategies import ACTIONS, REASONS, AgronomicStrategy, make_strategy
+
+
+STRATEGY_NAMES = ("simple_rules", "agronomic", "ml_placeholder")
+
+# Range volutamente più larghi delle soglie, così ogni regola scatta
+RANGES = {
+    "temperature": (-5.0, 45.0),
+    "humidity": (10.0, 95.0),
+    "light": (50.0, 1800.0),
+    "vegetation_health": (0.1, 1.0),
+    "water_stress_index": (0.0, 1.5),
+    "vpd_kpa": (0.0, 4.0),
+    AgronomicStrategy.ET0_KEY: (0.0, 10.0),
+    AgronomicStrategy.RAIN_KEY: (0.0, 10.0),
+}
+
+
+def random_grid(n: int, seed: int = 0):
+    """Colonne casuali con circa il 15% di valori mancanti (NaN)."""
+    rng = np.random.default_rng(seed)
+    cols = {}
+    for key, (lo, hi) in RANGES.items():
+        c = rng.uniform(lo, hi, n)
+        c[rng.random(n) < 0.15] = np.nan
+        cols[key] = c
+    return cols
+
+
+@pytest.mark.parametrize("name", STRATEGY_NAMES)
+def test_estimate_batch_matches_estimate(name):
+    strategy = make_strategy(name)
+    assert strategy.name == name
+    cols = random_grid(5000)
+
+    # ml_placeholder estrae un numero casuale per riga: stessa sequenza nei due percorsi
+    random.seed(1)
+    out = strategy.estimate_batch(cols)
+    random.seed(1)
+    for i in range(len(cols["temperature"])):
+        row = {k: float(c[i]) for k, c in cols.items() if not np.isnan(c[i])}
+        expected = strategy.estimate(row)
+        assert ACTIONS[out["action"][i]] == expected["action"], row
+        assert REASONS[out["reason"][i]] == expected["reason"], row
+        assert out["volume_l_m2"][i] == pytest.approx(expected["volume_l_m2"], abs=1e-4), row
+
+
+def test_agronomic_batch_applies_vpd_rule():
+    row = {"temperature": 30.0, "humidity": 40.0, "light": 500.0, "vegetation_health": 0.7,
+           "water_stress_index": 0.2, "vpd_kpa": 3.0}
+    out = make_strategy("agronomic").estimate_batch({k: np.array([v]) for k, v in row.items()})
+    assert ACTIONS[out["action"][0]] == "irrigate_light"
+    assert REASONS[out["reason"][0]] == "high-vapor-pressure-deficit"
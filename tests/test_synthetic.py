@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.common.synthetic import DAY, LiveSynthetic, SERIES_KEYS, SyntheticGenerator
+from src.pipeline.vectorized import CLEAN_RANGES
+
+START = 1_717_200_000.0     # 1 giugno 2024, 00:00 UTC
+
+
+def week(seed, fields=3):
+    gen = SyntheticGenerator(fields, step_secs=300.0, start=START, seed=seed)
+    return gen.next_chunk(int(7 * DAY / 300.0))
+
+
+def test_same_seed_same_series():
+    a, b = week(7), week(7)
+    for key in ("ts",) + SERIES_KEYS:
+        np.testing.assert_array_equal(a[key], b[key])
+    assert not np.array_equal(a["temperature"], week(8)["temperature"])
+
+
+def test_physical_correlations():
+    s = week(11)
+    radiation, light = s["radiation"], s["light"]
+    night = radiation == 0.0
+    assert 0.3 < night.mean() < 0.7
+    assert (light[night] == 0.0).all()
+    np.testing.assert_allclose(light, np.clip(radiation * 1.9, 0.0, 2000.0), rtol=1e-5)
+    # L'umidità relativa cala quando la temperatura sale (stesso punto di rugiada)
+    for i in range(radiation.shape[0]):
+        assert np.corrcoef(s["temperature"][i], s["humidity"][i])[0, 1] < -0.5
+    for key in SERIES_KEYS:
+        lo, hi = CLEAN_RANGES[key]
+        assert lo <= s[key].min() and s[key].max() <= hi
+
+
+def test_live_readings_stay_in_physical_ranges():
+    live = LiveSynthetic(("f1",), step_secs=60.0, seed=5)
+    t0 = float(live.gen.t) - live.chunk_steps * live.gen.step
+    for k in range(0, 24 * 60, 7):
+        now = t0 + 60.0 * k
+        for kind in SERIES_KEYS:
+            lo, hi = CLEAN_RANGES[kind]
+            assert lo <= live.reading(kind, "f1", now) <= hi
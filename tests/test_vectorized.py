@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.pipeline.handlers import CleaningHandler, FeatureEngineeringHandler
+from src.pipeline.vectorized import CLEAN_RANGES, features_batch
+
+
+def test_features_batch_matches_handlers():
+    rng = np.random.default_rng(4)
+    n = 5000
+    # Range più larghi dei limiti fisici, così anche il clamp viene verificato
+    cols = {}
+    for key, (lo, hi) in CLEAN_RANGES.items():
+        span = hi - lo
+        c = rng.uniform(lo - 0.2 * span, hi + 0.2 * span, n)
+        c[rng.random(n) < 0.15] = np.nan
+        cols[key] = c
+    batch = features_batch(cols)
+
+    head = CleaningHandler()
+    head.set_next(FeatureEngineeringHandler())
+    for i in range(n):
+        rec = {k: (None if np.isnan(c[i]) else float(c[i])) for k, c in cols.items()}
+        out = head.handle(rec)
+        for key in CLEAN_RANGES:
+            expected = np.nan if out[key] is None else out[key]
+            np.testing.assert_equal(batch[key][i], expected)
+        # np.round e round() possono differire solo sull'ultima cifra nei casi di parità
+        assert abs(batch["water_stress_index"][i] - out["water_stress_index"]) <= 1e-3 + 1e-12, rec